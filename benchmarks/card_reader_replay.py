@@ -0,0 +1,86 @@
+"""End-to-end benchmark of CardReader fed by a replayed capture through a pty.
+
+Run from the repository root:
+
+    python -m benchmarks.card_reader_replay --cards 200 --corrupt 0.05
+    python -m benchmarks.card_reader_replay --capture taps.jsonl --speed 1
+
+Reports tap-to-read latency of a paced replay and throughput of a replay at maximal speed.
+"""
+from src.attendance.card_reader import CardReader
+from src.attendance.card_reader import InvalidDataException
+from src.attendance.card_reader import NoDataException
+from src.attendance.serial_replay import inject_faults
+from src.attendance.serial_replay import load_capture
+from src.attendance.serial_replay import PtyReplay
+from src.attendance.serial_replay import synthesize
+
+from random import Random
+from statistics import mean
+from statistics import median
+from time import perf_counter
+
+import argparse
+import serial
+
+
+def replay(records, speed):
+    cards = invalid = 0
+    latencies = []
+    with PtyReplay(records, speed) as player:
+        start = perf_counter()
+        elapsed = 0.0
+        reader = CardReader(serial.Serial(player.port_name, timeout=0.2))
+        pending = [offset for offset, _ in records]
+        while True:
+            try:
+                reader.read_card(True)
+                cards += 1
+            except InvalidDataException:
+                invalid += 1
+            except NoDataException:
+                if player.finished.is_set():
+                    break
+                continue
+            now = perf_counter() - start
+            elapsed = now
+            if speed > 0 and pending:
+                # Latency from the moment the frame was written to the moment it was returned
+                scheduled = [offset / speed for offset in pending if offset / speed <= now]
+                if scheduled:
+                    latencies.append(now - scheduled[-1])
+                    pending = pending[len(scheduled):]
+        reader.close()
+    return cards, invalid, elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capture', help='capture file, random taps are used if not set')
+    parser.add_argument('--cards', type=int, default=200, help='number of random taps')
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds between random taps')
+    parser.add_argument('--speed', type=float, default=1.0, help='speed of the paced replay')
+    parser.add_argument('--noise', type=float, default=0.0, help='probability of garbage per record')
+    parser.add_argument('--partial', type=float, default=0.0, help='probability of cut record')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='probability of corrupted record')
+    args = parser.parse_args()
+
+    if args.capture:
+        records = load_capture(args.capture)
+    else:
+        random = Random(0)
+        records = synthesize(['{0:010x}'.format(random.getrandbits(40)) for _ in range(args.cards)],
+                             args.interval)
+    records = inject_faults(records, args.noise, args.partial, args.corrupt, seed=0)
+
+    cards, invalid, elapsed, latencies = replay(records, args.speed)
+    print('paced replay:   {0} cards, {1} invalid, latency mean {2:.2f} ms, median {3:.2f} ms'.format(
+        cards, invalid, 1000 * mean(latencies or [0]), 1000 * median(latencies or [0])))
+    cards, invalid, elapsed, _ = replay(records, 0)
+    print('maximal speed:  {0} cards, {1} invalid, {2:.0f} cards/s'.format(
+        cards, invalid, cards / max(elapsed, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Compare cost of the availability check with and without the connectivity monitor.
+
+Run from the repository root:
+
+    python -m benchmarks.connectivity_probe --calls 200 --delay 0.05
+
+is_site_up sends a GET request of the base URL on every call, the monitor answers from
+its cached state and probes the server by a TCP connect only when the state expires.
+"""
+from src.attendance.connectivity import ConnectivityMonitor
+from src.attendance.utils import is_site_up
+
+from tests.utils.server_mock import run
+
+from multiprocessing import Process
+from time import perf_counter
+from time import process_time
+from time import sleep
+
+import argparse
+
+BASEURL = 'http://127.0.0.1:5000'
+
+
+def measure(check, calls):
+    wall = perf_counter()
+    cpu = process_time()
+    for _ in range(calls):
+        check()
+    return (perf_counter() - wall) / calls, (process_time() - cpu) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200, help='number of availability checks')
+    parser.add_argument('--delay', type=float, default=0.05, help='API response delay in seconds')
+    args = parser.parse_args()
+
+    server = Process(target=run, args=(args.delay,))
+    server.start()
+    sleep(1)
+    try:
+        site_up = measure(lambda: is_site_up(BASEURL), args.calls)
+        monitor = ConnectivityMonitor(BASEURL)
+        monitor.wait_until_available(5)
+        cached = measure(monitor.is_available, args.calls)
+        probes = monitor.get_stats()['probes']
+        monitor.close()
+    finally:
+        server.terminate()
+
+    print('{0:22} {1:>12} {2:>12}'.format('', 'wall/call', 'cpu/call'))
+    print('{0:22} {1:9.3f} ms {2:9.3f} ms'.format('is_site_up (GET)', 1e3 * site_up[0], 1e3 * site_up[1]))
+    print('{0:22} {1:9.3f} ms {2:9.3f} ms'.format('monitor.is_available', 1e3 * cached[0], 1e3 * cached[1]))
+    print('monitor probes: {0} for {1} checks'.format(probes, args.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compare frames per second and CPU time of the PIL and NumPy display backends.
+
+Run from the repository root:
+
+    python -m benchmarks.display_backends --frames 2000
+
+Frames of scrolling messages are rendered and sent to SH1106 devices with a noop serial
+interface, so the cost of rendering and of packing frames to page bytes is measured.
+The PIL backend sends images which the device packs, the NumPy backend sends page
+bytes directly to the diffing device.
+"""
+from src.attendance.display import OLEDdisplay
+from src.attendance.display_device import DiffingSH1106
+
+from luma.core.interface.serial import noop
+from luma.oled.device import sh1106
+from time import perf_counter
+from time import process_time
+
+import argparse
+
+MESSAGES = [('Ready to read a card.', ''),
+            ('Please push the button to start.', ''),
+            ('Sofia Chadwick', 'Card was saved and will be send later.')]
+
+
+def render_frames(display, frames):
+    for index in range(frames):
+        msga, msgb = MESSAGES[index // 100 % len(MESSAGES)]
+        text_width = max(display._get_text_width(msga), display._get_text_width(msgb))
+        display._render(msga, msgb, index * OLEDdisplay.SCROLL_STEP % text_width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000, help='number of rendered frames')
+    args = parser.parse_args()
+
+    for name, device_class, backend in [('pil/sh1106', sh1106, 'pil'),
+                                        ('pil/diffing', DiffingSH1106, 'pil'),
+                                        ('numpy/diffing', DiffingSH1106, 'numpy')]:
+        display = OLEDdisplay(device_class(noop()), backend)
+        display.close()
+        start, cpu_start = perf_counter(), process_time()
+        render_frames(display, args.frames)
+        elapsed, cpu = perf_counter() - start, process_time() - cpu_start
+        print('{0:14} {1:8.0f} frames/s {2:8.1f} us CPU/frame'.format(
+            name, args.frames / elapsed, 1e6 * cpu / args.frames))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compare drawing of every scroll frame with cropping frames from a cached strip.
+
+Run from the repository root:
+
+    python -m benchmarks.display_render --frames 2000
+
+Frames are sent to a dummy luma device, so only the rendering cost is measured.
+"""
+from src.attendance.display import OLEDdisplay
+
+from luma.core.device import dummy
+from PIL import Image
+from PIL import ImageDraw
+from time import perf_counter
+
+import argparse
+
+MESSAGES = [('Ready to read a card.', ''),
+            ('Please push the button to start.', ''),
+            ('Sofia Chadwick', 'Card was saved and will be send later.')]
+
+
+def draw_frames(display, device, frames):
+    # Rendering used before the strips: clear and draw both copies of both lines
+    buffer = Image.new('1', (device.width, device.height))
+    draw = ImageDraw.Draw(buffer)
+    for index in range(frames):
+        msga, msgb = MESSAGES[index // 100 % len(MESSAGES)]
+        text_width = max(display._measure_text(msga)[0], display._measure_text(msgb)[0])
+        height = display._measure_text(msga)[1]
+        second_offset = max(text_width, device.width) + 10
+        offset = index * OLEDdisplay.SCROLL_STEP % text_width
+        draw.rectangle((0, 0, device.width, device.height), fill=0)
+        for left in (-offset, second_offset - offset):
+            draw.text((left, 0), msga, font=display.FONT, fill=255)
+            draw.text((left, 2 * height), msgb, font=display.FONT, fill=255)
+        device.display(buffer)
+
+
+def crop_frames(display, frames):
+    for index in range(frames):
+        msga, msgb = MESSAGES[index // 100 % len(MESSAGES)]
+        text_width = max(display._get_text_width(msga), display._get_text_width(msgb))
+        display._render(msga, msgb, index * OLEDdisplay.SCROLL_STEP % text_width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000, help='number of rendered frames')
+    args = parser.parse_args()
+
+    device = dummy(width=128, height=64, mode='1')
+    display = OLEDdisplay(device)
+    display.close()
+    for name, function in [('draw', lambda: draw_frames(display, device, args.frames)),
+                           ('strip', lambda: crop_frames(display, args.frames))]:
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        print('{0:6} {1:8.1f} us/frame'.format(name, 1e6 * elapsed / args.frames))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare per-byte frame hunting with the incremental frame parser.
+
+Run from the repository root:
+
+    python -m benchmarks.frame_parser --frames 100000
+
+Both parse the same synthetic stream of frames mixed with garbage. Every read
+is a syscall on a serial port, so reads per frame matter more than parsing speed
+measured on an in-memory stream. The per-byte reader additionally waited one serial timeout after every card to drain residual
+data, that delay is reported but not simulated.
+"""
+from src.attendance.card_id import parse_card
+from src.attendance.card_reader import CardReader
+from src.attendance.frame_parser import FrameParser
+
+from io import BytesIO
+from random import choice
+from random import randrange
+from time import perf_counter
+
+import argparse
+
+
+def create_stream(frames):
+    chunks = []
+    for _ in range(frames):
+        card = '{0:010X}'.format(randrange(1 << 40)).encode('ascii')
+        garbage = bytes(choice(b'\x00\x03\xffxyz') for _ in range(randrange(4)))
+        chunks.append(garbage + b'\x02' + card + b'00\r\n\x03')
+    return b''.join(chunks)
+
+
+def parse_per_byte(stream):
+    port = BytesIO(stream)
+    cards = reads = 0
+    while True:
+        byte = port.read(1)
+        reads += 1
+        if byte == b'':
+            return cards, reads
+        if byte != b'\x02':
+            continue
+        reads += 1
+        if parse_card(port.read(10)) is not None:
+            cards += 1
+
+
+def parse_chunks(stream, chunk_size):
+    parser = FrameParser()
+    cards = reads = 0
+    for start in range(0, len(stream), chunk_size):
+        cards += len(parser.feed(stream[start:start + chunk_size]))
+        reads += 1
+    return cards, reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100000, help='number of frames in the stream')
+    args = parser.parse_args()
+
+    stream = create_stream(args.frames)
+    candidates = [('per byte', lambda: parse_per_byte(stream))]
+    for chunk_size in [16, 256, 4096]:
+        candidates.append(('chunks of {0}'.format(chunk_size),
+                           lambda size=chunk_size: parse_chunks(stream, size)))
+    print('{0:16} {1:>14} {2:>14}'.format('parser', 'frames/s', 'reads/frame'))
+    for name, function in candidates:
+        start = perf_counter()
+        cards, reads = function()
+        elapsed = perf_counter() - start
+        assert cards == args.frames
+        print('{0:16} {1:14.0f} {2:14.2f}'.format(name, cards / elapsed, reads / cards))
+    print('Drain delay removed from every tap: {0:.1f} s'.format(CardReader.TIMEOUT))
+
+
+if __name__ == '__main__':
+    main()
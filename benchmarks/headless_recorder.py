@@ -0,0 +1,107 @@
+"""Drive the whole recorder on simulated hardware against the mock of the API.
+
+Run from the repository root:
+
+    python -m benchmarks.headless_recorder --cards 100 --interval 0.05
+
+The simulated operator pushes the button, taps the organizator card and then the participant
+cards. Latency of every tap is measured until its upload, peripherals report their load.
+"""
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.attendance_recorder import AttendanceRecorder
+from src.attendance.hardware import Backend
+from src.attendance.hardware import create_hardware
+from src.attendance.resources.config import config
+
+from tests.utils.server_mock import run
+
+from multiprocessing import Process
+from statistics import median
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import monotonic
+from time import sleep
+
+import argparse
+import os
+import sys
+
+ORGANIZATOR_CARD = '0cb90021f6'
+
+
+def create_builder():
+    builder = ISConnectionBuilder()
+    builder.set_mac_address('42:97:0b:27:53:86')
+    builder.set_baseurl('http://127.0.0.1:5000')
+    builder.set_url('http://127.0.0.1:5000/testonline')
+    return builder
+
+
+def wait_for_requests(recorder, count, timeout=60):
+    deadline = monotonic() + timeout
+    while recorder._uploader.stats.requests < count:
+        if monotonic() > deadline:
+            raise TimeoutError('Only {0} of {1} requests were sent.'.format(
+                recorder._uploader.stats.requests, count))
+        sleep(0.001)
+    return monotonic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=100, help='number of participant taps')
+    parser.add_argument('--interval', type=float, default=0.05, help='time between taps in seconds')
+    parser.add_argument('--delay', type=float, default=0.0, help='API response delay in seconds')
+    args = parser.parse_args()
+
+    server = Process(target=run, args=(args.delay,))
+    server.start()
+    sleep(1)
+    try:
+        with TemporaryDirectory() as home:
+            os.environ['HOME'] = home
+            config['Upload']['background'] = 'false'
+            hardware = create_hardware(Backend.SIM)
+            recorder = AttendanceRecorder(hardware.display, hardware.reader,
+                                          create_builder().build(), hardware.buzzer,
+                                          hardware.button)
+            Thread(target=recorder.start, daemon=True).start()
+
+            hardware.push_button()
+            hardware.tap(ORGANIZATOR_CARD)
+            wait_for_requests(recorder, 1)
+
+            # Every tap is uploaded by a single request in the synchronous mode
+            taps = []
+            start = monotonic()
+            for index in range(args.cards):
+                taps.append(monotonic())
+                hardware.tap('{0:010x}'.format(index + 1))
+                sleep(args.interval)
+            latencies = [wait_for_requests(recorder, index + 2) - tap
+                         for index, tap in enumerate(taps)]
+            elapsed = monotonic() - start
+            hardware.buzzer.wait_idle(10)
+    finally:
+        server.terminate()
+
+    latencies.sort()
+    print('taps/s           {0:10.1f}'.format(args.cards / elapsed))
+    print('latency median   {0:10.1f} ms'.format(1e3 * median(latencies)))
+    print('latency p95      {0:10.1f} ms'.format(1e3 * latencies[int(0.95 * (len(latencies) - 1))]))
+    print('latency max      {0:10.1f} ms'.format(1e3 * latencies[-1]))
+    display = hardware.display._device.get_stats()
+    print('display frames   {0:10d}'.format(display['frames']))
+    print('display B/frame  {0:10.1f} (full frame {1})'.format(
+        display['bytes_per_frame'], display['full_frame_bytes']))
+    buzzer = hardware.buzzer.get_stats()
+    print('beeps played     {0:10d} (coalesced {1}, dropped {2})'.format(
+        buzzer['played'], buzzer['coalesced'], buzzer['dropped']))
+    # recorder thread never finishes, don't let it run into interpreter shutdown
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Compare size and upload time of the batch payload encodings.
+
+Run from the repository root:
+
+    python -m benchmarks.payload_size --cards 10 1000 100000 --rate 256
+
+Batches of random cards are sent to the mock of the API, which decodes every encoding.
+Time is measured on the loopback, transfer time on a slow link is estimated from the size.
+"""
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.payload import Compression
+from src.attendance.payload import PayloadEncoder
+from src.attendance.payload import PayloadFormat
+
+from tests.utils.server_mock import run
+
+from multiprocessing import Process
+from statistics import median
+from time import perf_counter
+from time import sleep
+from urllib.parse import urlencode
+
+import argparse
+import random
+
+MODES = [(PayloadFormat.FORM, Compression.IDENTITY),
+         (PayloadFormat.JSON, Compression.IDENTITY),
+         (PayloadFormat.JSON, Compression.GZIP),
+         (PayloadFormat.JSON, Compression.DEFLATE),
+         (PayloadFormat.BINARY, Compression.IDENTITY),
+         (PayloadFormat.BINARY, Compression.GZIP),
+         (PayloadFormat.BINARY, Compression.DEFLATE)]
+
+
+def create_connection(encoder):
+    builder = ISConnectionBuilder()
+    builder.set_mac_address('42:97:0b:27:53:86')
+    builder.set_baseurl('http://127.0.0.1:5000')
+    builder.set_url('http://127.0.0.1:5000/testonline')
+    builder.set_payload_encoder(encoder)
+    return builder.build()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='batch sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='uploads of every batch')
+    parser.add_argument('--rate', type=float, default=256, help='link rate in kbit/s for the estimate')
+    args = parser.parse_args()
+
+    server = Process(target=run)
+    server.start()
+    sleep(1)
+    try:
+        print('{0:>7} {1:18} {2:>11} {3:>7} {4:>11} {5:>11}'.format(
+            'cards', 'payload', 'bytes', 'ratio', 'loopback', 'at rate'))
+        for count in args.cards:
+            cards = ['{0:010x}'.format(random.getrandbits(40)) for _ in range(count)]
+            data = {'mac': '42:97:0b:27:53:86', 'token': 'thXtKt_2q7T77PsWD3hLJT34xCexmsaY',
+                    'cardid': cards}
+            form_size = len(urlencode(data, doseq=True))
+            for payload_format, compression in MODES:
+                encoder = PayloadEncoder(payload_format, compression, min_cards=1)
+                if encoder.accepts(count):
+                    size = len(encoder.encode(data)[0])
+                else:
+                    size = form_size
+                connection = create_connection(encoder)
+                connection.set_token(data['token'])
+                times = []
+                for _ in range(args.repeat):
+                    start = perf_counter()
+                    connection.send_cached_data_only(cards)
+                    times.append(perf_counter() - start)
+                connection.close()
+                print('{0:7d} {1:18} {2:11d} {3:7.2f} {4:8.1f} ms {5:9.2f} s'.format(
+                    count, '{0}+{1}'.format(payload_format.value, compression.value), size,
+                    size / form_size, 1e3 * median(times), 8 * size / (1000 * args.rate)))
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Measure cold start of the recorder: imports, initialisation and the time to the first card.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_time
+
+Import cost of every module is measured in a fresh interpreter with -X importtime.
+Initialisation runs on simulated hardware. The first card is tapped right after the start
+while the mock of the API answers with a delay, as a slow network at boot. Without the fast
+start the card is taken only after the connection check.
+"""
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.attendance_recorder import AttendanceRecorder
+from src.attendance.button_controller import ButtonController
+from src.attendance.buzzer import Buzzer
+from src.attendance.display import OLEDdisplay
+from src.attendance.display_device import DiffingSH1106
+from src.attendance.display_device import SimulatedSerialInterface
+from src.attendance.gpio_simulator import SimulatedGPIO
+from src.attendance.hardware import Backend
+from src.attendance.hardware import create_hardware
+from src.attendance.resources.config import config
+
+from tests.utils.server_mock import run
+
+from multiprocessing import Process
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+from time import sleep
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULES = ['resources.config', 'card_reader', 'display', 'display_device', 'buzzer',
+           'button_controller', 'api_connection', 'hardware', 'attendance_recorder']
+
+
+def measure_import(module):
+    # Cumulative time of the module is on the last line of -X importtime output
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+    imports = {}
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                imports[name.strip()] = int(cumulative) / 1000
+    return imports[module]
+
+
+def measure_init(name, function):
+    start = perf_counter()
+    result = function()
+    print('  {0:28} {1:8.1f} ms'.format(name, 1e3 * (perf_counter() - start)))
+    return result
+
+
+def measure_first_card(fast_start):
+    config['Recorder']['fast_start'] = 'true' if fast_start else 'false'
+    builder = ISConnectionBuilder()
+    builder.set_mac_address('42:97:0b:27:53:86')
+    builder.set_baseurl('http://127.0.0.1:5000')
+    builder.set_url('http://127.0.0.1:5000/testonline')
+    hardware = create_hardware(Backend.SIM)
+    recorder = AttendanceRecorder(hardware.display, hardware.reader, builder.build(),
+                                  hardware.buzzer, hardware.button)
+    hardware.push_button(0.03)
+    start = perf_counter()
+    Thread(target=recorder.start, daemon=True).start()
+    hardware.tap('0cb90021f6')
+    # Card was taken from the stream by the recording loop
+    deadline = perf_counter() + 60
+    stream = recorder._card_events
+    while stream.get_stats()['received'] == 0 or stream.depth():
+        if perf_counter() > deadline:
+            raise TimeoutError('Card was not taken.')
+        sleep(0.001)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=1.0, help='API response delay in seconds')
+    args = parser.parse_args()
+
+    print('import (fresh interpreter, cumulative):')
+    for module in MODULES:
+        print('  {0:28} {1:8.1f} ms'.format(module, measure_import('src.attendance.' + module)))
+
+    with TemporaryDirectory() as home:
+        os.environ['HOME'] = home
+        print('initialisation:')
+        gpio = SimulatedGPIO()
+        measure_init('OLEDdisplay', lambda: OLEDdisplay(DiffingSH1106(SimulatedSerialInterface())))
+        measure_init('Buzzer', lambda: Buzzer(gpio))
+        measure_init('ButtonController', lambda: ButtonController(gpio))
+        measure_init('simulated hardware', lambda: create_hardware(Backend.SIM))
+
+        server = Process(target=run, args=(args.delay,))
+        server.start()
+        sleep(1)
+        try:
+            print('first card taken after start (API delay {0} s):'.format(args.delay))
+            for fast_start in (False, True):
+                print('  fast_start={0:5} {1:18.1f} ms'.format(
+                    str(fast_start), 1e3 * measure_first_card(fast_start)))
+        finally:
+            server.terminate()
+    # recorder threads never finish, don't let them run into interpreter shutdown
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Compare throughput of the recorder loops against the Flask mock of the API.
+
+Run from the repository root:
+
+    python -m benchmarks.taps_per_second --cards 50 --delay 0.2
+
+Door throughput is the number of taps per second the reader accepted,
+upload throughput counts the taps until all of them were sent to the API.
+"""
+from src.attendance.async_recorder import AsyncAttendanceRecorder
+from src.attendance.async_recorder import AsyncISConnection
+from src.attendance.attendance_recorder import AttendanceRecorder
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.button_controller import IButtonController
+from src.attendance.buzzer import IBuzzer
+from src.attendance.card_reader import ICardReader
+from src.attendance.card_reader import NoDataException
+from src.attendance.display import IDisplay
+from src.attendance.resources.config import config
+
+from tests.utils.server_mock import run
+
+from multiprocessing import Process
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter
+from time import sleep
+
+import argparse
+import os
+import sys
+
+ORGANIZATOR_CARD = '0cb90021f6'
+FIRST_CARD = 'f8a400ca45'
+
+
+class BenchmarkReader(ICardReader):
+
+    def __init__(self, cards, interval):
+        self._cards = list(cards)
+        self._interval = interval
+        self.finished_at = None
+
+    def read_card(self, raise_if_no_data=False):
+        while not self._cards:
+            if self.finished_at is None:
+                self.finished_at = perf_counter()
+            if raise_if_no_data:
+                raise NoDataException('No card data was read.')
+            sleep(0.5)
+        sleep(self._interval)
+        return self._cards.pop(0)
+
+
+class BenchmarkDisplay(IDisplay):
+
+    def show(self, msga, msgb='', can_be_killed=True):
+        pass
+
+
+class BenchmarkBuzzer(IBuzzer):
+
+    def __init__(self, duration):
+        self._duration = duration
+
+    def beep(self, correct):
+        sleep(self._duration)
+
+
+class BenchmarkButton(IButtonController):
+
+    def is_pushed(self):
+        return True
+
+
+def create_builder():
+    builder = ISConnectionBuilder()
+    builder.set_mac_address('42:97:0b:27:53:86')
+    builder.set_baseurl('http://127.0.0.1:5000')
+    builder.set_url('http://127.0.0.1:5000/testonline')
+    return builder
+
+
+def measure(mode, cards, args):
+    with TemporaryDirectory() as home:
+        os.environ['HOME'] = home
+        config['Upload']['background'] = 'true' if mode == 'queue' else 'false'
+        config['CardReader']['stream'] = 'false'
+        reader = BenchmarkReader([ORGANIZATOR_CARD, FIRST_CARD] + cards, args.interval)
+        parts = (BenchmarkDisplay(), reader, None, BenchmarkBuzzer(args.beep), BenchmarkButton())
+        if mode == 'asyncio':
+            connection = AsyncISConnection(create_builder())
+            recorder = AsyncAttendanceRecorder(parts[0], reader, connection, *parts[3:])
+        else:
+            connection = create_builder().build()
+            recorder = AttendanceRecorder(parts[0], reader, connection, *parts[3:])
+
+        start = perf_counter()
+        Thread(target=recorder.start, daemon=True).start()
+        while recorder._uploader.stats.requests < len(cards) + 2:
+            sleep(0.01)
+        uploaded = perf_counter() - start
+        while reader.finished_at is None:
+            sleep(0.01)
+        door = reader.finished_at - start
+        connection.close()
+    return door, uploaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=50, help='number of participant taps')
+    parser.add_argument('--delay', type=float, default=0.1, help='API response delay in seconds')
+    parser.add_argument('--interval', type=float, default=0.0, help='time between taps in seconds')
+    parser.add_argument('--beep', type=float, default=0.0, help='duration of a beep in seconds')
+    args = parser.parse_args()
+
+    server = Process(target=run, args=(args.delay,))
+    server.start()
+    sleep(1)
+    try:
+        cards = ['{0:010x}'.format(i) for i in range(args.cards)]
+        print('{0:8} {1:>14} {2:>16}'.format('mode', 'door taps/s', 'upload taps/s'))
+        for mode in ['sync', 'queue', 'asyncio']:
+            door, uploaded = measure(mode, cards, args)
+            print('{0:8} {1:14.1f} {2:16.1f}'.format(
+                mode, (len(cards) + 1) / door, (len(cards) + 1) / uploaded))
+    finally:
+        server.terminate()
+    # recorder threads never finish, don't let them run into interpreter shutdown
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
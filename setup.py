@@ -13,6 +13,9 @@ setup(
     packages=find_namespace_packages("src"),
     install_requires=["pyserial", "Pillow", "luma.oled",
                       "RPi.GPIO", "requests"],
+    extras_require={
+        "numpy": ["numpy"]
+    },
     entry_points={
         "console_scripts": [
             "attendance_recorder = attendance.attendance_recorder:main"
@@ -1,19 +1,39 @@
 from __future__ import annotations
 
+from .card_id import CardId
+from .card_id import format_card
+from .circuit_breaker import CircuitBreaker
+from .connectivity import ConnectivityMonitor
+from .latency import LatencyTracker
+from .payload import PayloadEncoder
 from .utils import is_site_up
 
 from abc import ABC
 from abc import abstractmethod
-from copy import deepcopy
 from logging import getLogger
 from logging import Logger
 from requests import Response
+from requests import Session
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from threading import RLock
+from threading import Timer
+from time import monotonic
+from time import sleep
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import Final
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Union
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.util.retry import Retry
 
 import json
 import requests
@@ -31,6 +51,18 @@ class APIConnectionException(Exception):
         super().__init__(message)
 
 
+class CircuitOpenException(APIConnectionException):
+    """Raised instead of sending a request while the API is considered unavailable."""
+
+    def __init__(self, message):
+        """Init exception with message.
+
+        Args:
+            message: Error message.
+        """
+        super().__init__(message)
+
+
 class ISConnectionBuilderException(Exception):
     """Custom connection builder exception."""
 
@@ -43,6 +75,49 @@ class ISConnectionBuilderException(Exception):
         super().__init__(message)
 
 
+class TimedConnectionMixin:
+    """Connection which reports time spent by establishing the socket connection."""
+
+    on_connect: Callable[[float], None]
+
+    def _new_conn(self):
+        """Open socket and report the connect latency."""
+        start: float = monotonic()
+        sock = super()._new_conn()
+        self.on_connect(monotonic() - start)
+        return sock
+
+
+class LatencyAdapter(HTTPAdapter):
+    """HTTP adapter which reports time spent by establishing new connections."""
+
+    def __init__(self, on_connect: Callable[[float], None], **kwargs: Any):
+        """Init adapter.
+
+        Args:
+            on_connect: Called with connect latency in seconds whenever new connection is opened.
+            kwargs: Arguments of HTTPAdapter.
+        """
+        # Pool manager is created by the parent constructor
+        self._on_connect: Callable[[float], None] = on_connect
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        """Create pool manager whose pools use timed connections."""
+        super().init_poolmanager(*args, **kwargs)
+        attributes: Dict[str, Any] = {'on_connect': staticmethod(self._on_connect)}
+        http_connection: type = type(
+            'TimedHTTPConnection', (TimedConnectionMixin, HTTPConnection), attributes)
+        https_connection: type = type(
+            'TimedHTTPSConnection', (TimedConnectionMixin, HTTPSConnection), attributes)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('TimedHTTPConnectionPool', (HTTPConnectionPool,),
+                         {'ConnectionCls': http_connection}),
+            'https': type('TimedHTTPSConnectionPool', (HTTPSConnectionPool,),
+                          {'ConnectionCls': https_connection})
+        }
+
+
 class IConnection(ABC):
     """Connection to the API.
 
@@ -72,12 +147,30 @@ class IConnection(ABC):
         """
         pass
 
+    def wait_until_available(self, timeout: float) -> bool:
+        """Wait until API server is reachable.
+
+        Default implementation checks the server once and sleeps for the rest of the timeout
+        if it is not reachable.
+
+        Args:
+            timeout: Maximal time to wait in seconds.
+
+        Returns:
+            True if the server is reachable.
+        """
+        start: float = monotonic()
+        if self.is_available():
+            return True
+        sleep(max(0.0, timeout - (monotonic() - start)))
+        return False
+
     @abstractmethod
-    def send_cached_data_only(self, card_ids: List[str]) -> Dict[str, Any]:
+    def send_cached_data_only(self, card_ids: Iterable[Union[str, CardId]]) -> Dict[str, Any]:
         """Send cached data without actual card.
 
         Args:
-            card_ids: Cached card IDs.
+            card_ids: Cached card IDs (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
@@ -88,12 +181,13 @@ class IConnection(ABC):
         pass
 
     @abstractmethod
-    def send_data(self, actual_card_id: str, previous_card_ids: List[str] = []) -> Dict[str, Any]:
+    def send_data(self, actual_card_id: str,
+                  previous_card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
         """Send card data to the API.
 
         Args:
             actual_card_id: Currently read card.
-            previous_card_ids: List of all cached card IDs to send.
+            previous_card_ids: All cached card IDs to send (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
@@ -101,28 +195,40 @@ class IConnection(ABC):
         pass
 
     @abstractmethod
-    def send_organizator_data(self, organizator_card_id: str, card_ids: List[str] = []) -> Dict[str, Any]:
+    def send_organizator_data(self, organizator_card_id: str,
+                              card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
         """Send card data of the organizator to the API.
 
         Args:
             organizator_card_id: Card ID of the organizator.
-            card_ids: List of all cached card IDs to send.
+            card_ids: All cached card IDs to send (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
         """
         pass
 
+    def get_circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """Return circuit breaker guarding the requests if there is any."""
+        return None
+
 
 class ISConnectionBuilder:
     """Class used to build ISConnection."""
 
     def __init__(self):
-        """Init all params with None."""
+        """Init all params with None and connection pool params with defaults."""
         self.mac_address: Optional[str] = None
         self.token: Optional[str] = None
         self.baseurl: Optional[str] = None
         self.url: Optional[str] = None
+        self.pool_size: int = 2
+        self.retries: int = 0
+        self.keepalive_interval: float = 0.0
+        self.latency_tracker: Optional[LatencyTracker] = None
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+        self.connectivity_monitor: Optional[ConnectivityMonitor] = None
+        self.payload_encoder: Optional[PayloadEncoder] = None
 
     def get_mac_address(self) -> str:
         """Acquire mac address.
@@ -216,6 +322,139 @@ class ISConnectionBuilder:
         self.url = url
         return self
 
+    def get_pool_size(self) -> int:
+        """Acquire maximal number of pooled connections."""
+        return self.pool_size
+
+    def set_pool_size(self, pool_size: int) -> ISConnectionBuilder:
+        """Set maximal number of pooled connections.
+
+        Args:
+            pool_size: Maximal number of connections kept open.
+
+        Returns:
+            Itself with updated pool size.
+        """
+        self.pool_size = pool_size
+        return self
+
+    def get_retries(self) -> int:
+        """Acquire number of retries of failed connection attempts."""
+        return self.retries
+
+    def set_retries(self, retries: int) -> ISConnectionBuilder:
+        """Set number of retries of failed connection attempts.
+
+        Only connecting is retried, requests which reached the server are never sent twice.
+
+        Args:
+            retries: Number of retries.
+
+        Returns:
+            Itself with updated retries.
+        """
+        self.retries = retries
+        return self
+
+    def get_keepalive_interval(self) -> float:
+        """Acquire interval of idle connection warming in seconds."""
+        return self.keepalive_interval
+
+    def set_keepalive_interval(self, keepalive_interval: float) -> ISConnectionBuilder:
+        """Set interval of idle connection warming.
+
+        Args:
+            keepalive_interval: Seconds of inactivity after which pooled connection is refreshed,
+                                0 disables warming.
+
+        Returns:
+            Itself with updated keepalive interval.
+        """
+        self.keepalive_interval = keepalive_interval
+        return self
+
+    def get_latency_tracker(self) -> LatencyTracker:
+        """Acquire tracker deriving timeouts from measured latency.
+
+        Returns:
+            Set tracker or new tracker with default timeouts.
+        """
+        if self.latency_tracker is None:
+            return LatencyTracker()
+        return self.latency_tracker
+
+    def set_latency_tracker(self, latency_tracker: LatencyTracker) -> ISConnectionBuilder:
+        """Set tracker deriving timeouts from measured latency.
+
+        Args:
+            latency_tracker: Tracker to use.
+
+        Returns:
+            Itself with updated latency tracker.
+        """
+        self.latency_tracker = latency_tracker
+        return self
+
+    def get_circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """Acquire circuit breaker.
+
+        Returns:
+            Circuit breaker if it is set, None otherwise.
+        """
+        return self.circuit_breaker
+
+    def set_circuit_breaker(self, circuit_breaker: CircuitBreaker) -> ISConnectionBuilder:
+        """Set circuit breaker which rejects requests while the API keeps failing.
+
+        Args:
+            circuit_breaker: Circuit breaker to use.
+
+        Returns:
+            Itself with updated circuit breaker.
+        """
+        self.circuit_breaker = circuit_breaker
+        return self
+
+    def get_connectivity_monitor(self) -> Optional[ConnectivityMonitor]:
+        """Acquire connectivity monitor.
+
+        Returns:
+            Connectivity monitor if it is set, None otherwise.
+        """
+        return self.connectivity_monitor
+
+    def set_connectivity_monitor(self, connectivity_monitor: ConnectivityMonitor) -> ISConnectionBuilder:
+        """Set monitor whose cached state answers if the API is available.
+
+        Args:
+            connectivity_monitor: Connectivity monitor to use.
+
+        Returns:
+            Itself with updated connectivity monitor.
+        """
+        self.connectivity_monitor = connectivity_monitor
+        return self
+
+    def get_payload_encoder(self) -> Optional[PayloadEncoder]:
+        """Acquire payload encoder.
+
+        Returns:
+            Payload encoder if it is set, None otherwise.
+        """
+        return self.payload_encoder
+
+    def set_payload_encoder(self, payload_encoder: PayloadEncoder) -> ISConnectionBuilder:
+        """Set encoder of large batches of cards, form encoding is used for all requests otherwise.
+
+        Args:
+            payload_encoder: Payload encoder to use.
+
+        Returns:
+            Itself with updated payload encoder.
+        """
+        self.payload_encoder = payload_encoder
+        return self
+
     def build(self) -> ISConnection:
         """Build ISConnection.
 
@@ -233,8 +472,20 @@ class ISConnection(IConnection):
 
     It is used to send card data to the API and acquire response.
     It uses Requests library to make connections.
+    Connections are kept alive in a pool and refreshed once by a timer when they get idle,
+    the pool is rebuilt when the connection fails or the connectivity monitor reports
+    a change of the network.
+    Timeouts are derived from measured latency of the previous requests.
+    Optional circuit breaker rejects requests right away while the API is unavailable.
+    Optional connectivity monitor answers availability checks from its cached state.
+    Optional payload encoder sends large batches of cards compressed, form encoding is used
+    again when the server rejects them or answers with a body which is not JSON.
     """
 
+    KEEPALIVE_TIMEOUT: Final = 3.0
+    # Responses of a server which does not understand the payload
+    UNSUPPORTED_PAYLOAD_STATUS: Final = (400, 415)
+
     def __init__(self, builder: ISConnectionBuilder):
         """Init class based on builder."""
         self.logger: Logger = getLogger(__name__)
@@ -252,6 +503,108 @@ class ISConnection(IConnection):
         if token is not None:
             self.set_token(token)
 
+        self._pool_size: Final = builder.get_pool_size()
+        self._retries: Final = builder.get_retries()
+        self._keepalive_interval: Final = builder.get_keepalive_interval()
+        self._latency: Final = builder.get_latency_tracker()
+        self._circuit_breaker: Final = builder.get_circuit_breaker()
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.set_probe(self._probe)
+        self._connectivity: Final = builder.get_connectivity_monitor()
+        if self._connectivity is not None:
+            self._connectivity.add_listener(self._on_network_change)
+        self._payload_encoder: Optional[PayloadEncoder] = builder.get_payload_encoder()
+        self._session_lock: Lock = Lock()
+        # Requests share the data dictionary and each of them updates the token
+        self._request_lock: RLock = RLock()
+        self._session: Session = self._create_session()
+        self._last_used: float = monotonic()
+        # Last use after which the idle connection was refreshed
+        self._refreshed_use: Optional[float] = None
+        self._keepalive_timer: Optional[Timer] = None
+        self._schedule_keepalive()
+
+    def _create_session(self) -> Session:
+        """Create session with connection pool for both HTTP and HTTPS.
+
+        Returns:
+            New session.
+        """
+        session: Session = Session()
+        adapter: HTTPAdapter = LatencyAdapter(
+            self._latency.record_connect,
+            pool_connections=1,
+            pool_maxsize=self._pool_size,
+            max_retries=Retry(total=self._retries, read=0, status=0,
+                              backoff_factor=0.1, raise_on_status=False))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def reset_session(self) -> None:
+        """Drop all pooled connections and create a new pool."""
+        with self._session_lock:
+            old_session: Session = self._session
+            self._session = self._create_session()
+        old_session.close()
+        self.logger.info('Connection pool rebuilt.')
+
+    def _get_session(self) -> Session:
+        """Return current session and mark the pool as used."""
+        self._last_used = monotonic()
+        with self._session_lock:
+            return self._session
+
+    def _schedule_keepalive(self) -> None:
+        """Schedule next idle connection check."""
+        if self._keepalive_interval <= 0:
+            return
+        self._keepalive_timer = Timer(self._keepalive_interval, self._keepalive)
+        self._keepalive_timer.daemon = True
+        self._keepalive_timer.start()
+
+    def _keepalive(self) -> None:
+        """Refresh the connection once after it got idle, the refresh is not a use of the pool."""
+        last_used: float = self._last_used
+        if monotonic() - last_used >= self._keepalive_interval and self._refreshed_use != last_used:
+            self._refreshed_use = last_used
+            with self._session_lock:
+                session: Session = self._session
+            try:
+                session.head(self._baseurl, timeout=ISConnection.KEEPALIVE_TIMEOUT)
+                self.logger.debug('Idle connection refreshed.')
+            except requests.RequestException:
+                self.logger.debug('Idle connection refresh failed.')
+        self._schedule_keepalive()
+
+    def _on_network_change(self) -> None:
+        """Drop pooled connections which may be bound to the old address."""
+        self.logger.info('Network changed, connections are opened again.')
+        self.reset_session()
+
+    def _probe(self) -> bool:
+        """Check if the API server responds, used by the circuit breaker."""
+        return is_site_up(self._baseurl, ISConnection.KEEPALIVE_TIMEOUT, self._get_session())
+
+    def get_circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """Return circuit breaker guarding the requests if there is any."""
+        return self._circuit_breaker
+
+    def close(self) -> None:
+        """Stop connection warming and probing and close all pooled connections."""
+        if self._keepalive_timer is not None:
+            self._keepalive_timer.cancel()
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.close()
+        if self._connectivity is not None:
+            self._connectivity.close()
+        with self._session_lock:
+            self._session.close()
+
+    def get_latency_stats(self) -> Dict[str, Optional[float]]:
+        """Return measured latency and current timeouts, see LatencyTracker.get_stats."""
+        return self._latency.get_stats()
+
     def set_token(self, token: str) -> None:
         """Update connection token.
 
@@ -268,16 +621,33 @@ class ISConnection(IConnection):
     def is_available(self) -> bool:
         """Verify if API server is reachable.
 
+        State cached by the connectivity monitor is returned without waiting if it is set.
+
         Returns:
             True if connection to the server succeeded, false otherwise.
         """
-        available: bool = is_site_up(self._baseurl)
+        if self._connectivity is not None:
+            return self._connectivity.is_available()
+        available: bool = is_site_up(self._baseurl, session=self._get_session())
         if available:
             self.logger.info('Connection to the server is available.')
         else:
             self.logger.warning('Connection to the server failed.')
         return available
 
+    def wait_until_available(self, timeout: float) -> bool:
+        """Wait until API server is reachable.
+
+        Args:
+            timeout: Maximal time to wait in seconds.
+
+        Returns:
+            True if the server is reachable.
+        """
+        if self._connectivity is not None:
+            return self._connectivity.wait_until_available(timeout)
+        return super().wait_until_available(timeout)
+
     def _clear_data(self):
         """Remove stored data.
 
@@ -290,11 +660,83 @@ class ISConnection(IConnection):
         if 'init' in self._data:
             del self._data['init']
 
-    def _send_data(self, timeout: tuple = (3, 10)) -> Dict[str, Any]:
-        """Send data to the REST API.
+    def _record_result(self, success: bool) -> None:
+        """Pass result of the request to the connectivity monitor and the circuit breaker.
 
         Args:
-            timeout: Connection timeout.
+            success: True if the server responded.
+        """
+        if self._connectivity is not None:
+            self._connectivity.report(success)
+        if self._circuit_breaker is None:
+            return
+        if success:
+            self._circuit_breaker.record_success()
+        else:
+            self._circuit_breaker.record_failure()
+
+    def _get_timeout(self, cards: int) -> Tuple[float, float]:
+        """Return connect and read timeout of the request derived from the measured latency.
+
+        Args:
+            cards: Number of the sent cards.
+
+        Raises:
+            APIConnectionException: If the request can not be sent in time.
+        """
+        return self._latency.get_timeout(cards)
+
+    def _post(self, cards: int, timeout: Tuple[float, float]) -> Response:
+        """Post the data, encoded by the payload encoder if it accepts the number of cards.
+
+        Args:
+            cards: Number of the sent cards.
+            timeout: Connect and read timeout.
+
+        Returns:
+            Response of the server.
+        """
+        encoder: Optional[PayloadEncoder] = self._payload_encoder
+        if encoder is None or not encoder.accepts(cards):
+            return self._get_session().post(self._url, data=self._data, timeout=timeout)
+        body, headers = encoder.encode(self._data)
+        self.logger.debug('Payload of {0} cards encoded to {1} bytes.'.format(cards, len(body)))
+        response: Response = self._get_session().post(
+            self._url, data=body, headers=headers, timeout=timeout)
+        if not ISConnection._is_rejected(response):
+            return response
+        # Rejected payload was not processed, so nothing is recorded twice
+        self.logger.warning('Payload {0} was rejected, form encoding is used from now on.'.format(
+            headers))
+        self._payload_encoder = None
+        return self._get_session().post(self._url, data=self._data, timeout=timeout)
+
+    @staticmethod
+    def _is_rejected(response: Response) -> bool:
+        """Decide if the server did not understand the payload.
+
+        Errors of the API (err in the response) are answers to the understood request.
+
+        Args:
+            response: Response of the server.
+
+        Returns:
+            True if the status code is unsupported payload or the body is not JSON.
+        """
+        if response.status_code in ISConnection.UNSUPPORTED_PAYLOAD_STATUS:
+            return True
+        if not response.ok:
+            return False
+        try:
+            json.loads(response.text)
+        except ValueError:
+            return True
+        return False
+
+    def _send_data(self) -> Dict[str, Any]:
+        """Send data to the REST API.
+
+        Timeouts are derived from the latency estimate and from the number of sent cards.
 
         Returns:
             JSON response as dictionary.
@@ -302,10 +744,19 @@ class ISConnection(IConnection):
         Raises:
             APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
         """
+        if self._circuit_breaker is not None and not self._circuit_breaker.allow_request():
+            self._clear_data()
+            msg = "Connection to {0} is suspended after repeated failures.".format(self._url)
+            self.logger.debug(msg)
+            raise CircuitOpenException(msg)
+        cards: int = len(self._data.get('cardid', ()))
         try:
+            timeout: Tuple[float, float] = self._get_timeout(cards)
             self.logger.info('Sending {0}'.format(self._data))
-            response: Response = requests.post(
-                self._url, data=self._data, timeout=timeout)
+            response: Response = self._post(cards, timeout)
+            self._latency.record_response(response.elapsed.total_seconds(), cards)
+            # Client errors are answered by a working server
+            self._record_result(response.status_code < 500)
             response.raise_for_status()
             self.logger.info(
                 "Successfuly sent - response: {0}".format(response.text))
@@ -314,13 +765,20 @@ class ISConnection(IConnection):
             if 'token' in json_response:
                 self.set_token(json_response['token'])
             return json_response
-        except requests.ConnectionError:
+        except requests.ConnectionError as e:
             msg = "Connection to {0} failed.".format(self._url)
             self.logger.warning(msg)
+            if isinstance(e, requests.ConnectTimeout):
+                self._latency.record_connect(timeout[0])
+            self._record_result(False)
+            # Pooled connections may be stale (e.g. after network change)
+            self.reset_session()
             raise APIConnectionException(msg)
         except requests.Timeout:
             msg = "Connection to {0} timed out.".format(self._url)
             self.logger.warning(msg)
+            self._latency.record_timeout(timeout, cards)
+            self._record_result(False)
             raise APIConnectionException(msg)
         except requests.HTTPError as e:
             msg = "Connection to {0} failed. Status code was {1}.".format(
@@ -330,11 +788,11 @@ class ISConnection(IConnection):
         finally:
             self._clear_data()
 
-    def send_cached_data_only(self, card_ids: List[str]) -> Dict[str, Any]:
+    def send_cached_data_only(self, card_ids: Iterable[Union[str, CardId]]) -> Dict[str, Any]:
         """Send cached data without actual card.
 
         Args:
-            card_ids: Cached card IDs.
+            card_ids: Cached card IDs (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
@@ -342,16 +800,18 @@ class ISConnection(IConnection):
         Raises:
             APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
         """
-        self.logger.debug('Sending cached cards: {0}'.format(card_ids))
-        self._data['cardid'] = deepcopy(card_ids)
-        return self._send_data()
+        with self._request_lock:
+            self._data['cardid'] = [format_card(card) for card in card_ids]
+            self.logger.debug('Sending cached cards: {0}'.format(self._data['cardid']))
+            return self._send_data()
 
-    def send_data(self, actual_card_id: str, previous_card_ids: List[str] = []) -> Dict[str, Any]:
+    def send_data(self, actual_card_id: str,
+                  previous_card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
         """Send card data to the API.
 
         Args:
             actual_card_id: Currently read card.
-            previous_card_ids: List of all cached card IDs to send.
+            previous_card_ids: All cached card IDs to send (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
@@ -359,22 +819,21 @@ class ISConnection(IConnection):
         Raises:
             APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
         """
+        card_ids: List[str] = [format_card(card) for card in previous_card_ids]
         self.logger.debug('Sending card: {0}, previous cards: {1}'.format(
-            actual_card_id, previous_card_ids))
-        card_ids: List[str] = deepcopy(previous_card_ids)
-        card_ids.append(actual_card_id)
-        self._data['cardid'] = card_ids
-        if len(self._data['cardid']) > 5:
-            # Use extended timeout if many data are send
-            return self._send_data((10, 30))
-        return self._send_data()
-
-    def send_organizator_data(self, organizator_card_id: str, card_ids: List[str] = []) -> Dict[str, Any]:
+            actual_card_id, card_ids))
+        card_ids.append(format_card(actual_card_id))
+        with self._request_lock:
+            self._data['cardid'] = card_ids
+            return self._send_data()
+
+    def send_organizator_data(self, organizator_card_id: str,
+                              card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
         """Send card data of the organizator to the API.
 
         Args:
             organizator_card_id: Card ID of the organizator.
-            card_ids: List of all cached card IDs to send.
+            card_ids: All cached card IDs to send (hex strings or packed).
 
         Returns:
             JSON response as dictionary.
@@ -384,5 +843,6 @@ class ISConnection(IConnection):
         """
         self.logger.debug(
             'Sending organizator card: {0}'.format(organizator_card_id))
-        self._data['init'] = '1'
-        return self.send_data(organizator_card_id, card_ids)
+        with self._request_lock:
+            self._data['init'] = '1'
+            return self.send_data(organizator_card_id, card_ids)
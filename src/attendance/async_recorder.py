@@ -0,0 +1,390 @@
+"""Asyncio variant of the attendance recorder.
+
+Card reading, button polling, uploads and feedback (display and buzzer) run as concurrent tasks
+of a single event loop. Blocking calls of the hardware and of the connection are run in
+dedicated worker threads so they never block the loop.
+"""
+from .api_connection import APIConnectionException
+from .api_connection import ISConnection
+from .api_connection import ISConnectionBuilder
+from .attendance_recorder import AttendanceRecorder
+from .attendance_recorder import State
+from .button_controller import IButtonController
+from .buzzer import IBuzzer
+from .card_events import CardEventStream
+from .card_id import CardId
+from .card_reader import ICardReader
+from .card_reader import InvalidDataException
+from .card_reader import NoDataException
+from .display import IDisplay
+from .latency import Backoff
+from .resources.config import config
+from .upload_queue import UploadQueue
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import local
+from time import monotonic
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Final
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import asyncio
+
+
+class AsyncISConnection(ISConnection):
+    """ISConnection with coroutine variants of the requests.
+
+    Requests run in a single connection thread, so they keep their order (every response
+    updates the token used by the next request) and the event loop is never blocked.
+    Timeouts of the requests are shortened to the deadline of the submitted operation,
+    so the operation is never abandoned while its request is still running.
+    Synchronous methods of the IConnection contract stay available.
+    """
+
+    def __init__(self, builder: ISConnectionBuilder, timeout: float = 45.0):
+        """Init connection based on builder.
+
+        Args:
+            builder: Builder with connection parameters.
+            timeout: Maximal time of a single submitted operation in seconds.
+        """
+        super().__init__(builder)
+        self._timeout: Final = timeout
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='connection')
+        # Deadline of the operation run by the connection thread
+        self._local: local = local()
+
+    async def submit(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking function which uses this connection in the connection thread.
+
+        Requests of the function time out at the deadline of the operation, operations
+        which waited for the thread until their deadline fail without sending anything.
+
+        Args:
+            function: Function to run.
+            args: Arguments of the function.
+
+        Returns:
+            Result of the function.
+
+        Raises:
+            APIConnectionException: If the function does not finish in time.
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        deadline: float = monotonic() + self._timeout
+        return await loop.run_in_executor(
+            self._executor, partial(self._run_until, deadline, function, *args))
+
+    def _run_until(self, deadline: float, function: Callable[..., Any], *args: Any) -> Any:
+        """Run function in the connection thread with requests limited by the deadline."""
+        self._local.deadline = deadline
+        try:
+            return function(*args)
+        finally:
+            self._local.deadline = None
+
+    def _get_timeout(self, cards: int) -> Tuple[float, float]:
+        """Return timeouts of the request shortened to the deadline of the operation.
+
+        Args:
+            cards: Number of the sent cards.
+
+        Raises:
+            APIConnectionException: If the deadline of the operation has passed.
+        """
+        connect, read = super()._get_timeout(cards)
+        deadline: Optional[float] = getattr(self._local, 'deadline', None)
+        if deadline is None:
+            return connect, read
+        remaining: float = deadline - monotonic()
+        if remaining <= 0:
+            msg = "Connection to {0} timed out.".format(self._url)
+            self.logger.warning(msg)
+            raise APIConnectionException(msg)
+        return min(connect, remaining), min(read, remaining)
+
+    async def is_available_async(self) -> bool:
+        """Verify if API server is reachable."""
+        return await self.submit(self.is_available)
+
+    async def send_cached_data_only_async(
+            self, card_ids: Iterable[Union[str, CardId]]) -> Dict[str, Any]:
+        """Send cached data without actual card, see send_cached_data_only."""
+        return await self.submit(self.send_cached_data_only, card_ids)
+
+    async def send_data_async(self, actual_card_id: str,
+                              previous_card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
+        """Send card data to the API, see send_data."""
+        return await self.submit(self.send_data, actual_card_id, previous_card_ids)
+
+    async def send_organizator_data_async(self, organizator_card_id: str,
+                                          card_ids: Iterable[Union[str, CardId]] = ()) -> Dict[str, Any]:
+        """Send card data of the organizator to the API, see send_organizator_data."""
+        return await self.submit(self.send_organizator_data, organizator_card_id, card_ids)
+
+    def close(self) -> None:
+        """Close the connection and stop the connection thread."""
+        super().close()
+        self._executor.shutdown(wait=False)
+
+
+class AsyncCardReader:
+    """Coroutine adapter of ICardReader."""
+
+    def __init__(self, reader: ICardReader):
+        """Init adapter.
+
+        Args:
+            reader: Reader which is polled in its own thread.
+        """
+        self._reader: Final = reader
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='reader')
+
+    async def read_card(self) -> str:
+        """Wait for a card.
+
+        Cancellation of the task cancels the running read. Cancellation which comes after
+        the read has returned is discarded, so it does not cancel the next read.
+
+        Returns:
+            Hex string representation of card data.
+
+        Raises:
+            InvalidDataException: If card data are corrupted.
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            try:
+                return await loop.run_in_executor(
+                    self._executor, partial(self._reader.read_card, True))
+            except NoDataException:
+                continue
+            except asyncio.CancelledError:
+                self._reader.cancel()
+                # Runs after the read in the reader thread, whichever way the read ended
+                self._executor.submit(self._reader.discard_cancel)
+                raise
+
+
+class AsyncButtonController:
+    """Coroutine adapter of IButtonController."""
+
+    POLL_INTERVAL: Final = 0.05
+    WAIT_INTERVAL: Final = 0.5
+
+    def __init__(self, controller: IButtonController):
+        """Init adapter.
+
+        Args:
+            controller: Controller which is waited for in its own thread.
+        """
+        self._controller: Final = controller
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='button')
+
+    async def wait_for_press(self, edge: bool = False) -> None:
+        """Wait until the button is pushed.
+
+        The controller waits for a limited time only, so the thread is released soon
+        after the task is cancelled.
+
+        Args:
+            edge: If true then button which is already pushed has to be released first.
+        """
+        if edge:
+            while self._controller.is_pushed():
+                await asyncio.sleep(AsyncButtonController.POLL_INTERVAL)
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while not await loop.run_in_executor(
+                self._executor,
+                partial(self._controller.wait_for_press, AsyncButtonController.WAIT_INTERVAL)):
+            pass
+
+
+class AsyncAttendanceRecorder(AttendanceRecorder):
+    """Attendance recorder driven by asyncio event loop.
+
+    Cards are read, uploaded and signalized by separate tasks, so slow network
+    or slow display never delays reading of the next card.
+    """
+
+    def __init__(self,
+                 display: IDisplay,
+                 reader: ICardReader,
+                 connection: AsyncISConnection,
+                 buzzer: IBuzzer,
+                 button_controller: IButtonController,
+                 queue_size: int = 50):
+        """Inject dependencies and init cache.
+
+        Args:
+            queue_size: Maximal number of read cards waiting for upload.
+        """
+        super().__init__(display, reader, connection, buzzer, button_controller)
+        self._async_connection: Final = connection
+        self._async_reader: AsyncCardReader = AsyncCardReader(reader)
+        self._async_button: AsyncButtonController = AsyncButtonController(button_controller)
+        self._queue_size: Final = queue_size
+        self._feedback_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='feedback')
+        # Cache is written in its own thread, in order of the reads
+        self._cache_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='cache')
+        self._feedback_queue: Optional[asyncio.Queue] = None
+        self._upload_queue_async: Optional[asyncio.Queue] = None
+
+    def _create_card_events(self) -> Optional[CardEventStream]:
+        """Return None, cards are read by the reading task."""
+        if config['CardReader'].getboolean('stream'):
+            self.logger.info('Card stream is not used in asyncio mode, cards are read by a task.')
+        return None
+
+    def _create_upload_queue(self) -> Optional[UploadQueue]:
+        """Return None, cards are uploaded by the upload task."""
+        if config['Upload'].getboolean('background'):
+            self.logger.info('Upload queue is not used in asyncio mode, cards are uploaded by a task.')
+        return None
+
+    def _feedback(self, function: Callable[..., None], *args: Any) -> None:
+        """Schedule display or buzzer call.
+
+        Args:
+            function: Blocking function to call.
+            args: Arguments of the function.
+        """
+        self._feedback_queue.put_nowait((function, args))
+
+    async def _feedback_loop(self) -> None:
+        """Run scheduled display and buzzer calls one by one."""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            item: Tuple[Callable[..., None], Tuple[Any, ...]] = await self._feedback_queue.get()
+            function, args = item
+            try:
+                await loop.run_in_executor(self._feedback_executor, partial(function, *args))
+            except Exception:
+                self.logger.exception('Feedback failed.')
+
+    def _feedback_result(self, result: Dict[str, Any], err: bool) -> None:
+        """Schedule display of the API response."""
+        self._feedback(self._display.show, result.get('msga', ''), result.get('msgb', ''), False)
+        self._feedback(self._buzzer.beep, not err)
+
+    def _feedback_invalid_card(self) -> None:
+        """Schedule signalization of invalid card."""
+        self.logger.debug('Invalid card read.')
+        self._feedback(self._buzzer.beep, False)
+        self._feedback(self._display.show, 'INVALID CARD!', 'please try again.', False)
+
+    async def _read_organizator_card_async(self) -> bool:
+        """Read organizator card and send it to API with all the previously read cards.
+
+        Returns:
+            True if the card was succesfuly read and send to the API without an error response.
+        """
+        self.logger.debug('Reading the organizator card.')
+        self._feedback(self._display.show, 'Please push the button to start.')
+        await self._async_button.wait_for_press()
+        try:
+            self._feedback(self._display.show, 'Ready to read an organizator card.')
+            card: str = await self._async_reader.read_card()
+            result: Dict[str, Any] = await self._async_connection.submit(
+                self._uploader.send_organizator_data, card)
+            err: bool = self._process_organizator_result(result)
+            self._feedback_result(result, err)
+            return not err
+        except InvalidDataException:
+            self._feedback_invalid_card()
+        except APIConnectionException as e:
+            self._feedback(self._display.show, str(e), 'Please try again.')
+        return False
+
+    async def _read_cards_loop(self) -> None:
+        """Read participant cards and cache them, in online mode queue them for upload."""
+        self._feedback(self._display.show, 'Ready to read a card.')
+        while True:
+            try:
+                card: str = await self._async_reader.read_card()
+            except InvalidDataException:
+                self._feedback_invalid_card()
+                continue
+            await asyncio.get_running_loop().run_in_executor(
+                self._cache_executor, partial(self._add_card, card))
+            if self._state == State.OFFLINE:
+                self._feedback(self._display.show, 'Card read successfully.', '', False)
+            elif self._upload_queue_async.full():
+                self._feedback(self._display.show, 'Card read successfully.',
+                               'Card was saved and will be send later.')
+            else:
+                self._upload_queue_async.put_nowait(card)
+            self._feedback(self._buzzer.beep, True)
+
+    async def _upload_loop(self) -> None:
+        """Send queued cards in order they were read."""
+        while True:
+            card: str = await self._upload_queue_async.get()
+            try:
+                result: Dict[str, Any] = await self._async_connection.submit(
+                    self._uploader.send_data, card)
+            except APIConnectionException as e:
+                self._feedback(self._display.show, str(e),
+                               'Card was saved and will be send later.')
+                continue
+            err: bool = result.get('err', '0') != '0'
+            self._feedback(self._display.show, result.get('msga', ''), result.get('msgb', ''), False)
+            if err:
+                self._feedback(self._buzzer.beep, False)
+
+    async def _button_loop(self) -> None:
+        """Send cached cards when the button is pushed in offline mode."""
+        while True:
+            await self._async_button.wait_for_press(edge=True)
+            if self._state != State.OFFLINE:
+                continue
+            backoff: Backoff = self._create_backoff()
+            while True:
+                try:
+                    await self._async_connection.submit(self._uploader.send_pending)
+                    self._feedback(self._display.show, 'Cached card IDs succesfully sent.', '', False)
+                    break
+                except APIConnectionException as e:
+                    delay: Optional[float] = backoff.next_delay()
+                    if delay is None:
+                        self._feedback(self._display.show, str(e), 'Push the button to try again.')
+                        break
+                    self._feedback(self._display.show, str(e),
+                                   'Going to try again after {0:.0f} seconds.'.format(delay))
+                    await asyncio.sleep(delay)
+
+    async def run(self) -> None:
+        """Read organizator card and then run all participant tasks until cancelled."""
+        self._feedback_queue = asyncio.Queue()
+        self._upload_queue_async = asyncio.Queue(self._queue_size)
+        tasks: List[asyncio.Future] = [asyncio.ensure_future(self._feedback_loop())]
+        try:
+            while not await self._read_organizator_card_async():
+                pass
+            self.logger.info('Reading cards started.')
+            tasks += [asyncio.ensure_future(self._read_cards_loop()),
+                      asyncio.ensure_future(self._upload_loop()),
+                      asyncio.ensure_future(self._button_loop())]
+            await asyncio.gather(*tasks[1:])
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def start(self) -> None:
+        """Start recording attendance."""
+        self.logger.info('Attendance recording started.')
+        self._verify_connection()
+        asyncio.run(self.run())
@@ -2,38 +2,51 @@ from .api_connection import APIConnectionException
 from .api_connection import IConnection
 from .api_connection import ISConnection
 from .api_connection import ISConnectionBuilder
-from .button_controller import ButtonController
 from .button_controller import IButtonController
-from .buzzer import Buzzer
 from .buzzer import IBuzzer
+from .card_events import CardEvent
+from .card_events import CardEventStream
+from .card_id import is_valid_card
+from .card_id import pack_card
 from .card_reader import CardReader
 from .card_reader import ICardReader
 from .card_reader import InvalidDataException
 from .card_reader import NoDataException
+from .card_store import ICardStore
+from .card_store import JournalCardStore
+from .circuit_breaker import CircuitBreaker
+from .circuit_breaker import CircuitState
+from .connectivity import ConnectivityMonitor
 from .display import IDisplay
-from .display import OLEDdisplay
+from .latency import Backoff
+from .latency import LatencyTracker
+from .ledger import SQLiteCardStore
+from .payload import Compression
+from .payload import PayloadEncoder
+from .payload import PayloadFormat
 from .resources.config import config
+from .upload_queue import UploadQueue
+from .uploader import DeltaUploader
 from .utils import create_cache_folder
 from .utils import get_cache_file_path
+from .utils import get_journal_file_path
+from .utils import get_ledger_file_path
 from .utils import get_mac_address
 
-from luma.core.interface.serial import i2c
-from luma.oled.device import sh1106
-
 from enum import Enum
 from logging import getLogger
 from logging import Logger
 from pathlib import Path
+from threading import Thread
+from time import monotonic
 from time import sleep
 from typing import Any
 from typing import Dict
 from typing import Final
 from typing import Optional
-from typing import Set
 
-import json
+import argparse
 import logging
-import re
 
 
 class State(Enum):
@@ -50,7 +63,7 @@ class AttendanceRecorder:
     Red cards are saved to cached file until they are successfuly send.
     """
 
-    CARD_REGEX: Final = re.compile('^[0-9a-f]{10}$')
+    RETRY_INTERVAL: Final = 5.0
 
     def __init__(self,
                  display: IDisplay,
@@ -66,7 +79,28 @@ class AttendanceRecorder:
         self._buzzer: IBuzzer = buzzer
         self._button_controller: IButtonController = button_controller
         self._state: State = State.ONLINE
+        self._card_events: Optional[CardEventStream] = self._create_card_events()
         self._init_cache_file()
+        circuit_breaker: Optional[CircuitBreaker] = connection.get_circuit_breaker()
+        if circuit_breaker is not None:
+            circuit_breaker.add_listener(self._on_circuit_change)
+
+    def _create_card_events(self) -> Optional[CardEventStream]:
+        """Create stream of the card reader if it is enabled in the CardReader section."""
+        if not config['CardReader'].getboolean('stream'):
+            return None
+        return self._reader.stream(int(config['CardReader']['queue_size']),
+                                   config['CardReader']['overflow'],
+                                   float(config['CardReader']['debounce']))
+
+    def _create_upload_queue(self) -> Optional[UploadQueue]:
+        """Create background upload queue if it is enabled in the Upload section."""
+        if not config['Upload'].getboolean('background'):
+            return None
+        return UploadQueue(self._uploader,
+                           int(config['Upload']['queue_size']),
+                           self._on_upload_result,
+                           self._on_upload_error)
 
     def _init_cache_file(self) -> None:
         """Initialize cache file.
@@ -75,56 +109,83 @@ class AttendanceRecorder:
         If cache file already exist loads all previously cached cards.
         """
         create_cache_folder()
-        self._cache_file_path: Path = Path(get_cache_file_path())
-        self._cards: Set[str] = set()
+        self._cache: ICardStore
+        if config['Cache']['backend'] == 'sqlite':
+            self._cache = SQLiteCardStore(Path(get_ledger_file_path()))
+        else:
+            self._cache = JournalCardStore(
+                Path(get_cache_file_path()),
+                Path(get_journal_file_path()),
+                float(config['Cache']['commit_window']),
+                int(config['Cache']['compact_threshold']))
+        self._uploader: DeltaUploader = DeltaUploader(
+            self._connection, self._cache, int(config['Upload']['batch_size']))
+        self._upload_queue: Optional[UploadQueue] = self._create_upload_queue()
         self._load_cached_data()
 
     def _load_cached_data(self) -> None:
-        """Load cached cards and token from cache file."""
-        if not self._cache_file_path.exists():
-            return
-        with open(self._cache_file_path, 'r', encoding='utf-8') as json_file:
-            data: Dict[str, Any] = json.load(json_file)
-            if 'token' in data:
-                self._connection.set_token(data['token'])
-            if 'cards' in data:
-                for card in data['cards']:
-                    self._add_card(card, cache=False)
-
-    def _clear_cached_cards(self) -> None:
-        """Empty cache file."""
-        with open(self._cache_file_path, 'w', encoding='utf-8') as f:
-            f.write('{}\n')
-        self.logger.debug('Cache file cleared.')
-
-    def _add_card(self, card: str, cache: bool = True) -> None:
-        """Add card to set of read cards.
+        """Load cached cards and token by replaying cache snapshot and journal."""
+        self._cache.load()
+        token: Optional[str] = self._cache.get_token()
+        if token is not None:
+            self._connection.set_token(token)
+
+    def _add_card(self, card: str) -> bool:
+        """Add card to the cache.
 
         Args:
             card: Card to add.
-            cache: If true then card will be also saved to cache file.
+
+        Returns:
+            True if the card was cached, false if it is invalid, already cached or acknowledged.
         """
-        if AttendanceRecorder.CARD_REGEX.match(card):
-            if card in self._cards:
-                self.logger.debug('Card {0} already contained.'.format(card))
-                return
-            self._cards.add(card)
-            if cache:
-                with open(self._cache_file_path, 'w', encoding='utf-8') as json_file:
-                    json.dump({
-                        'token': self._connection.get_token(),
-                        'cards': list(self._cards)
-                    }, json_file)
-                self.logger.info('Card {0} cached.'.format(card))
+        if not is_valid_card(card):
+            return False
+        token: Optional[str] = self._connection.get_token()
+        if token is not None:
+            self._cache.set_token(token)
+        if not self._cache.add_card(pack_card(card)):
+            self.logger.debug('Card {0} already contained.'.format(card))
+            return False
+        self.logger.info('Card {0} cached.'.format(card))
+        return True
+
+    def _create_backoff(self) -> Backoff:
+        """Create backoff of the cached cards upload configured in the Upload section."""
+        return Backoff(float(config['Upload']['retry_delay']),
+                       float(config['Upload']['max_retry_delay']),
+                       int(config['Upload']['max_retries']))
+
+    def _read_card(self, raise_if_no_data: bool = False) -> str:
+        """Read card directly from the reader or take it from the card event stream.
+
+        Args:
+            raise_if_no_data: If true the NoDataException is raised if no card was read.
+
+        Returns:
+            Hex string representation of card data.
+
+        Raises:
+            NoDataException: If raise_if_no_data is set to True and no card was read.
+            InvalidDataException: If card data are corrupted.
+        """
+        if self._card_events is None:
+            return self._reader.read_card(raise_if_no_data)
+        event: Optional[CardEvent] = self._card_events.get(
+            CardReader.TIMEOUT if raise_if_no_data else None)
+        if event is None:
+            raise NoDataException('No card data was read.')
+        if event.card is None:
+            raise InvalidDataException('Card data are invalid - incomplete or corrupted data.')
+        self.logger.debug('Card {0} taken from {1}.'.format(event.card, event.source))
+        return event.card
 
     def _show_initial_message(self) -> None:
         """Display the initial message and verify internet connection."""
-        while True:
-            if self._connection.is_available():
-                self._display.show('Connection successful')
-                return
+        while not self._connection.wait_until_available(AttendanceRecorder.RETRY_INTERVAL):
             self._display.show('Connection failed!',
                                'Retry in 5 seconds ...', False)
+        self._display.show('Connection successful')
 
     def _show_result(self, result: Dict[str, Any], err: bool) -> None:
         """Display the data received from API."""
@@ -143,6 +204,38 @@ class AttendanceRecorder:
         self._buzzer.beep(False)
         self._display.show('INVALID CARD!', 'please try again.', False)
 
+    def _process_organizator_result(self, result: Dict[str, Any]) -> bool:
+        """Set state and start new session based on the API response to the organizator card.
+
+        Returns:
+            True if the API responded with an error.
+        """
+        # Set state from response
+        if 'state' in result:
+            self._state = State(result['state'])
+        err: bool = result.get('err', '0') != '0'
+
+        if err:
+            self.logger.debug('Error received from API.')
+        else:
+            self.logger.debug('Received response without error.')
+            session: Optional[str] = self._connection.get_token()
+            if session is not None:
+                self._cache.start_session(session)
+        return err
+
+    def _discard_cards_before(self, time: float) -> None:
+        """Drop cards tapped before the time, e.g. participants tapping before the organizator.
+
+        Args:
+            time: Monotonic time, cards read earlier are dropped.
+        """
+        if self._card_events is None:
+            return
+        stale: int = self._card_events.discard_before(time)
+        if stale:
+            self.logger.info('{0} cards tapped before the button was pushed dropped.'.format(stale))
+
     def _read_organizator_card(self) -> bool:
         """Read organizator card and send it to API with all the previously read cards.
 
@@ -150,31 +243,20 @@ class AttendanceRecorder:
             True if the card was succesfuly read and send to the API without an error response.
         """
         self.logger.debug('Reading the organizator card.')
-        while not self._button_controller.is_pushed():
-            self._display.show('Please push the button to start.')
-            sleep(0.5)
+        self._display.show('Please push the button to start.')
+        self._button_controller.wait_for_press()
+        self._discard_cards_before(monotonic())
         try:
             # Show information
             self._display.show('Ready to read an organizator card.')
 
             # Read card
-            card: str = self._reader.read_card()
+            card: str = self._read_card()
 
             # Send data to the API
-            result: Dict[str, Any] = self._connection.send_organizator_data(
-                card, list(self._cards))
-
-            self._clear_cached_cards()
-
-            # Set state from response
-            if 'state' in result:
-                self._state = State(result['state'])
-            err: bool = result.get('err', '0') != '0'
+            result: Dict[str, Any] = self._uploader.send_organizator_data(card)
 
-            if err:
-                self.logger.debug('Error received from API.')
-            else:
-                self.logger.debug('Received response without error.')
+            err: bool = self._process_organizator_result(result)
             self._show_result(result, err)
             return not err
         except InvalidDataException:
@@ -191,13 +273,10 @@ class AttendanceRecorder:
             self._display.show('Ready to read a card.')
 
             # Read card
-            card: str = self._reader.read_card()
+            card: str = self._read_card()
 
             # Send card data to API
-            result: Dict[str, Any] = self._connection.send_data(
-                card, list(self._cards))
-
-            self._clear_cached_cards()
+            result: Dict[str, Any] = self._uploader.send_data(card)
 
             err: bool = result.get('err', '0') != '0'
             if err:
@@ -215,11 +294,68 @@ class AttendanceRecorder:
             self._show_connection_unavailable(
                 e, 'Card was saved and will be send later.')
 
+    def _read_participant_card_background(self) -> None:
+        """Read participant card in online mode and leave sending it to the upload queue.
+
+        The card is cached first so it is not lost if the upload fails.
+        Result of the upload is displayed and signalized by _on_upload_result when it arrives,
+        the ready prompt is shown again after it.
+        """
+        try:
+            card: str = self._read_card()
+            if not is_valid_card(card):
+                raise InvalidDataException('Card data are invalid - {0}.'.format(card))
+            if not self._add_card(card):
+                self._display.show('Card was already read.', can_be_killed=False)
+            elif not self._upload_queue.put(card):
+                self._display.show('Card read successfully.',
+                                   'Card was saved and will be send later.', False)
+            else:
+                # Replaced by the result of the upload
+                self._display.show('Card queued.', 'Waiting for the server ...')
+                return
+            # No upload result follows
+            self._buzzer.beep(True)
+        except InvalidDataException:
+            self._signalize_invalid_card()
+        self._display.show('Ready to read a card.')
+
+    def _on_upload_result(self, card: str, result: Dict[str, Any]) -> None:
+        """Display result of the card sent by the upload queue."""
+        err: bool = result.get('err', '0') != '0'
+        if err:
+            self.logger.debug('Error received from API for card {0}.'.format(card))
+        else:
+            self.logger.debug('Received response without error for card {0}.'.format(card))
+        self._show_result(result, err)
+        self._display.show('Ready to read a card.')
+
+    def _on_upload_error(self, card: str, error: APIConnectionException) -> None:
+        """Display failure of the card sent by the upload queue."""
+        self._display.show(str(error), 'Card was saved and will be send later.', False)
+        self._display.show('Ready to read a card.')
+
+    def _on_circuit_change(self, old_state: CircuitState, state: CircuitState) -> None:
+        """Start sending cached cards in the background when the API is reachable again."""
+        if state == CircuitState.OPEN:
+            self.logger.info('API unavailable, cards are cached until it recovers.')
+        elif state == CircuitState.CLOSED and self._state == State.ONLINE:
+            self.logger.info('API available again, sending cached cards.')
+            Thread(target=self._flush_cached_cards, daemon=True).start()
+
+    def _flush_cached_cards(self) -> None:
+        """Send cached cards, they stay cached if it fails."""
+        try:
+            self._uploader.send_pending()
+            self.logger.debug('Upload statistics: {0}'.format(self._uploader.stats.as_dict()))
+        except APIConnectionException as e:
+            self.logger.warning('Sending cached cards failed: {0}'.format(e))
+
     def _read_participant_card_offline(self) -> None:
         """Read participant card in offline mode."""
         try:
             self._display.show('Ready to read a card.')
-            card: str = self._reader.read_card(True)
+            card: str = self._read_card(True)
             self._add_card(card)
             self._display.show('Card read successfully.', can_be_killed=False)
             self._buzzer.beep(True)
@@ -229,27 +365,40 @@ class AttendanceRecorder:
             return
 
     def _send_offline_data(self) -> None:
-        """Send all the cached card IDs."""
+        """Send all the cached card IDs.
+
+        Failed upload is retried with growing delays, after the last retry
+        the cards stay cached until the button is pushed again.
+        """
+        backoff: Backoff = self._create_backoff()
         while True:
             try:
-                self._connection.send_cached_data_only(list(self._cards))
-                self._clear_cached_cards()
+                self._uploader.send_pending()
+                self.logger.debug('Upload statistics: {0}'.format(self._uploader.stats.as_dict()))
                 self._display.show('Cached card IDs succesfully sent.',
                                    can_be_killed=False)
                 break
             except APIConnectionException as e:
+                delay: Optional[float] = backoff.next_delay()
+                if delay is None:
+                    self._display.show(str(e), 'Push the button to try again.')
+                    break
                 self._display.show(
-                    str(e), 'Going to try again after 5 seconds.')
-                sleep(5)
+                    str(e), 'Going to try again after {0:.0f} seconds.'.format(delay))
+                sleep(delay)
 
     def _read_participant_card(self) -> None:
         """Read participant card based on mode (online/offline)."""
         self.logger.debug('Reading the participant card.')
         if self._state == State.ONLINE:
-            self._read_participant_card_online()
+            if self._upload_queue is not None:
+                self._read_participant_card_background()
+            else:
+                self._read_participant_card_online()
 
         elif self._state == State.OFFLINE:
-            if self._button_controller.is_pushed():
+            # Press made while the card was being read is queued, not missed
+            if self._button_controller.wait_for_press(0):
                 self._send_offline_data()
             else:
                 self._read_participant_card_offline()
@@ -261,17 +410,56 @@ class AttendanceRecorder:
         while True:
             if reading_organizator_card:
                 reading_organizator_card = not self._read_organizator_card()
+                if not reading_organizator_card and self._upload_queue is not None:
+                    # Cards read in the background are not prompted for one by one
+                    self._display.show('Ready to read a card.')
             else:
                 self._read_participant_card()
 
+    def _log_connection(self) -> None:
+        """Wait for the server and log its state, the display is left to the recording loop."""
+        while not self._connection.wait_until_available(AttendanceRecorder.RETRY_INTERVAL):
+            self.logger.warning('Server is not reachable yet, cards are cached meanwhile.')
+        self.logger.info('Connection successful.')
+
+    def _verify_connection(self) -> None:
+        """Verify the connection, in the background in the fast start mode.
+
+        In the fast start mode cards are read while the server is still being reached,
+        the state of the connection is only logged so it does not replace the prompts.
+        """
+        if config['Recorder'].getboolean('fast_start'):
+            Thread(target=self._log_connection, name='connection-check', daemon=True).start()
+        else:
+            self._show_initial_message()
+
     def start(self) -> None:
         """Start recording attendance."""
         self.logger.info('Attendance recording started.')
-        self._show_initial_message()
+        if self._card_events is not None:
+            # Taps are queued even while the connection is verified
+            self._card_events.start()
+        if self._upload_queue is not None:
+            self._upload_queue.start()
+        self._verify_connection()
         self._record_cards()
 
 
 def main():
+    # Imported here so the device drivers are loaded only when the recorder is run
+    from .hardware import Backend
+    from .hardware import create_hardware
+    from .hardware import Hardware
+
+    parser = argparse.ArgumentParser(description='Record attendance using ISIC cards.')
+    parser.add_argument('--hardware', choices=[backend.value for backend in Backend],
+                        default=config['Hardware']['backend'], help='hardware backend')
+    parser.add_argument('--replay', type=Path, default=config['Hardware']['replay_file'] or None,
+                        help='capture of the card reader replayed by the replay backend')
+    parser.add_argument('--speed', type=float, default=float(config['Hardware']['replay_speed']),
+                        help='speed multiplier of the replay')
+    args = parser.parse_args()
+
     logging.basicConfig(
         level=logging.DEBUG,
         format='%(asctime)s -- %(name)s %(levelname)s - %(message)s')
@@ -280,12 +468,55 @@ def main():
     connection_builder.set_mac_address(get_mac_address())
     connection_builder.set_baseurl(config['Connection']['baseurl'])
     connection_builder.set_url(config['Connection']['url'])
-
-    AttendanceRecorder(OLEDdisplay(sh1106(i2c())),
-                       CardReader(),
+    connection_builder.set_pool_size(int(config['Connection']['pool_size']))
+    connection_builder.set_retries(int(config['Connection']['retries']))
+    connection_builder.set_connectivity_monitor(ConnectivityMonitor(
+        config['Connection']['baseurl'],
+        float(config['Connectivity']['ttl']),
+        float(config['Connectivity']['retry_interval']),
+        float(config['Connectivity']['probe_timeout'])))
+    payload_format: PayloadFormat = PayloadFormat(config['Payload']['format'])
+    if payload_format != PayloadFormat.FORM:
+        connection_builder.set_payload_encoder(PayloadEncoder(
+            payload_format,
+            Compression(config['Payload']['compression']),
+            int(config['Payload']['min_cards'])))
+    connection_builder.set_keepalive_interval(
+        float(config['Connection']['keepalive_interval']))
+    connection_builder.set_latency_tracker(LatencyTracker(
+        float(config['Connection']['connect_timeout']),
+        float(config['Connection']['read_timeout']),
+        float(config['Connection']['min_timeout']),
+        float(config['Connection']['max_timeout'])))
+    if int(config['Circuit']['failure_threshold']) > 0:
+        connection_builder.set_circuit_breaker(CircuitBreaker(
+            int(config['Circuit']['failure_threshold']),
+            float(config['Circuit']['reset_timeout'])))
+
+    hardware: Hardware = create_hardware(Backend(args.hardware), args.replay, args.speed)
+    if hardware.gpio is not None:
+        logging.getLogger(__name__).info('Simulated card reader listens on {0}.'.format(
+            hardware.replay.port_name))
+        # Simulated operator starts the recording
+        hardware.push_button()
+
+    if config['Recorder'].getboolean('asyncio'):
+        # Imported here because the async recorder extends this module
+        from .async_recorder import AsyncAttendanceRecorder
+        from .async_recorder import AsyncISConnection
+        AsyncAttendanceRecorder(hardware.display,
+                                hardware.reader,
+                                AsyncISConnection(connection_builder),
+                                hardware.buzzer,
+                                hardware.button,
+                                int(config['Upload']['queue_size'])).start()
+        return
+
+    AttendanceRecorder(hardware.display,
+                       hardware.reader,
                        connection_builder.build(),
-                       Buzzer(),
-                       ButtonController()).start()
+                       hardware.buzzer,
+                       hardware.button).start()
 
 
 if __name__ == '__main__':
@@ -2,16 +2,26 @@ from .resources.config import config
 
 from abc import ABC
 from abc import abstractmethod
+from collections import deque
+from enum import Enum
 from logging import getLogger
 from logging import Logger
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from time import sleep
+from typing import Any
+from typing import Deque
 from typing import Final
-
-import RPi.GPIO as GPIO
+from typing import NamedTuple
+from typing import Optional
 
 
 class IButtonController(ABC):
     """Button interface with single method is_pushed."""
 
+    POLL_INTERVAL: Final = 0.05
+
     @abstractmethod
     def is_pushed(self) -> bool:
         """Check if the button is pushed or not.
@@ -21,34 +31,197 @@ class IButtonController(ABC):
         """
         pass
 
+    def wait_for_press(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the button is pushed.
+
+        Default implementation polls is_pushed.
+
+        Args:
+            timeout: Maximal time to wait in seconds, 0 only checks the button,
+                     None waits until the button is pushed.
+
+        Returns:
+            True if the button was pushed.
+        """
+        deadline: Optional[float] = None if timeout is None else monotonic() + timeout
+        while not self.is_pushed():
+            if deadline is not None and monotonic() >= deadline:
+                return False
+            sleep(IButtonController.POLL_INTERVAL)
+        return True
+
+    def close(self) -> None:
+        """Stop watching the button."""
+        pass
+
+
+class ButtonEventKind(Enum):
+    """Enumeration of button events."""
+
+    PRESS = 'press'
+    LONG_PRESS = 'long_press'
+
+
+class ButtonEvent(NamedTuple):
+    """Debounced action of the button.
+
+    Attributes:
+        kind: Press or long press.
+        time: Monotonic time of the press.
+    """
+
+    kind: ButtonEventKind
+    time: float
+
 
 class ButtonController(IButtonController):
-    """Button interface implementation which works with physical button."""
+    """Button interface implementation which works with physical button.
+
+    Edges of the input pin are detected by the GPIO library, so even a short press which
+    happens while the recorder is busy is not missed. Level of the pin is sampled when it
+    was stable for the debounce time, every press is queued as an event and another event
+    follows when the button is held for the long press time.
+    """
 
-    def __init__(self):
+    def __init__(self, gpio: Optional[Any] = None):
         """Initialize class and setup the pins.
 
-        Pins can be specified in config.ini located at resources folder.
+        Pins and timing can be specified in config.ini located at resources folder.
+        RPi.GPIO is imported here so the module can be imported on other machines.
+
+        Args:
+            gpio: Module with RPi.GPIO interface, e.g. SimulatedGPIO, RPi.GPIO by default.
         """
+        if gpio is None:
+            import RPi.GPIO
+            gpio = RPi.GPIO
         self.logger: Logger = getLogger(__name__)
+        self._gpio: Any = gpio
         self._pin: Final = int(config['Button']['in_pin'])
+        self._debounce: Final = float(config['Button']['debounce'])
+        self._long_press: Final = float(config['Button']['long_press'])
 
         out_pin: int = int(config['Button']['out_pin'])
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup(self._pin, GPIO.IN)
-        GPIO.setup(out_pin, GPIO.OUT)
-        GPIO.output(out_pin, GPIO.HIGH)
+        self._gpio.setmode(self._gpio.BOARD)
+        self._gpio.setup(self._pin, self._gpio.IN)
+        self._gpio.setup(out_pin, self._gpio.OUT)
+        self._gpio.output(out_pin, self._gpio.HIGH)
 
         self.logger.debug('{0} pin set as output pin.'.format(out_pin))
         self.logger.debug('{0} pin set as input pin.'.format(self._pin))
 
+        self._condition: Condition = Condition()
+        self._events: Deque[ButtonEvent] = deque(maxlen=int(config['Button']['queue_size']))
+        self._pushed: bool = self._gpio.input(self._pin) == self._gpio.HIGH
+        self._pushed_at: float = 0.0
+        self._long_press_reported: bool = True
+        self._first_edge: Optional[float] = None
+        self._last_edge: Optional[float] = None
+        self._closed: bool = False
+        self._worker: Thread = Thread(target=self._run, name='button', daemon=True)
+        self._worker.start()
+        self._gpio.add_event_detect(self._pin, self._gpio.BOTH, callback=self._on_edge)
+
+    def _on_edge(self, pin: int) -> None:
+        """Note the edge, called by the GPIO library."""
+        with self._condition:
+            now: float = monotonic()
+            if self._first_edge is None:
+                self._first_edge = now
+            self._last_edge = now
+            self._condition.notify_all()
+
+    def _sample(self, edge_time: float) -> None:
+        """Read the settled level of the pin, the lock has to be held.
+
+        Args:
+            edge_time: Monotonic time of the first edge of the bouncing contacts.
+        """
+        pushed: bool = self._gpio.input(self._pin) == self._gpio.HIGH
+        if pushed == self._pushed:
+            return
+        self._pushed = pushed
+        if pushed:
+            self._pushed_at = edge_time
+            self._long_press_reported = False
+            self._put(ButtonEvent(ButtonEventKind.PRESS, edge_time))
+            self.logger.debug('Button was pushed.')
+
+    def _put(self, event: ButtonEvent) -> None:
+        """Queue the event, the oldest one is dropped when the queue is full."""
+        self._events.append(event)
+        self._condition.notify_all()
+
+    def _get_timeout(self, now: float) -> Optional[float]:
+        """Return time until the pin settles or until the long press, None if nothing is expected."""
+        if self._last_edge is not None:
+            return self._last_edge + self._debounce - now
+        if self._pushed and not self._long_press_reported:
+            return self._pushed_at + self._long_press - now
+        return None
+
+    def _run(self) -> None:
+        """Debounce edges and detect long presses until closed."""
+        with self._condition:
+            while not self._closed:
+                now: float = monotonic()
+                timeout: Optional[float] = self._get_timeout(now)
+                if timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+                elif self._first_edge is not None:
+                    edge_time: float = self._first_edge
+                    self._first_edge = self._last_edge = None
+                    self._sample(edge_time)
+                else:
+                    self._long_press_reported = True
+                    self._put(ButtonEvent(ButtonEventKind.LONG_PRESS, self._pushed_at))
+
     def is_pushed(self) -> bool:
         """Check if the button is pushed or not.
 
         Returns:
-            True if the button is pushed.
+            True if the debounced button is pushed.
         """
-        if GPIO.input(self._pin) == GPIO.HIGH:
-            self.logger.debug('Button was pushed.')
-            return True
-        return False
+        with self._condition:
+            return self._pushed
+
+    def get_event(self, timeout: Optional[float] = None) -> Optional[ButtonEvent]:
+        """Take the oldest button event.
+
+        Args:
+            timeout: Maximal time to wait in seconds, None waits until an event arrives.
+
+        Returns:
+            The oldest event or None if there was none until the timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._events or self._closed, timeout):
+                return None
+            return self._events.popleft() if self._events else None
+
+    def wait_for_press(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a press of the button, press queued earlier is taken right away.
+
+        Args:
+            timeout: Maximal time to wait in seconds, 0 only takes a queued press,
+                     None waits until the button is pushed.
+
+        Returns:
+            True if the button was pushed.
+        """
+        deadline: Optional[float] = None if timeout is None else monotonic() + timeout
+        while True:
+            remaining: Optional[float] = None if deadline is None else max(0.0, deadline - monotonic())
+            event: Optional[ButtonEvent] = self.get_event(remaining)
+            if event is None:
+                return False
+            if event.kind == ButtonEventKind.PRESS:
+                return True
+
+    def close(self) -> None:
+        """Stop detecting edges of the button."""
+        self._gpio.remove_event_detect(self._pin)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
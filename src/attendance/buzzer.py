@@ -2,12 +2,36 @@ from .resources.config import config
 
 from abc import ABC
 from abc import abstractmethod
+from collections import deque
 from logging import getLogger
 from logging import Logger
-from time import sleep
+from threading import Condition
+from threading import Thread
+from typing import Any
+from typing import Deque
+from typing import Dict
 from typing import Final
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
 
-import RPi.GPIO as GPIO
+
+class Tone(NamedTuple):
+    """Single tone of a sound pattern.
+
+    Attributes:
+        frequency: Frequency in Hz, 0 stands for silence.
+        duration: Duration in seconds.
+    """
+
+    frequency: float
+    duration: float
+
+
+Pattern = Tuple[Tone, ...]
+
+CORRECT_PATTERN: Final[Pattern] = (Tone(1300, 0.25),)
+INCORRECT_PATTERN: Final[Pattern] = (Tone(3000, 0.3), Tone(0, 0.3), Tone(3000, 0.3))
 
 
 class IBuzzer(ABC):
@@ -25,23 +49,58 @@ class IBuzzer(ABC):
         """
         pass
 
+    def close(self) -> None:
+        """Stop making sounds."""
+        pass
+
 
 class Buzzer(IBuzzer):
     """Buzzer interface implementation.
 
     It works with a physical buzzer connected to the GPIO pin.
     The pin can be configured using the config.ini located at the resources folder.
+    Tones are generated by PWM of the GPIO library and patterns are played by a background
+    worker, so beep never blocks. Pattern equal to the last queued one is coalesced with it
+    and when the queue is full the oldest queued pattern is dropped, so rapid taps never
+    stack up sounds.
     """
 
-    def __init__(self):
-        """Initialize class and read pin from config then set it to be an output pin."""
+    DUTY_CYCLE: Final = 50
+
+    def __init__(self, gpio: Optional[Any] = None, queue_size: Optional[int] = None):
+        """Initialize class and read pin from config then set it to be an output pin.
+
+        RPi.GPIO is imported here so the module can be imported on other machines.
+
+        Args:
+            gpio: Module with RPi.GPIO interface, e.g. SimulatedGPIO, RPi.GPIO by default.
+            queue_size: Maximal number of patterns waiting to be played, default is taken from config.
+        """
+        if gpio is None:
+            import RPi.GPIO
+            gpio = RPi.GPIO
+        if queue_size is None:
+            queue_size = int(config['Buzzer']['queue_size'])
         self.logger: Logger = getLogger(__name__)
+        self._gpio: Any = gpio
         self._pin: Final = int(config['Buzzer']['pin'])
+        self._queue_size: Final = queue_size
 
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup(self._pin, GPIO.OUT)
+        self._gpio.setmode(self._gpio.BOARD)
+        self._gpio.setup(self._pin, self._gpio.OUT)
+        self._pwm: Any = self._gpio.PWM(self._pin, CORRECT_PATTERN[0].frequency)
         self.logger.debug('{0} pin set as output pin.'.format(self._pin))
 
+        self._condition: Condition = Condition()
+        self._pending: Deque[Pattern] = deque()
+        self._playing: bool = False
+        self._closed: bool = False
+        self._played: int = 0
+        self._coalesced: int = 0
+        self._dropped: int = 0
+        self._worker: Thread = Thread(target=self._run, name='buzzer', daemon=True)
+        self._worker.start()
+
     def beep(self, correct: bool) -> None:
         """Make sound based on input value.
 
@@ -50,17 +109,90 @@ class Buzzer(IBuzzer):
         Args:
             correct: if true sound for correct input is made, for incorrect otherwise.
         """
-        if correct:
-            self.logger.debug('Making correct sound response.')
-            for _ in range(300):
-                GPIO.output(self._pin, GPIO.HIGH)
-                GPIO.output(self._pin, GPIO.LOW)
-                sleep(0.00075)
-        else:
-            self.logger.debug('Making incorrect sound response.')
-            for _ in range(2):
-                for __ in range(1000):
-                    GPIO.output(self._pin, GPIO.HIGH)
-                    GPIO.output(self._pin, GPIO.LOW)
-                    sleep(0.00025)
-                sleep(0.3)
+        self.logger.debug('Making {0} sound response.'.format('correct' if correct else 'incorrect'))
+        self.play(CORRECT_PATTERN if correct else INCORRECT_PATTERN)
+
+    def play(self, pattern: Pattern) -> None:
+        """Queue pattern to be played, returns immediately.
+
+        Args:
+            pattern: Tones to play one after another.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            if self._pending and self._pending[-1] == pattern:
+                self._coalesced += 1
+                return
+            if len(self._pending) >= self._queue_size:
+                self._pending.popleft()
+                self._dropped += 1
+            self._pending.append(pattern)
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued patterns were played.
+
+        Args:
+            timeout: Maximal time to wait in seconds, None waits forever.
+
+        Returns:
+            True if the buzzer is idle.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._closed or (not self._pending and not self._playing), timeout)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return numbers of played, coalesced and dropped patterns and the queue depth."""
+        with self._condition:
+            return {
+                'played': self._played,
+                'coalesced': self._coalesced,
+                'dropped': self._dropped,
+                'depth': len(self._pending)
+            }
+
+    def _run(self) -> None:
+        """Play queued patterns until the buzzer is closed."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._pending)
+                if self._closed:
+                    return
+                pattern: Pattern = self._pending.popleft()
+                self._playing = True
+            for tone in pattern:
+                if not self._play_tone(tone):
+                    break
+            with self._condition:
+                self._playing = False
+                self._played += 1
+                self._condition.notify_all()
+
+    def _play_tone(self, tone: Tone) -> bool:
+        """Generate the tone by PWM for its duration.
+
+        Args:
+            tone: Tone to play.
+
+        Returns:
+            False if the buzzer was closed meanwhile.
+        """
+        if tone.frequency > 0:
+            self._pwm.ChangeFrequency(tone.frequency)
+            self._pwm.start(Buzzer.DUTY_CYCLE)
+        try:
+            with self._condition:
+                return not self._condition.wait_for(lambda: self._closed, tone.duration)
+        finally:
+            if tone.frequency > 0:
+                self._pwm.stop()
+
+    def close(self) -> None:
+        """Stop the worker, the sound being played is cut off."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+        self._worker.join()
@@ -0,0 +1,226 @@
+from .card_reader import ICardReader
+from .card_reader import InvalidDataException
+from .card_reader import NoDataException
+from .card_reader import ReadCancelledException
+
+from collections import deque
+from enum import Enum
+from logging import getLogger
+from logging import Logger
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from time import sleep
+from time import time
+from typing import Deque
+from typing import Dict
+from typing import Final
+from typing import Iterator
+from typing import NamedTuple
+from typing import Optional
+
+
+class CardEvent(NamedTuple):
+    """Card read by the reader thread.
+
+    Attributes:
+        card: Hex string representation of card data, None if the data were corrupted.
+        received: Monotonic time of the read.
+        wall_time: Wall clock time of the read.
+        source: Name of the reader which read the card.
+    """
+
+    card: Optional[str]
+    received: float
+    wall_time: float
+    source: str = ''
+
+
+class OverflowPolicy(Enum):
+    """What to do with a new event when the queue is full."""
+
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+
+
+class CardEventStream:
+    """Reads cards in a dedicated thread and queues them as events.
+
+    Taps are never delayed by the consumer, bursts are absorbed by the bounded queue.
+    Taps of the same card within the debounce window are reported only once.
+    """
+
+    ERROR_DELAY: Final = 0.5
+
+    def __init__(self,
+                 reader: ICardReader,
+                 maxsize: int = 100,
+                 overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 debounce: float = 2.0):
+        """Init stream.
+
+        Args:
+            reader: Reader which is read by the thread.
+            maxsize: Maximal number of events waiting in the queue.
+            overflow: Policy applied when the queue is full.
+            debounce: Seconds in which repeated taps of the same card are ignored.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._reader: Final = reader
+        self._maxsize: Final = maxsize
+        self._overflow: Final = overflow
+        self._debounce: Final = debounce
+        self._condition: Condition = Condition()
+        self._events: Deque[CardEvent] = deque()
+        self._last_taps: Dict[str, float] = {}
+        self._received: int = 0
+        self._debounced: int = 0
+        self._dropped: int = 0
+        self._stopped: bool = True
+        self._worker: Optional[Thread] = None
+
+    def start(self) -> None:
+        """Start the reader thread."""
+        self._stopped = False
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the reader thread, queued events stay available.
+
+        Args:
+            timeout: Maximal time to wait for the thread in seconds.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._reader.cancel()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CardEvent]:
+        """Take the oldest event.
+
+        Args:
+            timeout: Maximal time to wait in seconds, None waits until an event arrives.
+
+        Returns:
+            The oldest event or None if there was none until the timeout or the stream was stopped.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._events or self._stopped, timeout):
+                return None
+            if not self._events:
+                return None
+            event: CardEvent = self._events.popleft()
+            self._condition.notify_all()
+            return event
+
+    def __iter__(self) -> Iterator[CardEvent]:
+        """Yield events until the stream is stopped and the queue is empty."""
+        while True:
+            event: Optional[CardEvent] = self.get()
+            if event is None:
+                return
+            yield event
+
+    def discard_before(self, time: float) -> int:
+        """Drop queued events received before the time.
+
+        Args:
+            time: Monotonic time, events received earlier are dropped.
+
+        Returns:
+            Number of dropped events.
+        """
+        with self._condition:
+            stale: int = 0
+            while self._events and self._events[0].received < time:
+                self._events.popleft()
+                stale += 1
+            if stale:
+                self._condition.notify_all()
+            return stale
+
+    def depth(self) -> int:
+        """Return number of queued events."""
+        with self._condition:
+            return len(self._events)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return stream statistics.
+
+        Returns:
+            Dictionary with queue depth and numbers of received, debounced and dropped taps.
+        """
+        with self._condition:
+            return {
+                'depth': len(self._events),
+                'received': self._received,
+                'debounced': self._debounced,
+                'dropped': self._dropped
+            }
+
+    def _is_bounce(self, card: str, received: float) -> bool:
+        """Check if the card was tapped within the debounce window.
+
+        Args:
+            card: Read card.
+            received: Monotonic time of the read.
+
+        Returns:
+            True if the tap should be ignored.
+        """
+        last_tap: Optional[float] = self._last_taps.get(card)
+        self._last_taps[card] = received
+        if len(self._last_taps) > self._maxsize:
+            # Forget cards which left the window
+            self._last_taps = {key: value for key, value in self._last_taps.items()
+                               if received - value < self._debounce}
+        return last_tap is not None and received - last_tap < self._debounce
+
+    def _put(self, event: CardEvent) -> None:
+        """Queue event applying the overflow policy.
+
+        Args:
+            event: Event to queue.
+        """
+        with self._condition:
+            self._received += 1
+            if event.card is not None and self._is_bounce(event.card, event.received):
+                self._debounced += 1
+                return
+            if len(self._events) >= self._maxsize:
+                if self._overflow == OverflowPolicy.BLOCK:
+                    self._condition.wait_for(
+                        lambda: len(self._events) < self._maxsize or self._stopped)
+                    if self._stopped:
+                        return
+                elif self._overflow == OverflowPolicy.DROP_OLDEST:
+                    dropped: CardEvent = self._events.popleft()
+                    self._dropped += 1
+                    self.logger.warning('Card event queue is full, {0} dropped.'.format(dropped.card))
+                else:
+                    self._dropped += 1
+                    self.logger.warning('Card event queue is full, {0} dropped.'.format(event.card))
+                    return
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        """Read cards until the stream is stopped."""
+        while not self._stopped:
+            try:
+                card: Optional[str] = self._reader.read_card()
+            except NoDataException:
+                continue
+            except InvalidDataException:
+                card = None
+            except ReadCancelledException:
+                continue
+            except Exception:
+                self.logger.exception('Reading of the card failed.')
+                sleep(CardEventStream.ERROR_DELAY)
+                continue
+            self._put(CardEvent(card, monotonic(), time(), self._reader.get_source()))
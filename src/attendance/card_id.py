@@ -0,0 +1,193 @@
+"""Compact representation of card IDs.
+
+Card ID is always 10 hex characters so it fits into 40 bit integer.
+Cards are kept packed inside the application and converted to hex strings only
+when they leave it (HTTP requests, cache files, logs).
+"""
+from typing import Final
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Union
+
+CardId = int
+
+CARD_SIZE: Final = 10
+CARD_BYTES: Final = 5
+CARD_MAX: Final = (1 << (8 * CARD_BYTES)) - 1
+
+_HEX_DIGITS: Final = frozenset(b'0123456789abcdefABCDEF')
+
+
+def parse_card(data: Union[str, bytes]) -> Optional[CardId]:
+    """Parse hex representation of the card.
+
+    Args:
+        data: Hex string or ASCII bytes of exactly 10 hex digits (any case).
+
+    Returns:
+        Packed card or None if data are not valid card ID.
+    """
+    if isinstance(data, str):
+        data = data.encode('ascii', 'replace')
+    if len(data) != CARD_SIZE or not _HEX_DIGITS.issuperset(data):
+        return None
+    return int(data, 16)
+
+
+def pack_card(card: Union[str, CardId]) -> CardId:
+    """Convert card to its packed form.
+
+    Args:
+        card: Hex string or already packed card.
+
+    Returns:
+        Packed card.
+
+    Raises:
+        ValueError: If card is not valid card ID.
+    """
+    if isinstance(card, int):
+        if not is_valid_card(card):
+            raise ValueError('{0} is not valid card ID.'.format(card))
+        return card
+    packed: Optional[CardId] = parse_card(card)
+    if packed is None or card != card.lower():
+        raise ValueError('{0} is not valid card ID.'.format(card))
+    return packed
+
+
+def format_card(card: Union[str, CardId]) -> str:
+    """Convert card to lower case hex string.
+
+    Args:
+        card: Packed card or hex string (which is returned unchanged).
+
+    Returns:
+        Hex string of 10 characters.
+    """
+    if isinstance(card, str):
+        return card
+    return '{0:010x}'.format(card)
+
+
+def is_valid_card(card: Union[str, CardId]) -> bool:
+    """Check if card is valid card ID.
+
+    Args:
+        card: Packed card or hex string which must be lower case.
+
+    Returns:
+        True if card is valid.
+    """
+    if isinstance(card, int):
+        return 0 <= card <= CARD_MAX
+    return card == card.lower() and parse_card(card) is not None
+
+
+class CardSet:
+    """Set of packed cards stored in a sorted bytearray.
+
+    Every card takes 5 bytes (big endian) so 100k cards take 500 kB.
+    Membership test is a binary search, insert and removal move the tail of the array.
+    """
+
+    def __init__(self, cards: Iterable[Union[str, CardId]] = ()):
+        """Init set with given cards.
+
+        Args:
+            cards: Hex strings or packed cards.
+        """
+        self._data: bytearray = bytearray()
+        for card in sorted({pack_card(card) for card in cards}):
+            self._data += card.to_bytes(CARD_BYTES, 'big')
+
+    def _get(self, index: int) -> CardId:
+        """Return card stored at given index."""
+        start: int = index * CARD_BYTES
+        return int.from_bytes(self._data[start:start + CARD_BYTES], 'big')
+
+    def _find(self, card: CardId) -> int:
+        """Return index where the card is or should be inserted."""
+        low: int = 0
+        high: int = len(self)
+        while low < high:
+            middle: int = (low + high) // 2
+            if self._get(middle) < card:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add(self, card: Union[str, CardId]) -> bool:
+        """Add card to the set.
+
+        Args:
+            card: Hex string or packed card.
+
+        Returns:
+            True if the card was added, false if it was already contained.
+        """
+        card = pack_card(card)
+        index: int = self._find(card)
+        if index < len(self) and self._get(index) == card:
+            return False
+        start: int = index * CARD_BYTES
+        self._data[start:start] = card.to_bytes(CARD_BYTES, 'big')
+        return True
+
+    def discard(self, card: Union[str, CardId]) -> bool:
+        """Remove card from the set if it is present.
+
+        Args:
+            card: Hex string or packed card.
+
+        Returns:
+            True if the card was removed.
+        """
+        card = pack_card(card)
+        index: int = self._find(card)
+        if index < len(self) and self._get(index) == card:
+            start: int = index * CARD_BYTES
+            del self._data[start:start + CARD_BYTES]
+            return True
+        return False
+
+    def clear(self) -> None:
+        """Remove all cards."""
+        self._data = bytearray()
+
+    def copy(self) -> 'CardSet':
+        """Return shallow copy of the set."""
+        result: CardSet = CardSet()
+        result._data = bytearray(self._data)
+        return result
+
+    def nbytes(self) -> int:
+        """Return number of bytes used to store the cards."""
+        return len(self._data)
+
+    def __contains__(self, card: object) -> bool:
+        """Check if card is in the set."""
+        if not isinstance(card, (str, int)) or not is_valid_card(card):
+            return False
+        packed: CardId = pack_card(card)
+        index: int = self._find(packed)
+        return index < len(self) and self._get(index) == packed
+
+    def __len__(self) -> int:
+        """Return number of cards."""
+        return len(self._data) // CARD_BYTES
+
+    def __iter__(self) -> Iterator[CardId]:
+        """Iterate over packed cards in ascending order."""
+        for index in range(len(self)):
+            yield self._get(index)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with other card set."""
+        return isinstance(other, CardSet) and self._data == other._data
+
+    def __repr__(self) -> str:
+        """Return representation with hex cards."""
+        return 'CardSet([{0}])'.format(', '.join(repr(format_card(card)) for card in self))
@@ -1,14 +1,27 @@
+from .card_id import CardId
+from .card_id import format_card
+from .frame_parser import FrameParser
+from .frame_parser import STX
 from .resources.config import config
 from .utils import reverse_endianness
 
 from abc import ABC
 from abc import abstractmethod
+from collections import deque
 from logging import getLogger
 from logging import Logger
+from threading import Event
+from time import monotonic
 from time import sleep
+from typing import Any
+from typing import Deque
 from typing import Final
+from typing import List
+from typing import Optional
+from typing import Tuple
 
-import re
+import os
+import selectors
 import serial
 
 
@@ -30,6 +43,39 @@ class ICardReader(ABC):
         """
         pass
 
+    def cancel(self) -> None:
+        """Stop waiting for a card, the running read_card raises ReadCancelledException."""
+        pass
+
+    def discard_cancel(self) -> None:
+        """Forget cancellation which came after the last read had returned."""
+        pass
+
+    def get_source(self) -> str:
+        """Return name of the reader which read the last returned card."""
+        return ''
+
+    def stream(self, maxsize: int = 100, overflow: str = 'drop_oldest',
+               debounce: float = 2.0) -> 'CardEventStream':
+        """Create stream which reads this reader in a dedicated thread.
+
+        Args:
+            maxsize: Maximal number of events waiting in the queue.
+            overflow: Name of OverflowPolicy applied when the queue is full.
+            debounce: Seconds in which repeated taps of the same card are ignored.
+
+        Returns:
+            Stream which is not started yet.
+        """
+        # Imported here because the stream is built on top of this module
+        from .card_events import CardEventStream
+        from .card_events import OverflowPolicy
+        return CardEventStream(self, maxsize, OverflowPolicy(overflow), debounce)
+
+    def close(self) -> None:
+        """Release the reader."""
+        pass
+
 
 class InvalidDataException(Exception):
     """Exception used when card data are not valid."""
@@ -55,14 +101,84 @@ class NoDataException(Exception):
         super().__init__(message)
 
 
+class ReadCancelledException(Exception):
+    """Exception used when waiting for a card was cancelled."""
+
+    def __init__(self, message):
+        """Init exception with message.
+
+        Args:
+            message: Error message.
+        """
+        super().__init__(message)
+
+
+class CancellationPipe:
+    """Cancellation handle which can be waited for by selector together with the ports."""
+
+    def __init__(self):
+        """Create the pipe."""
+        self._cancelled: Event = Event()
+        self._read_end, self._write_end = os.pipe()
+        os.set_blocking(self._read_end, False)
+        os.set_blocking(self._write_end, False)
+
+    def fileno(self) -> int:
+        """Return file descriptor which is readable after cancel was called."""
+        return self._read_end
+
+    def cancel(self) -> None:
+        """Request cancellation, can be called from any thread."""
+        self._cancelled.set()
+        try:
+            os.write(self._write_end, b'\0')
+        except BlockingIOError:
+            pass  # wake up is already pending
+
+    def check(self) -> None:
+        """Consume cancellation request if there is any.
+
+        Raises:
+            ReadCancelledException: If cancellation was requested.
+        """
+        if self.clear():
+            raise ReadCancelledException('Reading of the card was cancelled.')
+
+    def clear(self) -> bool:
+        """Consume cancellation request if there is any.
+
+        Returns:
+            True if cancellation was requested.
+        """
+        if not self._cancelled.is_set():
+            return False
+        self._cancelled.clear()
+        try:
+            while os.read(self._read_end, 64):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        """Close the pipe."""
+        os.close(self._read_end)
+        os.close(self._write_end)
+
+
 class CardReader(ICardReader):
     """Class representation of physical card reader.
 
     It reads data from physical card reader using serial communication.
     It is configured using config file (config.ini in resources folder).
+    Everything buffered by the port is read at once and assembled to frames by FrameParser,
+    so the card is returned as soon as its frame is complete. Reader repeats frames while
+    the card is held, repeated frames of the same card are skipped.
+    Ports with file descriptor are waited for by selector, which wakes up as soon
+    as data arrive or the read is cancelled. Other streams are polled.
     """
 
-    INIT_BYTE: Final = b'\x02'
+    INIT_BYTE: Final = bytes([STX])
     CARD_SIZE: Final = 10
     PORT: Final = config['CardReader']['devPath']
     BAUDRATE: Final = int(config['CardReader']['baudrate'])
@@ -70,13 +186,19 @@ class CardReader(ICardReader):
     STOPBITS: Final = getattr(serial, config['CardReader']['stopbits'])
     BYTESIZE: Final = getattr(serial, config['CardReader']['bytesize'])
     TIMEOUT: Final = float(config['CardReader']['timeout'])
-    CARD_REGEX: Final = re.compile('^[0-9a-f]{10}$')
 
-    def __init__(self):
-        """Init logger and create new Serial object for serial communication based on configuration."""
-        self.logger: Logger = getLogger(__name__)
-        self._port = serial.Serial(
-            port=CardReader.PORT,
+    @staticmethod
+    def open_port(path: str) -> serial.Serial:
+        """Open serial port with the configured parameters.
+
+        Args:
+            path: Path to the serial device.
+
+        Returns:
+            Opened port.
+        """
+        return serial.Serial(
+            port=path,
             baudrate=CardReader.BAUDRATE,
             parity=CardReader.PARITY,
             stopbits=CardReader.STOPBITS,
@@ -84,11 +206,186 @@ class CardReader(ICardReader):
             timeout=CardReader.TIMEOUT
         )
 
+    def __init__(self, port: Optional[Any] = None, name: Optional[str] = None):
+        """Init logger and create new Serial object for serial communication based on configuration.
+
+        Args:
+            port: Byte stream to read instead of the configured serial port, anything with
+                  read(size) method like serial.Serial. Attribute in_waiting is used if present.
+            name: Name of the reader reported as the source of the cards, path of the port by default.
+        """
+        self.logger: Logger = getLogger(__name__)
+        if port is None:
+            port = CardReader.open_port(CardReader.PORT)
+        self._port = port
+        self.name: str = name or str(getattr(port, 'port', None) or CardReader.PORT)
+        self._parser: FrameParser = FrameParser()
+        self._frames: Deque[Tuple[Optional[CardId], float]] = deque()
+        self._last_card: Optional[CardId] = None
+        self._last_seen: float = 0.0
+        self._cancellation: CancellationPipe = CancellationPipe()
+        self._selector: Optional[selectors.BaseSelector] = None
+        try:
+            fileno: int = self._port.fileno()
+        except (AttributeError, OSError):
+            self.logger.debug('Port has no file descriptor, it is polled.')
+        else:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(fileno, selectors.EVENT_READ)
+            self._selector.register(self._cancellation, selectors.EVENT_READ)
+
+    def fileno(self) -> int:
+        """Return file descriptor of the port."""
+        return self._port.fileno()
+
+    def get_source(self) -> str:
+        """Return name of the reader."""
+        return self.name
+
+    def cancel(self) -> None:
+        """Stop waiting for a card, the running read_card raises ReadCancelledException.
+
+        If no read is running the next one is cancelled. Can be called from any thread.
+        """
+        self._cancellation.cancel()
+
+    def discard_cancel(self) -> None:
+        """Forget cancellation which came after the last read had returned."""
+        self._cancellation.clear()
+
+    def _wait_for_data(self, timeout: Optional[float]) -> bool:
+        """Block until the port has data, the read is cancelled or the timeout expires.
+
+        Args:
+            timeout: Maximal time to wait in seconds, None waits until data arrive.
+
+        Returns:
+            True if the port has data.
+
+        Raises:
+            ReadCancelledException: If the read was cancelled.
+        """
+        events = self._selector.select(timeout)
+        self._cancellation.check()
+        return any(key.fileobj is not self._cancellation for key, _ in events)
+
+    def close(self) -> None:
+        """Close the port and release the cancellation handle."""
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        self._cancellation.close()
+        self._port.close()
+
+    def _read_available(self) -> bytes:
+        """Read everything what is buffered, wait up to the port timeout for the first byte.
+
+        Returns:
+            Read bytes, empty if nothing arrived until the port timeout.
+        """
+        data: bytes = self._port.read(1)
+        waiting: int = getattr(self._port, 'in_waiting', 0)
+        if data and waiting:
+            data += self._port.read(waiting)
+        return data
+
+    def _read_chunk(self, wait: bool) -> bytes:
+        """Wait for data and read everything what is buffered.
+
+        Args:
+            wait: If true and the port is waited for by selector, wait until data arrive
+                  instead of the port timeout.
+
+        Returns:
+            Read bytes, empty if nothing arrived until the port timeout.
+
+        Raises:
+            ReadCancelledException: If the read was cancelled.
+        """
+        if self._selector is not None:
+            if not self._wait_for_data(None if wait else CardReader.TIMEOUT):
+                return b''
+        return self._read_available()
+
+    def _receive(self, data: bytes) -> None:
+        """Assemble received data to frames.
+
+        Args:
+            data: Bytes read from the port.
+        """
+        received: float = monotonic()
+        self._frames.extend((packed, received) for packed in self._parser.feed(data))
+
+    @property
+    def in_frame(self) -> bool:
+        """Return true if a frame was received partially."""
+        return self._parser.in_frame
+
+    def receive(self) -> None:
+        """Read everything what is buffered by the port and assemble it to frames.
+
+        Used with take_card when the port is waited for by someone else, e.g. MultiCardReader.
+
+        Raises:
+            serial.SerialException: If the port failed.
+        """
+        self._receive(self._read_available())
+
+    def take_card(self) -> Optional[str]:
+        """Take the next card from the received frames, repeated frames are skipped.
+
+        Returns:
+            Hex string representation of card data or None if there is no complete frame.
+
+        Raises:
+            InvalidDataException: If card data are corrupted.
+        """
+        while self._frames:
+            packed, received = self._frames.popleft()
+            if packed is None:
+                self.logger.debug('Incomplete or corrupted data.')
+                raise InvalidDataException(
+                    'Card data are invalid - incomplete or corrupted data.')
+            if self._is_repeated(packed, received):
+                continue
+            card: str = format_card(reverse_endianness(packed))
+            self.logger.info('{0} was read by {1}'.format(card, self.name))
+            return card
+        return None
+
+    def drop_incomplete_frame(self) -> None:
+        """Drop partially received frame after the port went silent.
+
+        Raises:
+            InvalidDataException: If there was partially received frame.
+        """
+        if self._parser.in_frame:
+            self._parser.reset()
+            self.logger.debug('Incomplete or corrupted data.')
+            raise InvalidDataException(
+                'Card data are invalid - incomplete or corrupted data.')
+
+    def _is_repeated(self, card: CardId, received: float) -> bool:
+        """Check if the frame repeats the previous card which is still held at the reader.
+
+        Args:
+            card: Card of the frame.
+            received: Time when the frame was received.
+
+        Returns:
+            True if the same card was received less than port timeout ago.
+        """
+        repeated: bool = card == self._last_card and received - self._last_seen < CardReader.TIMEOUT
+        self._last_card = card
+        self._last_seen = received
+        return repeated
+
     def read_card(self, raise_if_no_data: bool = False) -> str:
         """Read one card using serial communication.
 
         This method ends only when some data are red or until times out.
-        If no card data are present operation is retried 0.5 second later. 
+        If no card data are present operation is retried as soon as data arrive
+        (0.5 second later if the port is polled).
 
         Args:
             raise_if_no_data: If true the NoDataException is raised if no data are present.
@@ -99,33 +396,149 @@ class CardReader(ICardReader):
         Raises:
             NoDataException: If raise_if_no_data is set to True and no data was read.
             InvalidDataException: If card data are corrupted.
+            ReadCancelledException: If the read was cancelled.
         """
         while True:
-            byte = self._port.read()
-
-            if byte == b'':
+            self._cancellation.check()
+            card: Optional[str] = self.take_card()
+            if card is not None:
+                return card
+
+            data: bytes = self._read_chunk(not raise_if_no_data and not self._parser.in_frame)
+            if data == b'':
+                self.drop_incomplete_frame()
                 self.logger.debug('No card data.')
                 if raise_if_no_data:
                     raise NoDataException('No card data was read.')
-                else:
-                    sleep(0.5)
-                    continue
-
-            if byte != CardReader.INIT_BYTE:
-                self.logger.debug('Invalid initial sequence.')
+                sleep(0.5)
                 continue
+            self._receive(data)
 
-            data = self._port.read(CardReader.CARD_SIZE)
-            card: str = reverse_endianness(data.decode('ascii'))
 
-            if not CardReader.CARD_REGEX.match(card):
-                self.logger.debug('Incomplete or corrupted data.')
-                raise InvalidDataException(
-                    'Card data are invalid - incomplete or corrupted data.')
+class MultiCardReader(ICardReader):
+    """Several card readers serviced by one selector.
 
-            self.logger.info(card + ' was read')
+    Cards of all the readers are returned by read_card in order they arrive,
+    get_source tells which reader read the last returned card. Reader whose port failed
+    is ignored, read_card fails when no reader is left.
+    """
 
-            while self._port.read() != b'':
-                continue  # consume all residual data
+    def __init__(self, readers: List[CardReader]):
+        """Init multiplexer.
 
-            return card
+        Args:
+            readers: Readers whose ports have file descriptor.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._readers: Final = readers
+        # Readers whose ports did not fail
+        self._active: List[CardReader] = list(readers)
+        self._source: str = ''
+        self._next: int = 0
+        self._cancellation: CancellationPipe = CancellationPipe()
+        self._selector: selectors.BaseSelector = selectors.DefaultSelector()
+        for reader in readers:
+            self._selector.register(reader, selectors.EVENT_READ)
+        self._selector.register(self._cancellation, selectors.EVENT_READ)
+
+    @staticmethod
+    def from_paths(paths: List[str]) -> 'MultiCardReader':
+        """Open readers on the serial ports.
+
+        Args:
+            paths: Paths to the serial devices.
+
+        Returns:
+            Multiplexer of the readers.
+        """
+        return MultiCardReader([CardReader(CardReader.open_port(path), path) for path in paths])
+
+    def get_source(self) -> str:
+        """Return name of the reader which read the last returned card."""
+        return self._source
+
+    def cancel(self) -> None:
+        """Stop waiting for a card, the running read_card raises ReadCancelledException."""
+        self._cancellation.cancel()
+
+    def discard_cancel(self) -> None:
+        """Forget cancellation which came after the last read had returned."""
+        self._cancellation.clear()
+
+    def close(self) -> None:
+        """Close all the readers."""
+        self._selector.close()
+        self._cancellation.close()
+        for reader in self._readers:
+            reader.close()
+
+    def _take_card(self) -> Optional[str]:
+        """Take next received card, readers take turns so none of them is starved.
+
+        Returns:
+            Hex string representation of card data or None if no reader has complete frame.
+
+        Raises:
+            InvalidDataException: If card data are corrupted.
+        """
+        for shift in range(len(self._readers)):
+            reader: CardReader = self._readers[(self._next + shift) % len(self._readers)]
+            self._source = reader.name
+            card: Optional[str] = reader.take_card()
+            if card is not None:
+                self._next = (self._next + shift + 1) % len(self._readers)
+                return card
+        return None
+
+    def _receive(self, reader: CardReader) -> None:
+        """Read buffered data of the reader.
+
+        Args:
+            reader: Reader whose port is readable.
+        """
+        try:
+            reader.receive()
+        except serial.SerialException as e:
+            self.logger.warning('Reader {0} failed and is ignored: {1}'.format(reader.name, e))
+            self._selector.unregister(reader)
+            self._active.remove(reader)
+
+    def read_card(self, raise_if_no_data: bool = False) -> str:
+        """Read one card from any of the readers.
+
+        Args:
+            raise_if_no_data: If true the NoDataException is raised if no data arrive until timeout.
+
+        Returns:
+            Hex string representation of card data.
+
+        Raises:
+            NoDataException: If raise_if_no_data is set to True and no data was read.
+            InvalidDataException: If card data are corrupted.
+            ReadCancelledException: If the read was cancelled.
+            serial.SerialException: If ports of all the readers failed.
+        """
+        while True:
+            self._cancellation.check()
+            card: Optional[str] = self._take_card()
+            if card is not None:
+                return card
+            if not self._active:
+                raise serial.SerialException('Ports of all the card readers failed.')
+
+            waiting: bool = any(reader.in_frame for reader in self._active)
+            timeout: Optional[float] = None
+            if raise_if_no_data or waiting:
+                timeout = CardReader.TIMEOUT
+            events = self._selector.select(timeout)
+            self._cancellation.check()
+            if not events:
+                for reader in self._active:
+                    self._source = reader.name
+                    reader.drop_incomplete_frame()
+                if raise_if_no_data:
+                    raise NoDataException('No card data was read.')
+                continue
+            for key, _ in events:
+                if key.fileobj is not self._cancellation:
+                    self._receive(key.fileobj)
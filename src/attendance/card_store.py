@@ -0,0 +1,434 @@
+from .card_id import CardId
+from .card_id import CardSet
+from .card_id import format_card
+from .card_id import pack_card
+
+from abc import ABC
+from abc import abstractmethod
+from logging import getLogger
+from logging import Logger
+from pathlib import Path
+from threading import Condition
+from threading import RLock
+from threading import Thread
+from time import monotonic
+from typing import Any
+from typing import BinaryIO
+from typing import Dict
+from typing import Final
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+import json
+import os
+import shutil
+
+
+class ICardStore(ABC):
+    """Persistent storage of read cards and of the connection token."""
+
+    @abstractmethod
+    def load(self) -> None:
+        """Load previously stored cards and token."""
+        pass
+
+    @abstractmethod
+    def get_token(self) -> Optional[str]:
+        """Return stored token if there is any."""
+        pass
+
+    @abstractmethod
+    def set_token(self, token: str) -> None:
+        """Store connection token.
+
+        Args:
+            token: Connection token to store.
+        """
+        pass
+
+    @abstractmethod
+    def add_card(self, card: CardId) -> bool:
+        """Store card.
+
+        Args:
+            card: Card to store.
+
+        Returns:
+            True if the card was added, false if it was already stored or acknowledged.
+        """
+        pass
+
+    @abstractmethod
+    def get_cards(self) -> CardSet:
+        """Return copy of all stored cards which were not acknowledged yet."""
+        pass
+
+    @abstractmethod
+    def acknowledge(self, cards: Iterable[CardId]) -> None:
+        """Mark cards as acknowledged by the API.
+
+        Acknowledged cards are no longer pending and are not stored again in the current session.
+
+        Args:
+            cards: Cards accepted by the API.
+        """
+        pass
+
+    @abstractmethod
+    def count_acknowledged(self) -> int:
+        """Return number of cards acknowledged in the current session."""
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all stored cards."""
+        pass
+
+    def start_session(self, session: str) -> None:
+        """Mark beginning of a new recording session.
+
+        Args:
+            session: Token received for the organizator card.
+        """
+        pass
+
+    def close(self) -> None:
+        """Flush all pending data to the persistent storage."""
+        pass
+
+
+class JournalCardStore(ICardStore):
+    """Card store backed by a snapshot file and an append-only journal.
+
+    Every change is appended to the journal as a single JSON line.
+    Pending and acknowledged cards are kept in memory as compact card sets.
+    Journal is synced to the disk at most once per commit window (group commit)
+    and it is compacted into the snapshot by a background thread once it is too long.
+    Snapshot has the same format as the original cache file ({'token': ..., 'cards': [...]}).
+    """
+
+    COMPACTING_SUFFIX: Final = '.compacting'
+    TMP_SUFFIX: Final = '.tmp'
+
+    def __init__(self,
+                 snapshot_path: Path,
+                 journal_path: Path,
+                 commit_window: float = 0.5,
+                 compact_threshold: int = 500):
+        """Init store.
+
+        Args:
+            snapshot_path: Path to the snapshot file.
+            journal_path: Path to the journal file.
+            commit_window: Maximal time in seconds between a write and its fsync,
+                           0 means fsync after every write.
+            compact_threshold: Number of journal records which triggers compaction.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._snapshot_path: Final = snapshot_path
+        self._journal_path: Final = journal_path
+        self._compacting_path: Final = Path(
+            str(journal_path) + JournalCardStore.COMPACTING_SUFFIX)
+        self._commit_window: Final = commit_window
+        self._compact_threshold: Final = compact_threshold
+
+        self._lock: RLock = RLock()
+        self._commit_condition: Condition = Condition(self._lock)
+        self._cards: CardSet = CardSet()
+        self._acknowledged: CardSet = CardSet()
+        self._token: Optional[str] = None
+        self._journal: Optional[BinaryIO] = None
+        self._journal_records: int = 0
+        self._dirty_since: Optional[float] = None
+        self._closed: bool = False
+        self._committer: Optional[Thread] = None
+        self._compactor: Optional[Thread] = None
+
+    def load(self) -> None:
+        """Replay snapshot and journal and open the journal for appending.
+
+        Torn or corrupted journal records are skipped.
+        """
+        with self._lock:
+            self._closed = False
+            self._cards = CardSet()
+            self._acknowledged = CardSet()
+            self._token = None
+            self._load_snapshot()
+            self._journal_records = self._replay_journal(self._compacting_path)
+            self._journal_records += self._replay_journal(self._journal_path)
+            if self._compacting_path.exists():
+                # Previous compaction was interrupted, finish it before the journal is rotated again
+                self._compact(self._get_state())
+            self._journal = open(self._journal_path, 'ab')
+            self.logger.debug('Cache loaded - {0} cards, {1} journal records.'.format(
+                len(self._cards), self._journal_records))
+        if self._commit_window > 0 and self._committer is None:
+            self._committer = Thread(target=self._commit_loop, daemon=True)
+            self._committer.start()
+
+    def _load_snapshot(self) -> None:
+        """Load cards and token from the snapshot file."""
+        if not self._snapshot_path.exists():
+            return
+        try:
+            with open(self._snapshot_path, 'r', encoding='utf-8') as json_file:
+                data: Dict[str, Any] = json.load(json_file)
+        except ValueError:
+            self.logger.warning('Snapshot {0} is corrupted and was skipped.'.format(
+                self._snapshot_path))
+            return
+        if 'token' in data:
+            self._token = data['token']
+        for key, cards in (('cards', self._cards), ('acknowledged', self._acknowledged)):
+            for card in data.get(key, ()):
+                try:
+                    cards.add(card)
+                except (ValueError, TypeError):
+                    self.logger.warning('Invalid card {0} in snapshot {1} skipped.'.format(
+                        card, self._snapshot_path))
+
+    def _replay_journal(self, path: Path) -> int:
+        """Apply all valid records of the journal.
+
+        If the last record is torn the journal is truncated to the end of the last valid record.
+
+        Args:
+            path: Path to the journal.
+
+        Returns:
+            Number of applied records.
+        """
+        if not path.exists():
+            return 0
+        applied: int = 0
+        valid_size: int = 0
+        with open(path, 'rb') as journal:
+            for line in journal:
+                if not line.endswith(b'\n'):
+                    self.logger.warning('Torn record at the end of {0} skipped.'.format(path))
+                    break
+                valid_size += len(line)
+                try:
+                    self._apply(json.loads(line.decode('utf-8')))
+                    applied += 1
+                except (ValueError, KeyError, TypeError):
+                    self.logger.warning('Corrupted record in {0} skipped.'.format(path))
+        if valid_size != path.stat().st_size:
+            os.truncate(path, valid_size)
+        return applied
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Apply single journal record to the in-memory state.
+
+        Args:
+            record: Journal record.
+        """
+        op: str = record['op']
+        if op == 'add':
+            card: CardId = pack_card(record['card'])
+            if card not in self._acknowledged:
+                self._cards.add(card)
+        elif op == 'ack':
+            for card in record['cards']:
+                self._cards.discard(card)
+                self._acknowledged.add(card)
+        elif op == 'session':
+            self._acknowledged.clear()
+        elif op == 'token':
+            self._token = record['token']
+        elif op == 'clear':
+            self._cards.clear()
+        else:
+            raise KeyError(op)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Append record to the journal and schedule its sync.
+
+        Args:
+            record: Journal record.
+        """
+        if self._journal is None:
+            raise RuntimeError('Card store is not loaded.')
+        self._journal.write(json.dumps(record).encode('utf-8') + b'\n')
+        self._journal.flush()
+        self._journal_records += 1
+        if self._commit_window <= 0:
+            os.fsync(self._journal.fileno())
+        elif self._dirty_since is None:
+            self._dirty_since = monotonic()
+            self._commit_condition.notify()
+        if self._journal_records >= self._compact_threshold:
+            self._start_compaction()
+
+    def _commit_loop(self) -> None:
+        """Sync the journal once the commit window of the oldest unsynced write elapses."""
+        with self._lock:
+            while not self._closed:
+                if self._dirty_since is None:
+                    self._commit_condition.wait()
+                    continue
+                remaining: float = self._dirty_since + self._commit_window - monotonic()
+                if remaining > 0:
+                    self._commit_condition.wait(remaining)
+                    continue
+                # Sync a duplicate descriptor without holding the lock so the appends are not blocked
+                fd: int = os.dup(self._journal.fileno())
+                self._dirty_since = None
+                self._lock.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                    self._lock.acquire()
+
+    def _sync(self) -> None:
+        """Sync the journal to the disk."""
+        if self._journal is not None and self._dirty_since is not None:
+            os.fsync(self._journal.fileno())
+        self._dirty_since = None
+
+    def _get_state(self) -> Dict[str, Any]:
+        """Return current state in the snapshot format."""
+        return {
+            'token': self._token,
+            'cards': [format_card(card) for card in self._cards],
+            'acknowledged': [format_card(card) for card in self._acknowledged]
+        }
+
+    def _start_compaction(self) -> None:
+        """Rotate the journal and write a new snapshot in the background."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._sync()
+        self._journal.close()
+        if self._compacting_path.exists():
+            # Previous compaction failed, its records are kept until a snapshot covers them
+            self._merge_into_compacting()
+        else:
+            os.replace(self._journal_path, self._compacting_path)
+        self._journal = open(self._journal_path, 'ab')
+        self._journal_records = 0
+        state: Dict[str, Any] = self._get_state()
+        self._compactor = Thread(target=self._compact, args=(state,), daemon=True)
+        self._compactor.start()
+
+    def _merge_into_compacting(self) -> None:
+        """Append the journal to the rotated journal and remove it.
+
+        Records appended twice by a crash before the removal are replayed twice,
+        which gives the same state.
+        """
+        with open(self._compacting_path, 'ab') as compacting, \
+                open(self._journal_path, 'rb') as journal:
+            shutil.copyfileobj(journal, compacting)
+            compacting.flush()
+            os.fsync(compacting.fileno())
+        os.remove(self._journal_path)
+
+    def _compact(self, state: Dict[str, Any]) -> None:
+        """Atomically replace snapshot by given state and remove the rotated journal.
+
+        Args:
+            state: State to write as the new snapshot.
+        """
+        tmp_path: Path = Path(str(self._snapshot_path) + JournalCardStore.TMP_SUFFIX)
+        with open(tmp_path, 'w', encoding='utf-8') as json_file:
+            json.dump(state, json_file)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        os.remove(self._compacting_path)
+        self.logger.debug('Cache compacted - {0} cards.'.format(len(state['cards'])))
+
+    def get_token(self) -> Optional[str]:
+        """Return stored token if there is any."""
+        return self._token
+
+    def set_token(self, token: str) -> None:
+        """Append token record if the token changed.
+
+        Args:
+            token: Connection token to store.
+        """
+        with self._lock:
+            if token == self._token:
+                return
+            self._token = token
+            self._append({'op': 'token', 'token': token})
+
+    def add_card(self, card: CardId) -> bool:
+        """Append card record.
+
+        Args:
+            card: Card to store.
+
+        Returns:
+            True if the card was added, false if it was already stored or acknowledged.
+        """
+        with self._lock:
+            if card in self._cards or card in self._acknowledged:
+                return False
+            self._cards.add(card)
+            self._append({'op': 'add', 'card': format_card(card)})
+            return True
+
+    def get_cards(self) -> CardSet:
+        """Return copy of all stored cards which were not acknowledged yet."""
+        with self._lock:
+            return self._cards.copy()
+
+    def acknowledge(self, cards: Iterable[CardId]) -> None:
+        """Append acknowledge record.
+
+        Args:
+            cards: Cards accepted by the API.
+        """
+        with self._lock:
+            acknowledged: List[CardId] = []
+            for card in cards:
+                self._cards.discard(card)
+                if self._acknowledged.add(card):
+                    acknowledged.append(card)
+            if acknowledged:
+                self._append({'op': 'ack', 'cards': [format_card(card) for card in acknowledged]})
+
+    def count_acknowledged(self) -> int:
+        """Return number of cards acknowledged in the current session."""
+        return len(self._acknowledged)
+
+    def start_session(self, session: str) -> None:
+        """Forget cards acknowledged in the previous session.
+
+        Args:
+            session: Token received for the organizator card.
+        """
+        with self._lock:
+            self._acknowledged.clear()
+            self._append({'op': 'session'})
+
+    def clear(self) -> None:
+        """Append clear record."""
+        with self._lock:
+            self._cards.clear()
+            self._append({'op': 'clear'})
+
+    def close(self) -> None:
+        """Sync the journal, wait for running compaction and close the journal."""
+        with self._lock:
+            self._closed = True
+            self._sync()
+            self._commit_condition.notify()
+            compactor: Optional[Thread] = self._compactor
+            committer: Optional[Thread] = self._committer
+            # Committer is started again by the next load
+            self._committer = None
+        if compactor is not None:
+            compactor.join()
+        if committer is not None:
+            committer.join()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
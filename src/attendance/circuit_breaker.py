@@ -0,0 +1,191 @@
+from enum import Enum
+from logging import getLogger
+from logging import Logger
+from threading import Lock
+from threading import Timer
+from typing import Callable
+from typing import Dict
+from typing import Final
+from typing import List
+from typing import Optional
+
+
+class CircuitState(Enum):
+    """Enumeration of circuit breaker states."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Stops sending requests to a server which keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and requests are
+    rejected without touching the network. The server is then probed in the background
+    every reset_timeout seconds. During the probe the circuit is half-open and a single
+    request is let through, success of the probe or of the request closes the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        """Init closed circuit.
+
+        Args:
+            failure_threshold: Number of consecutive failures which opens the circuit.
+            reset_timeout: Interval of the server probes while the circuit is open in seconds.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._failure_threshold: Final = failure_threshold
+        self._reset_timeout: Final = reset_timeout
+        self._lock: Lock = Lock()
+        self._state: CircuitState = CircuitState.CLOSED
+        self._failures: int = 0
+        self._trial_running: bool = False
+        self._rejected: int = 0
+        self._transitions: Dict[str, int] = {}
+        self._probe: Optional[Callable[[], bool]] = None
+        self._probe_timer: Optional[Timer] = None
+        self._listeners: List[Callable[[CircuitState, CircuitState], None]] = []
+
+    def set_probe(self, probe: Callable[[], bool]) -> None:
+        """Set function which checks if the server is reachable.
+
+        Args:
+            probe: Returns true if the server responded.
+        """
+        self._probe = probe
+
+    def add_listener(self, listener: Callable[[CircuitState, CircuitState], None]) -> None:
+        """Register function called with the old and the new state after every transition.
+
+        Listeners are called from the thread which caused the transition.
+
+        Args:
+            listener: Function to call.
+        """
+        self._listeners.append(listener)
+
+    def get_state(self) -> CircuitState:
+        """Return current state."""
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Decide if request may be sent.
+
+        Returns:
+            True if the circuit is closed or if the request is the trial one of half-open circuit.
+        """
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Record successful request, closes the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            old_state: Optional[CircuitState] = self._transition(CircuitState.CLOSED)
+        self._notify(old_state, CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        """Record failed request, opens the circuit after too many failures."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            old_state: Optional[CircuitState] = None
+            if self._state == CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+                old_state = self._transition(CircuitState.OPEN)
+        self._notify(old_state, CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> Optional[CircuitState]:
+        """Change state, the lock has to be held.
+
+        Args:
+            state: New state.
+
+        Returns:
+            Previous state or None if the state did not change.
+        """
+        if self._state == state:
+            return None
+        old_state: CircuitState = self._state
+        self._state = state
+        key: str = '{0}->{1}'.format(old_state.value, state.value)
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        self.logger.warning('Circuit {0} (after {1} consecutive failures).'.format(
+            key, self._failures))
+        if state == CircuitState.OPEN:
+            self._schedule_probe()
+        return old_state
+
+    def _notify(self, old_state: Optional[CircuitState], state: CircuitState) -> None:
+        """Call listeners if the state changed."""
+        if old_state is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(old_state, state)
+            except Exception:
+                self.logger.exception('Circuit listener failed.')
+
+    def _schedule_probe(self) -> None:
+        """Schedule next probe of the server, the lock has to be held."""
+        if self._probe is None:
+            # Without probe the next request after the timeout is the trial one
+            self._probe_timer = Timer(self._reset_timeout, self._half_open)
+        else:
+            self._probe_timer = Timer(self._reset_timeout, self._run_probe)
+        self._probe_timer.daemon = True
+        self._probe_timer.start()
+
+    def _half_open(self) -> None:
+        """Let the next request through."""
+        with self._lock:
+            if self._state != CircuitState.OPEN:
+                return
+            old_state: Optional[CircuitState] = self._transition(CircuitState.HALF_OPEN)
+        self._notify(old_state, CircuitState.HALF_OPEN)
+
+    def _run_probe(self) -> None:
+        """Probe the server and close or reopen the circuit."""
+        self._half_open()
+        if self._state != CircuitState.HALF_OPEN:
+            return
+        try:
+            available: bool = self._probe()
+        except Exception:
+            self.logger.exception('Circuit probe failed.')
+            available = False
+        if available:
+            self.record_success()
+            return
+        with self._lock:
+            old_state: Optional[CircuitState] = None
+            if self._state == CircuitState.HALF_OPEN:
+                old_state = self._transition(CircuitState.OPEN)
+        self._notify(old_state, CircuitState.OPEN)
+
+    def get_stats(self) -> Dict[str, object]:
+        """Return state, number of consecutive failures, rejected requests and transitions.
+
+        Returns:
+            Dictionary with state, failures, rejected and transitions counted by 'old->new' key.
+        """
+        with self._lock:
+            return {
+                'state': self._state.value,
+                'failures': self._failures,
+                'rejected': self._rejected,
+                'transitions': dict(self._transitions)
+            }
+
+    def close(self) -> None:
+        """Stop probing the server."""
+        with self._lock:
+            if self._probe_timer is not None:
+                self._probe_timer.cancel()
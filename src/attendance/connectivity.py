@@ -0,0 +1,408 @@
+"""Cached state of the connection to the API server.
+
+Reachability is verified by a TCP connect to the server, which costs a handshake instead
+of a whole HTTP request. The result is cached and only refreshed when it gets older than
+its time to live or when the network changes. Changes of links, addresses and routes are
+reported by the kernel over netlink, where netlink is not available the state of the
+interfaces in /sys/class/net is compared whenever the cached state is read.
+"""
+from abc import ABC
+from abc import abstractmethod
+from logging import getLogger
+from logging import Logger
+from select import select
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from typing import Callable
+from typing import Dict
+from typing import Final
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import ParseResult
+from urllib.parse import urlparse
+
+import os
+import socket
+import struct
+
+
+class ILinkWatcher(ABC):
+    """Watcher of the network interfaces which reports their changes."""
+
+    @abstractmethod
+    def start(self, callback: Callable[[], None]) -> None:
+        """Start watching.
+
+        Args:
+            callback: Function called after every change of the network.
+        """
+        pass
+
+    def check(self) -> None:
+        """Look for changes, called before the cached state is read.
+
+        Default implementation does nothing, changes are reported asynchronously.
+        """
+        pass
+
+    def close(self) -> None:
+        """Stop watching."""
+        pass
+
+
+class NetlinkWatcher(ILinkWatcher):
+    """Link watcher which listens to the route netlink multicast groups of Linux.
+
+    Kernel sends a message whenever a link goes up or down, an address is added or removed
+    or a route changes, so the watcher sleeps until something actually happens.
+    """
+
+    RTMGRP_LINK: Final = 0x1
+    RTMGRP_IPV4_IFADDR: Final = 0x10
+    RTMGRP_IPV4_ROUTE: Final = 0x40
+    RTMGRP_IPV6_IFADDR: Final = 0x100
+    RTMGRP_IPV6_ROUTE: Final = 0x400
+    # RTM_NEWLINK, RTM_DELLINK, RTM_NEWADDR, RTM_DELADDR, RTM_NEWROUTE, RTM_DELROUTE
+    CHANGE_TYPES: Final = frozenset((16, 17, 20, 21, 24, 25))
+    HEADER: Final = struct.Struct('=LHHLL')
+    BUFFER_SIZE: Final = 65536
+
+    def __init__(self):
+        """Open the netlink socket.
+
+        Raises:
+            OSError: If netlink is not supported.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._socket: socket.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                                    socket.NETLINK_ROUTE)
+        try:
+            self._socket.bind((0, NetlinkWatcher.RTMGRP_LINK
+                               | NetlinkWatcher.RTMGRP_IPV4_IFADDR | NetlinkWatcher.RTMGRP_IPV4_ROUTE
+                               | NetlinkWatcher.RTMGRP_IPV6_IFADDR | NetlinkWatcher.RTMGRP_IPV6_ROUTE))
+        except OSError:
+            self._socket.close()
+            raise
+        # Written on close to wake up the watching thread
+        self._wakeup: Tuple[int, int] = os.pipe()
+        self._callback: Optional[Callable[[], None]] = None
+        self._thread: Thread = Thread(target=self._run, name='netlink', daemon=True)
+
+    @staticmethod
+    def parse_types(data: bytes) -> List[int]:
+        """Return types of the netlink messages in the datagram.
+
+        Args:
+            data: Received datagram.
+
+        Returns:
+            Types of the messages.
+        """
+        types: List[int] = []
+        offset: int = 0
+        while offset + NetlinkWatcher.HEADER.size <= len(data):
+            length, message_type, _, _, _ = NetlinkWatcher.HEADER.unpack_from(data, offset)
+            if length < NetlinkWatcher.HEADER.size:
+                break
+            types.append(message_type)
+            # Messages are aligned to 4 bytes
+            offset += (length + 3) & ~3
+        return types
+
+    def start(self, callback: Callable[[], None]) -> None:
+        """Start watching.
+
+        Args:
+            callback: Function called after every change of the network.
+        """
+        self._callback = callback
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Receive netlink messages until closed."""
+        while True:
+            readable, _, _ = select([self._socket, self._wakeup[0]], [], [])
+            if self._wakeup[0] in readable:
+                return
+            try:
+                data: bytes = self._socket.recv(NetlinkWatcher.BUFFER_SIZE)
+            except OSError as e:
+                # ENOBUFS, some messages were lost, the network changed anyway
+                self.logger.debug('Netlink receive failed: {0}'.format(e))
+                data = b''
+            types: List[int] = NetlinkWatcher.parse_types(data)
+            if not data or NetlinkWatcher.CHANGE_TYPES.intersection(types):
+                self.logger.debug('Network changed (netlink messages {0}).'.format(types))
+                if self._callback is not None:
+                    self._callback()
+
+    def close(self) -> None:
+        """Stop watching and close the socket."""
+        os.write(self._wakeup[1], b'\0')
+        if self._thread.is_alive():
+            self._thread.join()
+        self._socket.close()
+        os.close(self._wakeup[0])
+        os.close(self._wakeup[1])
+
+
+class SysfsLinkWatcher(ILinkWatcher):
+    """Link watcher which compares state of the interfaces in /sys/class/net.
+
+    There is no thread, the state is read when the cached connectivity is used. Only links
+    are seen, address and route changes are left to the time to live of the cached state.
+    """
+
+    ATTRIBUTES: Final = ('operstate', 'carrier')
+
+    def __init__(self, path: str = '/sys/class/net'):
+        """Init watcher.
+
+        Args:
+            path: Folder with the network interfaces.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._path: Final = path
+        self._callback: Optional[Callable[[], None]] = None
+        self._state: Dict[str, Tuple[str, ...]] = {}
+
+    def _read_attribute(self, interface: str, attribute: str) -> str:
+        """Read attribute of the interface, empty string if it can't be read."""
+        try:
+            with open(os.path.join(self._path, interface, attribute)) as file:
+                return file.read().strip()
+        except OSError:
+            # Carrier of a link which is down can't be read
+            return ''
+
+    def read_state(self) -> Dict[str, Tuple[str, ...]]:
+        """Return attributes of all interfaces except the loopback."""
+        try:
+            interfaces: List[str] = sorted(os.listdir(self._path))
+        except OSError:
+            return {}
+        return {interface: tuple(self._read_attribute(interface, attribute)
+                                 for attribute in SysfsLinkWatcher.ATTRIBUTES)
+                for interface in interfaces if interface != 'lo'}
+
+    def start(self, callback: Callable[[], None]) -> None:
+        """Remember the current state of the interfaces.
+
+        Args:
+            callback: Function called when a change is found by check.
+        """
+        self._callback = callback
+        self._state = self.read_state()
+
+    def check(self) -> None:
+        """Compare the interfaces with their last state and report a change."""
+        state: Dict[str, Tuple[str, ...]] = self.read_state()
+        if state == self._state:
+            return
+        self.logger.debug('Network changed ({0}).'.format(state))
+        self._state = state
+        if self._callback is not None:
+            self._callback()
+
+
+def create_link_watcher() -> ILinkWatcher:
+    """Create netlink watcher, or watcher of /sys/class/net if netlink is not available."""
+    try:
+        return NetlinkWatcher()
+    except (AttributeError, OSError):
+        # AF_NETLINK exists on Linux only
+        return SysfsLinkWatcher()
+
+
+class ConnectivityMonitor:
+    """Cached reachability of the server.
+
+    The server is probed by a background worker, so is_available returns immediately.
+    Available state is trusted for ttl seconds, unavailable one for retry_interval seconds.
+    When the cached state expires, it is probed again on the next read, when the network
+    changes it is probed right away and the listeners are notified, e.g. to drop connections
+    bound to the old address. Results of the real requests can be reported as well,
+    so a server in use is never probed.
+    """
+
+    def __init__(self,
+                 url: str,
+                 ttl: float = 30.0,
+                 retry_interval: float = 5.0,
+                 timeout: float = 3.0,
+                 watcher: Optional[ILinkWatcher] = None,
+                 probe: Optional[Callable[[], bool]] = None):
+        """Init monitor and start the first probe.
+
+        Args:
+            url: URL of the server, its host and port are probed.
+            ttl: Seconds the available state is trusted.
+            retry_interval: Seconds the unavailable state is trusted.
+            timeout: Timeout of the probe in seconds.
+            watcher: Watcher of the network, netlink or /sys/class/net watcher by default.
+            probe: Function which checks the server, TCP connect by default.
+        """
+        self.logger: Logger = getLogger(__name__)
+        parsed: ParseResult = urlparse(url)
+        self._address: Final = (parsed.hostname or '',
+                                parsed.port or (443 if parsed.scheme == 'https' else 80))
+        self._ttl: Final = ttl
+        self._retry_interval: Final = retry_interval
+        self._timeout: Final = timeout
+        self._probe: Callable[[], bool] = probe if probe is not None else self._connect
+
+        self._condition: Condition = Condition()
+        self._available: Optional[bool] = None
+        self._checked_at: Optional[float] = None
+        self._probe_requested: bool = True
+        self._probing: bool = False
+        self._closed: bool = False
+        self._probes: int = 0
+        self._reports: int = 0
+        self._network_changes: int = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._worker: Thread = Thread(target=self._run, name='connectivity', daemon=True)
+        self._worker.start()
+        self._watcher: ILinkWatcher = watcher if watcher is not None else create_link_watcher()
+        self._watcher.start(self.invalidate)
+
+    def _connect(self) -> bool:
+        """Open and close TCP connection to the server.
+
+        Returns:
+            True if the connection was established.
+        """
+        try:
+            socket.create_connection(self._address, self._timeout).close()
+            return True
+        except OSError as e:
+            self.logger.debug('Server {0}:{1} is not reachable: {2}'.format(*self._address, e))
+            return False
+
+    def _get_expiry(self) -> Optional[float]:
+        """Return monotonic time when the cached state expires, the lock has to be held."""
+        if self._checked_at is None:
+            return None
+        return self._checked_at + (self._ttl if self._available else self._retry_interval)
+
+    def _request_probe_if_stale(self) -> None:
+        """Ask the worker for a probe if the cached state expired, the lock has to be held."""
+        expiry: Optional[float] = self._get_expiry()
+        if (expiry is None or monotonic() >= expiry) and not self._probing:
+            self._probe_requested = True
+            self._condition.notify_all()
+
+    def _set_state(self, available: bool) -> None:
+        """Cache the state, the lock has to be held."""
+        if available != self._available:
+            self.logger.info('Server is {0}.'.format('reachable' if available else 'unreachable'))
+        self._available = available
+        self._checked_at = monotonic()
+        self._condition.notify_all()
+
+    def _run(self) -> None:
+        """Probe the server whenever asked until closed."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._probe_requested)
+                if self._closed:
+                    return
+                self._probe_requested = False
+                self._probing = True
+            available: bool = self._probe()
+            with self._condition:
+                self._probing = False
+                self._probes += 1
+                self._set_state(available)
+
+    def is_available(self) -> bool:
+        """Return cached state without waiting, expired state is refreshed in the background.
+
+        Returns:
+            True if the server was reachable, false if not or if it was not probed yet.
+        """
+        self._watcher.check()
+        with self._condition:
+            self._request_probe_if_stale()
+            return bool(self._available)
+
+    def wait_until_available(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the server is reachable, it is probed again whenever the state expires.
+
+        Args:
+            timeout: Maximal time to wait in seconds, None waits until the server is reachable.
+
+        Returns:
+            True if the server is reachable.
+        """
+        deadline: Optional[float] = None if timeout is None else monotonic() + timeout
+        self._watcher.check()
+        with self._condition:
+            while not self._closed:
+                if self._available:
+                    return True
+                self._request_probe_if_stale()
+                now: float = monotonic()
+                if deadline is not None and now >= deadline:
+                    return False
+                wait: Optional[float] = None if deadline is None else deadline - now
+                expiry: Optional[float] = self._get_expiry()
+                if expiry is not None and not self._probing and not self._probe_requested:
+                    wait = expiry - now if wait is None else min(wait, expiry - now)
+                self._condition.wait(wait)
+            return False
+
+    def report(self, available: bool) -> None:
+        """Cache result of a request sent to the server.
+
+        Args:
+            available: True if the server responded.
+        """
+        with self._condition:
+            self._reports += 1
+            self._set_state(available)
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Register function called after every change of the network.
+
+        Listeners are called from the thread which found the change.
+
+        Args:
+            listener: Function to call.
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self) -> None:
+        """Probe the server right away and notify the listeners, called when the network changes."""
+        with self._condition:
+            self._network_changes += 1
+            self._checked_at = None
+            # Probe which is running may have started before the change
+            self._probe_requested = True
+            self._condition.notify_all()
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception:
+                self.logger.exception('Network change listener failed.')
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        """Return cached state, its age in seconds and numbers of probes, reports and network changes."""
+        with self._condition:
+            return {
+                'available': self._available,
+                'age': None if self._checked_at is None else monotonic() - self._checked_at,
+                'probes': self._probes,
+                'reports': self._reports,
+                'network_changes': self._network_changes
+            }
+
+    def close(self) -> None:
+        """Stop the worker and watching of the network."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._watcher.close()
+        self._worker.join()
@@ -1,18 +1,35 @@
+from .lru_cache import LRUCache
+from .resources import read_resource
 from .resources.config import config
 
 from abc import ABC
-from ctypes import c_bool
-from luma.core.device import device as luma_device
+from enum import IntEnum
+from io import BytesIO
 from PIL import Image
 from PIL import ImageDraw
 from PIL import ImageFont
-from pkg_resources import resource_filename
-from time import sleep
-from multiprocessing import Process
-from multiprocessing import Value
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from typing import Any
 from typing import Final
+from typing import List
+from typing import NamedTuple
 from typing import Optional
 from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Luma is needed only by the devices, not by the display itself
+    from luma.core.device import device as luma_device
+
+
+class Priority(IntEnum):
+    """Priority of a displayed message, message with higher priority replaces the current one."""
+
+    LOW = 0
+    NORMAL = 1
+    HIGH = 2
 
 
 class IDisplay(ABC):
@@ -22,34 +39,83 @@ class IDisplay(ABC):
         """Clear the display."""
         pass
 
-    def show(self, msga: str, msgb: str = '', can_be_killed: bool = True) -> None:
+    def show(self, msga: str, msgb: str = '', can_be_killed: bool = True,
+             priority: Priority = Priority.NORMAL, min_duration: float = 0.0,
+             block: bool = False) -> None:
         """Display given two messages where the second one is optional.
 
         Args:
             msga: Text which will be displayed at the first line.
             msgb: Text which will be displayed at the second line.
             can_be_killed: If false text is displayed whole at least once.
+            priority: Message of higher priority replaces the current one right away.
+            min_duration: Seconds the message is displayed at least, unless replaced
+                          by a message of higher priority.
+            block: If true wait until the message was displayed whole (if it cannot be killed)
+                   and for its minimal duration, otherwise return immediately.
         """
         pass
 
+    def close(self) -> None:
+        """Stop displaying."""
+        pass
+
+
+class DisplayMessage(NamedTuple):
+    """Message waiting for the display.
+
+    Attributes:
+        msga: Text of the first line.
+        msgb: Text of the second line.
+        whole_pass: If true text has to be displayed whole at least once.
+        priority: Priority of the message.
+        min_duration: Seconds the message is displayed at least.
+    """
+
+    msga: str
+    msgb: str
+    whole_pass: bool
+    priority: Priority
+    min_duration: float
+
+    def is_protected(self) -> bool:
+        """Return true if the message may not be replaced by a message of the same priority."""
+        return self.whole_pass or self.min_duration > 0
+
 
 class OLEDdisplay(IDisplay):
     """Class for work with OLED display from luma library.
 
     The display can be configured using the config.ini file in resources folder.
+    Messages are rendered by a single long-lived worker thread which receives them
+    through a queue. Message of higher priority replaces the current one immediately,
+    message of the same or lower priority waits until the current one was displayed
+    whole (if it cannot be killed) and for its minimal duration.
+    Both lines of a message are rasterized once into a wide strip and every frame
+    of the scrolling is cropped from it. Strips and text sizes are kept in LRU caches,
+    so the repeated prompts are never rendered again.
+    Strips are drawn by PIL or, with the numpy backend, composed from a glyph atlas
+    and kept in the page format of the display, which is sent to the device directly
+    if it supports it.
     """
 
     MONOCHROMATIC: Final = '1'
     WHITE: Final = 255
     BLACK: Final = 0
+    FRAME_INTERVAL: Final = 0.05
+    SCROLL_STEP: Final = 10
+
+    def __init__(self, device: 'luma_device', backend: Optional[str] = None):
+        """Init class based on config and start the render worker.
 
-    def __init__(self, device: luma_device):
-        """Init class based on config."""
-        font_filename: str = resource_filename(
-            'attendance.resources', config['Display']['font'])
+        Args:
+            device: Luma device of the display.
+            backend: Rendering backend, 'pil' or 'numpy', default is taken from config.
+        """
+        font_data: bytes = read_resource(config['Display']['font'])
         font_size: int = int(config['Display']['fontsize'])
 
-        self.FONT: Final = ImageFont.truetype(font_filename, font_size)
+        self.FONT: Final = ImageFont.truetype(BytesIO(font_data), font_size)
 
         self._device: Final = device
 
@@ -57,10 +123,25 @@ class OLEDdisplay(IDisplay):
                                         (self._device.width, self._device.height))
 
         self._buffer_draw: ImageDraw.Draw = ImageDraw.Draw(self._buffer)
-        self._process: Optional[Process] = None
-        self._can_be_killed: Value = Value(c_bool, True)
-        self._previous_args: Optional[Tuple[str, str]] = None
+        self._framebuffer: Optional[Any] = None
+        if (backend or config['Display']['backend']) == 'numpy':
+            # Imported here because NumPy is an optional dependency
+            from .framebuffer import NumpyFramebuffer
+            self._framebuffer = NumpyFramebuffer(self.FONT, self._device.width,
+                                                 self._device.height)
+        self._text_sizes: LRUCache[Tuple[int, int]] = LRUCache(
+            int(config['Display']['metrics_cache_size']))
+        self._strips: LRUCache[Any] = LRUCache(
+            int(config['Display']['strip_cache_bytes']),
+            self._get_strip_size)
+        self._condition: Condition = Condition()
+        self._pending: List[DisplayMessage] = []
+        self._current: Optional[DisplayMessage] = None
+        self._done: Optional[DisplayMessage] = None
+        self._closed: bool = False
         self.clear(buffer_only=False)
+        self._worker: Thread = Thread(target=self._run, name='display', daemon=True)
+        self._worker.start()
 
     def clear(self, buffer_only: bool = True) -> None:
         """Clear display screen and buffer.
@@ -73,9 +154,26 @@ class OLEDdisplay(IDisplay):
         if not buffer_only:
             self._device.clear()
 
-    def _draw_text_to_buffer(self, text: str, left: int, top: int) -> None:
-        self._buffer_draw.text(
-            (left, top), text, font=self.FONT, fill=OLEDdisplay.WHITE)
+    def _get_text_size(self, text: str) -> Tuple[int, int]:
+        """Get size of the text in pixels for used font.
+
+        Args:
+            text: Text which size will be measured.
+
+        Returns:
+            Width and height of the text in pixels.
+        """
+        return self._text_sizes.get(text, lambda: self._measure_text(text))
+
+    def _measure_text(self, text: str) -> Tuple[int, int]:
+        """Measure size of the text in pixels for used font."""
+        if self._framebuffer is not None:
+            return self._framebuffer.measure_text(text)
+        if hasattr(self._buffer_draw, 'textbbox'):
+            # textsize was removed in Pillow 10
+            bbox: Tuple[int, int, int, int] = self._buffer_draw.textbbox((0, 0), text, font=self.FONT)
+            return bbox[2], bbox[3]
+        return self._buffer_draw.textsize(text, font=self.FONT)
 
     def _get_text_width(self, text: str) -> int:
         """Get width of the text in pixels for used font.
@@ -86,7 +184,7 @@ class OLEDdisplay(IDisplay):
         Returns:
             Width of the text in pixels.
         """
-        return self._buffer_draw.textsize(text, font=self.FONT)[0]
+        return self._get_text_size(text)[0]
 
     def _get_text_height(self, text: str) -> int:
         """Get height of the text in pixels for used font.
@@ -97,61 +195,206 @@ class OLEDdisplay(IDisplay):
         Returns:
             Height of the text in pixels.
         """
-        return self._buffer_draw.textsize(text, font=self.FONT)[1]
+        return self._get_text_size(text)[1]
 
-    def _show(self, msga: str, msgb: str) -> None:
-        """Display given two lines in scrolling mode (from right to left).
+    def _get_strip_size(self, strip: Any) -> int:
+        """Return number of pixels of the strip."""
+        if self._framebuffer is not None:
+            return strip.size * 8
+        return strip.width * strip.height
+
+    def _create_strip(self, msga: str, msgb: str) -> Any:
+        """Rasterize both lines with the repeated copy which scrolls in behind them.
 
         Args:
-            msga: Text which will be displayed at the first line.
-            msgb: Text which will be displayed at the second line.
+            msga: Text of the first line.
+            msgb: Text of the second line.
+
+        Returns:
+            Image (page bytes with the numpy backend) as high as the display and wide enough
+            for every scroll offset.
         """
-        # Calculate actual width of text
-        text_width: int = max(
-            self._get_text_width(msga),
-            self._get_text_width(msgb))
-        # Calculate actual height of text and offset for second line
-        text_height: int = self._get_text_height(msga)
-        snd_line_offset: int = 2 * text_height
+        if self._framebuffer is not None:
+            return self._framebuffer.create_strip(msga, msgb)
+        text_width: int = max(self._get_text_width(msga), self._get_text_width(msgb))
+        snd_line_offset: int = 2 * self._get_text_height(msga)
         second_offset: int = max(text_width, self._device.width) + 10
 
-        while True:
-            for offset in range(0, text_width, 10):
-                # Clear display
-                self.clear()
+        strip: Image.Image = Image.new(OLEDdisplay.MONOCHROMATIC,
+                                       (text_width + self._device.width, self._device.height))
+        draw: ImageDraw.ImageDraw = ImageDraw.Draw(strip)
+        for left in (0, second_offset):
+            draw.text((left, 0), msga, font=self.FONT, fill=OLEDdisplay.WHITE)
+            draw.text((left, snd_line_offset), msgb, font=self.FONT, fill=OLEDdisplay.WHITE)
+        return strip
+
+    def _render(self, msga: str, msgb: str, offset: int) -> None:
+        """Crop the frame of the scrolled lines from their strip and send it to the device.
+
+        Args:
+            msga: Text of the first line.
+            msgb: Text of the second line.
+            offset: Scroll offset in pixels.
+        """
+        strip: Any = self._strips.get((msga, msgb), lambda: self._create_strip(msga, msgb))
+        if self._framebuffer is not None:
+            self._display_pages(self._framebuffer.crop(strip, offset))
+            return
+        self._device.display(
+            strip.crop((offset, 0, offset + self._device.width, self._device.height)))
+
+    def _display_pages(self, pages: Any) -> None:
+        """Send frame in the page format to the device.
 
-                # Draw the text
-                self._draw_text_to_buffer(msga, -offset, 0)
-                self._draw_text_to_buffer(msgb, -offset, snd_line_offset)
+        Args:
+            pages: Array of page bytes indexed by page and column.
+        """
+        if hasattr(self._device, 'display_pages') and not self._device.rotate:
+            self._device.display_pages([page.tobytes() for page in pages])
+            return
+        # Imported here because NumPy is an optional dependency
+        from .framebuffer import pages_to_image
+        self._device.display(pages_to_image(pages))
+
+    def _is_done(self, passed: bool, shown_at: float) -> bool:
+        """Check if the current message was displayed as long as it requires.
+
+        Args:
+            passed: True if the current message was displayed whole.
+            shown_at: Monotonic time when the current message was displayed first.
+        """
+        current: Optional[DisplayMessage] = self._current
+        if current is None:
+            return True
+        if current.whole_pass and not passed:
+            return False
+        return monotonic() - shown_at >= current.min_duration
 
-                self._draw_text_to_buffer(msga, second_offset - offset, 0)
-                self._draw_text_to_buffer(
-                    msgb, second_offset - offset, snd_line_offset)
+    def _can_switch(self, passed: bool, shown_at: float) -> bool:
+        """Decide if the current message can be replaced by the best pending one.
 
-                # Display image
-                self._device.display(self._buffer)
+        Args:
+            passed: True if the current message was displayed whole.
+            shown_at: Monotonic time when the current message was displayed first.
 
-                sleep(0.05)
-            self._can_be_killed.value = True
+        Returns:
+            True if there is pending message which may replace the current one.
+        """
+        if not self._pending:
+            return False
+        current: Optional[DisplayMessage] = self._current
+        if current is None or self._pending[0].priority > current.priority:
+            return True
+        return self._is_done(passed, shown_at)
+
+    def _update_done(self, passed: bool, shown_at: float) -> None:
+        """Release callers waiting for the current message if it is done, the lock has to be held."""
+        if (self._current is not None and self._done is not self._current
+                and self._is_done(passed, shown_at)):
+            self._done = self._current
+            self._condition.notify_all()
+
+    def _get_frame_timeout(self, passed: bool, shown_at: float) -> float:
+        """Return time to wait for the next frame.
+
+        The wait is shortened to the end of the minimal duration of the current message,
+        so the message is replaced or released exactly in time.
+        """
+        current: Optional[DisplayMessage] = self._current
+        timeout: float = OLEDdisplay.FRAME_INTERVAL
+        if current is not None and (passed or not current.whole_pass):
+            remaining: float = shown_at + current.min_duration - monotonic()
+            if remaining > 0:
+                timeout = min(timeout, remaining)
+        return timeout
+
+    def _run(self) -> None:
+        """Render messages until the display is closed."""
+        offset: int = 0
+        text_width: int = 0
+        passed: bool = False
+        shown_at: float = 0.0
+        while True:
+            with self._condition:
+                while not self._closed and self._current is None and not self._pending:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                if self._can_switch(passed, shown_at):
+                    self._current = self._pending.pop(0)
+                    offset, passed, shown_at = 0, False, monotonic()
+                    text_width = max(self._get_text_width(self._current.msga),
+                                     self._get_text_width(self._current.msgb))
+                    self._condition.notify_all()
+                self._update_done(passed, shown_at)
+                message: DisplayMessage = self._current
+            self._render(message.msga, message.msgb, offset)
+            offset += OLEDdisplay.SCROLL_STEP
+            if offset >= text_width:
+                offset, passed = 0, True
+            with self._condition:
+                self._update_done(passed, shown_at)
+                self._condition.wait_for(
+                    lambda: self._closed or self._can_switch(passed, shown_at),
+                    self._get_frame_timeout(passed, shown_at))
+
+    def _is_settled(self, message: DisplayMessage) -> bool:
+        """Check if waiting for the message is over, the lock has to be held.
 
-    def show(self, msga: str, msgb: str = '', can_be_killed: bool = True) -> None:
+        Returns:
+            True if the message is done, was replaced before it was displayed or the display
+            was closed.
+        """
+        if self._closed or self._done is message:
+            return True
+        return message is not self._current and all(pending is not message
+                                                    for pending in self._pending)
+
+    def show(self, msga: str, msgb: str = '', can_be_killed: bool = True,
+             priority: Priority = Priority.NORMAL, min_duration: float = 0.0,
+             block: bool = False) -> None:
         """Display given two lines in scrolling mode (from right to left).
 
-        The process is run in parallel so is non blocking operation.
+        Message is passed to the render worker, so unless block is set this is non blocking
+        operation. Pending messages of the same or lower priority are replaced by the new
+        message, protected ones only by a protected message. Blocked caller is released by
+        the worker the instant the message is done, replaced or the display is closed.
 
         Args:
             msga: Text which will be displayed at the first line.
             msgb: Text which will be displayed at the second line.
+            can_be_killed: If false text is displayed whole at least once.
+            priority: Message of higher priority replaces the current one right away.
+            min_duration: Seconds the message is displayed at least, unless replaced
+                          by a message of higher priority.
+            block: If true wait until the message was displayed whole (if it cannot be killed)
+                   and for its minimal duration, otherwise return immediately.
         """
-        if self._previous_args is not None and self._previous_args == (msga, msgb):
-            return
-
-        if self._process is not None:
-            while not self._can_be_killed.value:
-                sleep(1)
-            self._process.terminate()
-
-        self._can_be_killed.value = can_be_killed
-        self._previous_args = (msga, msgb)
-        self._process = Process(target=self._show, args=(msga, msgb))
-        self._process.start()
+        message: DisplayMessage = DisplayMessage(msga, msgb, not can_be_killed,
+                                                 priority, min_duration)
+        with self._condition:
+            last: Optional[DisplayMessage] = self._pending[-1] if self._pending else self._current
+            if last is not None and (last.msga, last.msgb) == (msga, msgb):
+                message = last
+            else:
+                # Protected message waits for the current one only, pending messages
+                # it supersedes are dropped so the display does not fall behind
+                self._pending = [pending for pending in self._pending
+                                 if pending.priority > priority
+                                 or (pending.is_protected() and not message.is_protected())]
+                # Keep pending messages ordered by priority, FIFO within the same priority
+                index: int = len(self._pending)
+                while index > 0 and self._pending[index - 1].priority < priority:
+                    index -= 1
+                self._pending.insert(index, message)
+                self._condition.notify_all()
+            if block:
+                self._condition.wait_for(lambda: self._is_settled(message))
+
+    def close(self) -> None:
+        """Stop the render worker and clear the display."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join()
+        self.clear(buffer_only=False)
@@ -0,0 +1,193 @@
+from luma.oled.device import sh1106
+from PIL import Image
+from collections import deque
+from threading import Lock
+from time import monotonic
+from time import perf_counter
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+
+class DiffingSH1106(sh1106):
+    """SH1106 device which transmits only the changed part of the frame.
+
+    Display RAM is organized to pages of 8 pixel rows. The last transmitted frame is kept
+    and for every page only the range of columns which differs from it is sent, unchanged
+    pages are not sent at all. Transmitted bytes and frame times are counted.
+    """
+
+    COMMAND_BYTES: int = 3
+
+    def __init__(self, serial_interface: Any = None, **kwargs: Any):
+        """Init device, arguments are the same as for luma sh1106."""
+        # The parent constructor already displays the first (blank) frame
+        self._pages_sent: Optional[List[bytes]] = None
+        self._stats_lock: Lock = Lock()
+        self._frames: int = 0
+        self._bytes: int = 0
+        self._last_bytes: int = 0
+        self._frame_time: float = 0.0
+        self._max_frame_time: float = 0.0
+        super().__init__(serial_interface, **kwargs)
+
+    def _to_pages(self, image: Image.Image) -> List[bytes]:
+        """Convert image to the display RAM layout.
+
+        Args:
+            image: Preprocessed 1-bit image of the display size.
+
+        Returns:
+            Bytes of the columns of every page, lowest row of a page is the lowest bit.
+        """
+        # Columns become rows and the pixel order of every column is reversed,
+        # so packed bytes of a row are the page bytes of one column
+        columns: bytes = image.transpose(Image.TRANSPOSE).transpose(
+            Image.FLIP_LEFT_RIGHT).tobytes()
+        pages: int = self._pages
+        return [columns[pages - 1 - page::pages] for page in range(pages)]
+
+    def display(self, image: Image.Image) -> None:
+        """Send changed columns of the 1-bit image to the display.
+
+        Args:
+            image: Image to display.
+        """
+        assert image.mode == self.mode
+        assert image.size == self.size
+
+        self.display_pages(self._to_pages(self.preprocess(image)))
+
+    def display_pages(self, pages: List[bytes]) -> None:
+        """Send changed columns of the frame which is already in the display RAM layout.
+
+        Rotation of the device is not applied to the pages.
+
+        Args:
+            pages: Bytes of the columns of every page.
+        """
+        start: float = perf_counter()
+        sent: int = 0
+        for page, data in enumerate(pages):
+            first: int = 0
+            last: int = len(data)
+            if self._pages_sent is not None:
+                previous: bytes = self._pages_sent[page]
+                if previous == data:
+                    continue
+                while data[first] == previous[first]:
+                    first += 1
+                while data[last - 1] == previous[last - 1]:
+                    last -= 1
+            column: int = self._page_address_offset + first
+            self.command(0xB0 + page, column & 0x0F, 0x10 | (column >> 4))
+            self.data(list(data[first:last]))
+            sent += DiffingSH1106.COMMAND_BYTES + last - first
+        self._pages_sent = list(pages)
+        self._count_frame(sent, perf_counter() - start)
+
+    def _count_frame(self, sent: int, elapsed: float) -> None:
+        """Update statistics after a frame.
+
+        Args:
+            sent: Number of transmitted command and data bytes.
+            elapsed: Time spent by the frame in seconds.
+        """
+        with self._stats_lock:
+            self._frames += 1
+            self._bytes += sent
+            self._last_bytes = sent
+            self._frame_time += elapsed
+            self._max_frame_time = max(self._max_frame_time, elapsed)
+
+    def get_full_frame_bytes(self) -> int:
+        """Return number of bytes transmitted by a frame which is sent whole."""
+        return self._pages * (DiffingSH1106.COMMAND_BYTES + self._w)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return transmission statistics.
+
+        Returns:
+            Dictionary with number of frames, transmitted bytes in total, per frame on average
+            and in the last frame, bytes which a full frame would need, average and maximal
+            frame time in seconds.
+        """
+        with self._stats_lock:
+            frames: int = max(1, self._frames)
+            return {
+                'frames': self._frames,
+                'bytes': self._bytes,
+                'bytes_per_frame': self._bytes / frames,
+                'last_frame_bytes': self._last_bytes,
+                'full_frame_bytes': self.get_full_frame_bytes(),
+                'frame_time': self._frame_time / frames,
+                'max_frame_time': self._max_frame_time
+            }
+
+
+class Transfer(NamedTuple):
+    """Bus transfer recorded by the simulated serial interface.
+
+    Attributes:
+        time: Monotonic time of the transfer.
+        kind: 'command' or 'data'.
+        size: Number of transferred bytes.
+    """
+
+    time: float
+    kind: str
+    size: int
+
+
+class SimulatedSerialInterface:
+    """Serial interface of luma devices which emulates display RAM of the SH1106 controller.
+
+    Commands setting page and column address are interpreted and data are written to the RAM,
+    so the displayed content can be checked. Recent transfers are recorded with their time.
+    """
+
+    PAGES: int = 8
+    COLUMNS: int = 132
+    MAX_TRANSFERS: int = 100000
+
+    def __init__(self):
+        """Init interface with blank RAM."""
+        self.ram: List[bytearray] = [bytearray(SimulatedSerialInterface.COLUMNS)
+                                     for _ in range(SimulatedSerialInterface.PAGES)]
+        self.transfers: Deque[Transfer] = deque(maxlen=SimulatedSerialInterface.MAX_TRANSFERS)
+        self.bytes: int = 0
+        self._page: int = 0
+        self._column: int = 0
+        self._lock: Lock = Lock()
+
+    def command(self, *cmd: int) -> None:
+        """Interpret page and column address commands, other commands are only counted."""
+        with self._lock:
+            self._record('command', len(cmd))
+            for byte in cmd:
+                if 0xB0 <= byte <= 0xB7:
+                    self._page = byte - 0xB0
+                elif byte <= 0x0F:
+                    self._column = (self._column & 0xF0) | byte
+                elif 0x10 <= byte <= 0x1F:
+                    self._column = (self._column & 0x0F) | ((byte & 0x0F) << 4)
+
+    def data(self, data: List[int]) -> None:
+        """Write data to the RAM from the current column."""
+        with self._lock:
+            self._record('data', len(data))
+            for byte in data:
+                if self._column < SimulatedSerialInterface.COLUMNS:
+                    self.ram[self._page][self._column] = byte
+                self._column += 1
+
+    def _record(self, kind: str, size: int) -> None:
+        """Record transfer, the lock has to be held."""
+        self.bytes += size
+        self.transfers.append(Transfer(monotonic(), kind, size))
+
+    def cleanup(self) -> None:
+        """Nothing to release."""
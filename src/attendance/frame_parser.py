@@ -0,0 +1,75 @@
+"""Incremental parser of the card reader frames.
+
+Reader sends every card as a frame starting with STX byte followed by 10 ASCII hex digits
+of the card ID and a trailer (checksum, ETX) which is ignored. Data may arrive in chunks
+of any size, so frames are assembled across calls and any garbage between them is skipped.
+"""
+from .card_id import CARD_SIZE
+from .card_id import CardId
+from .card_id import parse_card
+
+from typing import Final
+from typing import List
+from typing import Optional
+
+STX: Final = 0x02
+
+
+class FrameParser:
+    """State machine assembling card frames from a byte stream.
+
+    The parser is either hunting for STX byte or collecting card digits of a frame.
+    Collected frame is returned as soon as its last digit arrives, so the trailer is
+    never waited for.
+    """
+
+    def __init__(self):
+        """Init parser hunting for a frame."""
+        self._frame: bytearray = bytearray()
+        self._in_frame: bool = False
+
+    @property
+    def in_frame(self) -> bool:
+        """Return true if part of a frame was received and the rest is expected."""
+        return self._in_frame
+
+    def reset(self) -> None:
+        """Drop partially received frame."""
+        self._frame.clear()
+        self._in_frame = False
+
+    def feed(self, data: bytes) -> List[Optional[CardId]]:
+        """Process next chunk of the stream.
+
+        Args:
+            data: Received bytes.
+
+        Returns:
+            Cards of the frames completed by the chunk in order they were received,
+            None stands for a corrupted frame.
+        """
+        cards: List[Optional[CardId]] = []
+        position: int = 0
+        size: int = len(data)
+        while position < size:
+            if not self._in_frame:
+                start: int = data.find(STX, position)
+                if start == -1:
+                    break
+                self._in_frame = True
+                position = start + 1
+                continue
+            end: int = min(size, position + CARD_SIZE - len(self._frame))
+            restart: int = data.find(STX, position, end)
+            if restart != -1:
+                # Frame was interrupted by the next one
+                cards.append(None)
+                self._frame.clear()
+                position = restart + 1
+                continue
+            self._frame += data[position:end]
+            position = end
+            if len(self._frame) == CARD_SIZE:
+                cards.append(parse_card(bytes(self._frame)))
+                self.reset()
+        return cards
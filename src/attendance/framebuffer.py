@@ -0,0 +1,162 @@
+"""NumPy framebuffer of the OLED display.
+
+Text is composed from a glyph atlas of the monospaced font instead of being drawn by PIL,
+and frames are kept in the page format of the display controller: every byte is a column
+of 8 pixel rows, the top row of the page being the lowest bit. Scroll strips are packed
+once, so every frame is just a slice of page bytes.
+
+NumPy is an optional dependency, the module is imported only by the numpy display backend.
+"""
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+from typing import Dict
+from typing import Final
+from typing import Iterable
+from typing import Tuple
+
+import numpy
+
+PAGE_HEIGHT: Final = 8
+
+
+def pack_pages(frame: numpy.ndarray) -> numpy.ndarray:
+    """Pack boolean frame to the page format.
+
+    Args:
+        frame: Array of pixels indexed by row and column, height is a multiple of 8.
+
+    Returns:
+        Array of page bytes indexed by page and column.
+    """
+    height, width = frame.shape
+    return numpy.packbits(frame.reshape(height // PAGE_HEIGHT, PAGE_HEIGHT, width),
+                          axis=1, bitorder='little')[:, 0, :]
+
+
+def unpack_pages(pages: numpy.ndarray) -> numpy.ndarray:
+    """Unpack page bytes to boolean frame, reverse of pack_pages."""
+    return numpy.unpackbits(pages, axis=0, bitorder='little').astype(bool)
+
+
+def pages_to_image(pages: numpy.ndarray) -> Image.Image:
+    """Convert page bytes to a 1-bit image."""
+    return Image.fromarray(unpack_pages(pages))
+
+
+class GlyphAtlas:
+    """Pre-rendered glyphs of a monospaced font placed side by side in one array.
+
+    Every glyph occupies a cell of the same width, so a line of text is rendered by
+    gathering the cell columns of its characters. Characters missing in the atlas
+    are rendered when they are used first.
+    """
+
+    CHARACTERS: Final = ''.join(chr(code) for code in range(32, 127))
+
+    def __init__(self, font: ImageFont.FreeTypeFont, characters: str = CHARACTERS):
+        """Render the glyphs of the characters.
+
+        Args:
+            font: Monospaced font.
+            characters: Characters rendered in advance.
+        """
+        self._font: Final = font
+        ascent, descent = font.getmetrics()
+        self.height: Final = ascent + descent
+        self.advance: Final = max(1, round(font.getlength('0')))
+        self._cells: numpy.ndarray = numpy.arange(self.advance)
+        self._indexes: Dict[str, int] = {}
+        self._atlas: numpy.ndarray = numpy.zeros((self.height, 0), dtype=bool)
+        self._add(characters)
+
+    def __len__(self) -> int:
+        """Return number of rendered glyphs."""
+        return len(self._indexes)
+
+    def _add(self, characters: Iterable[str]) -> None:
+        """Render glyphs of the characters and append them to the atlas."""
+        new: str = ''.join(dict.fromkeys(char for char in characters if char not in self._indexes))
+        if not new:
+            return
+        image: Image.Image = Image.new('1', (len(new) * self.advance, self.height))
+        for position, char in enumerate(new):
+            # Glyph is drawn alone, so it never overlaps the neighbouring cells
+            cell: Image.Image = Image.new('1', (self.advance, self.height))
+            ImageDraw.Draw(cell).text((0, 0), char, font=self._font, fill=255)
+            image.paste(cell, (position * self.advance, 0))
+            self._indexes[char] = len(self._indexes)
+        self._atlas = numpy.hstack((self._atlas, numpy.array(image, dtype=bool)))
+
+    def measure(self, text: str) -> Tuple[int, int]:
+        """Return width and height of the rendered text in pixels."""
+        return len(text) * self.advance, self.height
+
+    def render(self, text: str) -> numpy.ndarray:
+        """Render line of text.
+
+        Args:
+            text: Text to render.
+
+        Returns:
+            Boolean array of the text pixels indexed by row and column.
+        """
+        self._add(text)
+        indexes: numpy.ndarray = numpy.array([self._indexes[char] for char in text], dtype=int)
+        columns: numpy.ndarray = (indexes[:, None] * self.advance + self._cells).ravel()
+        return self._atlas[:, columns]
+
+
+class NumpyFramebuffer:
+    """Composes scroll strips of two lines of text in the page format."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont, width: int, height: int):
+        """Init framebuffer of the display.
+
+        Args:
+            font: Monospaced font of the text.
+            width: Width of the display in pixels.
+            height: Height of the display in pixels, a multiple of 8.
+        """
+        self.atlas: Final = GlyphAtlas(font)
+        self._width: Final = width
+        self._height: Final = height
+
+    def measure_text(self, text: str) -> Tuple[int, int]:
+        """Return width and height of the text in pixels."""
+        return self.atlas.measure(text)
+
+    def _paste(self, frame: numpy.ndarray, line: numpy.ndarray, left: int, top: int) -> None:
+        """Copy the line to the frame, parts outside of the frame are cut off."""
+        height: int = min(line.shape[0], frame.shape[0] - top)
+        width: int = min(line.shape[1], frame.shape[1] - left)
+        if height > 0 and width > 0:
+            frame[top:top + height, left:left + width] = line[:height, :width]
+
+    def create_strip(self, msga: str, msgb: str) -> numpy.ndarray:
+        """Compose both lines with the repeated copy which scrolls in behind them.
+
+        Layout is the same as of the strips drawn by PIL.
+
+        Args:
+            msga: Text of the first line.
+            msgb: Text of the second line.
+
+        Returns:
+            Page bytes of the strip as high as the display and wide enough for every scroll offset.
+        """
+        linea: numpy.ndarray = self.atlas.render(msga)
+        lineb: numpy.ndarray = self.atlas.render(msgb)
+        text_width: int = max(linea.shape[1], lineb.shape[1])
+        snd_line_offset: int = 2 * self.atlas.height
+        second_offset: int = max(text_width, self._width) + 10
+
+        strip: numpy.ndarray = numpy.zeros((self._height, text_width + self._width), dtype=bool)
+        for left in (0, second_offset):
+            self._paste(strip, linea, left, 0)
+            self._paste(strip, lineb, left, snd_line_offset)
+        return pack_pages(strip)
+
+    def crop(self, strip: numpy.ndarray, offset: int) -> numpy.ndarray:
+        """Return page bytes of the frame scrolled by the offset, the strip is not copied."""
+        return strip[:, offset:offset + self._width]
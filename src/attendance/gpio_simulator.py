@@ -0,0 +1,199 @@
+"""Stand-in of the RPi.GPIO module for machines without GPIO pins.
+
+It implements the part of the RPi.GPIO interface used by the recorder and records every
+change of the pins with its monotonic time, so timing of the peripherals can be tested
+on a normal Linux machine. Levels of the inputs are driven by set_input, which also calls
+the edge detection callbacks (in the calling thread, unlike RPi.GPIO).
+"""
+from threading import Lock
+from time import monotonic
+from typing import Callable
+from typing import Dict
+from typing import Final
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+
+class PinEvent(NamedTuple):
+    """Change of an output recorded by the simulator.
+
+    Attributes:
+        time: Monotonic time of the change.
+        pin: Number of the pin.
+        kind: 'output' or 'input' for level change, 'pwm_start', 'pwm_frequency', 'pwm_duty'
+              or 'pwm_stop' for software PWM.
+        value: Level, frequency or duty cycle.
+    """
+
+    time: float
+    pin: int
+    kind: str
+    value: float
+
+
+class SimulatedPWM:
+    """Software PWM channel of the simulated GPIO, mirrors RPi.GPIO.PWM."""
+
+    def __init__(self, gpio: 'SimulatedGPIO', pin: int, frequency: float):
+        """Init stopped channel.
+
+        Args:
+            gpio: Simulator which records the changes.
+            pin: Number of the output pin.
+            frequency: Frequency in Hz.
+        """
+        self._gpio: Final = gpio
+        self._pin: Final = pin
+        self.frequency: float = frequency
+        self.duty_cycle: float = 0.0
+        self.running: bool = False
+
+    def start(self, duty_cycle: float) -> None:
+        """Start generating the signal."""
+        self.duty_cycle = duty_cycle
+        self.running = True
+        self._gpio.record(self._pin, 'pwm_start', self.frequency)
+
+    def ChangeFrequency(self, frequency: float) -> None:
+        """Change frequency of the signal."""
+        self.frequency = frequency
+        self._gpio.record(self._pin, 'pwm_frequency', frequency)
+
+    def ChangeDutyCycle(self, duty_cycle: float) -> None:
+        """Change duty cycle of the signal."""
+        self.duty_cycle = duty_cycle
+        self._gpio.record(self._pin, 'pwm_duty', duty_cycle)
+
+    def stop(self) -> None:
+        """Stop generating the signal."""
+        self.running = False
+        self._gpio.record(self._pin, 'pwm_stop', 0)
+
+
+class SimulatedGPIO:
+    """Simulated GPIO with the interface of the RPi.GPIO module."""
+
+    BOARD: Final = 10
+    BCM: Final = 11
+    OUT: Final = 0
+    IN: Final = 1
+    LOW: Final = 0
+    HIGH: Final = 1
+    PUD_OFF: Final = 20
+    PUD_DOWN: Final = 21
+    PUD_UP: Final = 22
+    RISING: Final = 31
+    FALLING: Final = 32
+    BOTH: Final = 33
+
+    def __init__(self):
+        """Init simulator without configured pins."""
+        self._lock: Lock = Lock()
+        self.mode: Optional[int] = None
+        self.directions: Dict[int, int] = {}
+        self.levels: Dict[int, int] = {}
+        self.events: List[PinEvent] = []
+        self._detections: Dict[int, int] = {}
+        self._callbacks: Dict[int, List[Callable[[int], None]]] = {}
+
+    def record(self, pin: int, kind: str, value: float) -> None:
+        """Record change of the pin."""
+        with self._lock:
+            self.events.append(PinEvent(monotonic(), pin, kind, value))
+
+    def get_events(self, pin: Optional[int] = None) -> List[PinEvent]:
+        """Return recorded changes of the pin or of all pins."""
+        with self._lock:
+            return [event for event in self.events if pin is None or event.pin == pin]
+
+    def setmode(self, mode: int) -> None:
+        """Set numbering of the pins."""
+        self.mode = mode
+
+    def setwarnings(self, enabled: bool) -> None:
+        """Ignore, warnings are never issued."""
+
+    def setup(self, pin: int, direction: int, pull_up_down: int = PUD_OFF,
+              initial: Optional[int] = None) -> None:
+        """Set pin as an input or an output."""
+        if self.mode is None:
+            raise RuntimeError('Please set pin numbering mode using setmode.')
+        self.directions[pin] = direction
+        if direction == SimulatedGPIO.IN:
+            pulled_up: bool = pull_up_down == SimulatedGPIO.PUD_UP
+            self.levels[pin] = SimulatedGPIO.HIGH if pulled_up else SimulatedGPIO.LOW
+        elif initial is not None:
+            self.output(pin, initial)
+
+    def output(self, pin: int, value: int) -> None:
+        """Set level of the output pin."""
+        if self.directions.get(pin) != SimulatedGPIO.OUT:
+            raise RuntimeError('The GPIO channel has not been set up as an OUTPUT')
+        self.levels[pin] = value
+        self.record(pin, 'output', value)
+
+    def input(self, pin: int) -> int:
+        """Return level of the pin."""
+        if pin not in self.directions:
+            raise RuntimeError('You must setup() the GPIO channel first')
+        return self.levels.get(pin, SimulatedGPIO.LOW)
+
+    def set_input(self, pin: int, value: int) -> None:
+        """Drive level of the input pin and call callbacks of the detected edge.
+
+        Args:
+            pin: Number of the input pin.
+            value: New level.
+        """
+        if self.directions.get(pin) != SimulatedGPIO.IN:
+            raise RuntimeError('The GPIO channel has not been set up as an INPUT')
+        old_value: int = self.levels.get(pin, SimulatedGPIO.LOW)
+        self.levels[pin] = value
+        if old_value == value:
+            return
+        self.record(pin, 'input', value)
+        edge: int = SimulatedGPIO.RISING if value == SimulatedGPIO.HIGH else SimulatedGPIO.FALLING
+        if self._detections.get(pin) in (edge, SimulatedGPIO.BOTH):
+            for callback in list(self._callbacks.get(pin, [])):
+                callback(pin)
+
+    def add_event_detect(self, pin: int, edge: int,
+                         callback: Optional[Callable[[int], None]] = None,
+                         bouncetime: Optional[int] = None) -> None:
+        """Enable detection of the edges of the input pin."""
+        if self.directions.get(pin) != SimulatedGPIO.IN:
+            raise RuntimeError('You must setup() the GPIO channel as an input first')
+        if pin in self._detections:
+            raise RuntimeError('Conflicting edge detection already enabled for this GPIO channel')
+        self._detections[pin] = edge
+        self._callbacks[pin] = []
+        if callback is not None:
+            self.add_event_callback(pin, callback)
+
+    def add_event_callback(self, pin: int, callback: Callable[[int], None]) -> None:
+        """Add function called with the pin number on the detected edge."""
+        if pin not in self._detections:
+            raise RuntimeError('Add event detection using add_event_detect first before adding a callback')
+        self._callbacks[pin].append(callback)
+
+    def remove_event_detect(self, pin: int) -> None:
+        """Disable detection of the edges of the pin."""
+        self._detections.pop(pin, None)
+        self._callbacks.pop(pin, None)
+
+    def PWM(self, pin: int, frequency: float) -> SimulatedPWM:
+        """Create software PWM channel of the output pin."""
+        if self.directions.get(pin) != SimulatedGPIO.OUT:
+            raise RuntimeError('You must setup() the GPIO channel as an output first')
+        return SimulatedPWM(self, pin, frequency)
+
+    def cleanup(self, pin: Optional[int] = None) -> None:
+        """Release the pin or all pins."""
+        if pin is None:
+            self.directions.clear()
+            self._detections.clear()
+            self._callbacks.clear()
+        else:
+            self.directions.pop(pin, None)
+            self.remove_event_detect(pin)
@@ -0,0 +1,159 @@
+"""Hardware layer of the recorder.
+
+Peripherals are created by one of the backends:
+    real: OLED display on I2C bus, card readers on serial ports, buzzer and button on GPIO
+          pins of Raspberry Pi.
+    sim: the same drivers on simulated GPIO and I2C bus, card reader reads a pseudo-terminal
+         where taps are sent by Hardware.tap.
+    replay: like sim, but the pseudo-terminal replays a capture of a real reader.
+
+Simulated peripherals record timing of everything they do (GPIO changes, bus transfers),
+so the whole recorder can be driven and measured on an ordinary Linux machine.
+"""
+from .button_controller import ButtonController
+from .button_controller import IButtonController
+from .buzzer import Buzzer
+from .buzzer import IBuzzer
+from .card_reader import CardReader
+from .card_reader import ICardReader
+from .card_reader import MultiCardReader
+from .display import IDisplay
+from .display import OLEDdisplay
+from .display_device import DiffingSH1106
+from .display_device import SimulatedSerialInterface
+from .gpio_simulator import SimulatedGPIO
+from .resources.config import config
+from .serial_replay import create_frame
+from .serial_replay import load_capture
+from .serial_replay import PtyReplay
+from .utils import reverse_endianness
+
+from enum import Enum
+from pathlib import Path
+from time import sleep
+from typing import List
+from typing import Optional
+
+
+class Backend(Enum):
+    """Enumeration of hardware backends."""
+
+    REAL = 'real'
+    SIM = 'sim'
+    REPLAY = 'replay'
+
+
+class Hardware:
+    """Peripherals of the recorder together with the simulators which drive them.
+
+    Attributes:
+        display: Display of the messages.
+        reader: Card reader.
+        buzzer: Buzzer.
+        button: Button controller.
+        gpio: Simulated GPIO of the buzzer and the button, None for real hardware.
+        display_serial: Simulated I2C interface of the display, None for real hardware.
+        replay: Pseudo-terminal read by the card reader, None for real hardware.
+    """
+
+    def __init__(self,
+                 display: IDisplay,
+                 reader: ICardReader,
+                 buzzer: IBuzzer,
+                 button: IButtonController,
+                 gpio: Optional[SimulatedGPIO] = None,
+                 display_serial: Optional[SimulatedSerialInterface] = None,
+                 replay: Optional[PtyReplay] = None):
+        """Init hardware from created peripherals."""
+        self.display: IDisplay = display
+        self.reader: ICardReader = reader
+        self.buzzer: IBuzzer = buzzer
+        self.button: IButtonController = button
+        self.gpio: Optional[SimulatedGPIO] = gpio
+        self.display_serial: Optional[SimulatedSerialInterface] = display_serial
+        self.replay: Optional[PtyReplay] = replay
+
+    def tap(self, card: str) -> None:
+        """Send frame of the card to the simulated reader.
+
+        Args:
+            card: Hex string of the card as the reader reports it to the recorder.
+        """
+        if self.replay is None:
+            raise RuntimeError('Cards can be tapped only on simulated hardware.')
+        # Reader sends the digits with reversed bit order of every nibble
+        self.replay.send(create_frame(reverse_endianness(card)))
+
+    def push_button(self, hold: float = 0.1) -> None:
+        """Push and release the simulated button.
+
+        Args:
+            hold: Seconds the button is held.
+        """
+        if self.gpio is None:
+            raise RuntimeError('Button can be pushed only on simulated hardware.')
+        pin: int = int(config['Button']['in_pin'])
+        self.gpio.set_input(pin, SimulatedGPIO.HIGH)
+        sleep(hold)
+        self.gpio.set_input(pin, SimulatedGPIO.LOW)
+
+    def close(self) -> None:
+        """Stop the peripherals and the simulators."""
+        self.display.close()
+        self.buzzer.close()
+        self.button.close()
+        self.reader.close()
+        if self.replay is not None:
+            self.replay.stop()
+
+
+def create_real_hardware() -> Hardware:
+    """Create peripherals connected to Raspberry Pi as configured."""
+    # Imported here so the module can be imported on machines without I2C bus
+    from luma.core.interface.serial import i2c
+
+    # Several readers (e.g. one per door) are separated by comma
+    paths: List[str] = [path.strip() for path in config['CardReader']['devPath'].split(',')]
+    reader: ICardReader = CardReader() if len(paths) == 1 else MultiCardReader.from_paths(paths)
+    return Hardware(OLEDdisplay(DiffingSH1106(i2c())), reader, Buzzer(), ButtonController())
+
+
+def create_simulated_hardware(replay_file: Optional[Path] = None, speed: float = 1.0) -> Hardware:
+    """Create peripherals on simulated GPIO, I2C bus and serial port.
+
+    Args:
+        replay_file: Capture which is replayed to the card reader, taps are sent by
+                     Hardware.tap if None.
+        speed: Speed multiplier of the capture timing.
+
+    Returns:
+        Simulated hardware.
+    """
+    gpio: SimulatedGPIO = SimulatedGPIO()
+    display_serial: SimulatedSerialInterface = SimulatedSerialInterface()
+    replay: PtyReplay = PtyReplay(load_capture(replay_file) if replay_file else [], speed)
+    reader: CardReader = CardReader(CardReader.open_port(replay.port_name), 'simulated')
+    replay.start()
+    return Hardware(OLEDdisplay(DiffingSH1106(display_serial)), reader, Buzzer(gpio),
+                    ButtonController(gpio), gpio, display_serial, replay)
+
+
+def create_hardware(backend: Backend, replay_file: Optional[Path] = None,
+                    speed: float = 1.0) -> Hardware:
+    """Create peripherals of the backend.
+
+    Args:
+        backend: Hardware backend.
+        replay_file: Capture replayed by the replay backend.
+        speed: Speed multiplier of the capture timing.
+
+    Returns:
+        Created hardware.
+    """
+    if backend == Backend.REAL:
+        return create_real_hardware()
+    if backend == Backend.REPLAY:
+        if replay_file is None:
+            raise ValueError('Replay backend needs a capture file.')
+        return create_simulated_hardware(replay_file, speed)
+    return create_simulated_hardware()
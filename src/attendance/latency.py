@@ -0,0 +1,235 @@
+from collections import deque
+from random import uniform
+from threading import Lock
+from typing import Deque
+from typing import Dict
+from typing import Final
+from typing import Optional
+from typing import Tuple
+
+
+class LatencyEstimate:
+    """Rolling estimate of a single latency.
+
+    Keeps exponentially weighted moving average with mean deviation (like TCP round trip
+    estimation) and a window of the latest samples for percentiles.
+    """
+
+    ALPHA: Final = 0.125
+    BETA: Final = 0.25
+
+    def __init__(self, window: int = 50):
+        """Init empty estimate.
+
+        Args:
+            window: Number of latest samples used for percentiles.
+        """
+        self.average: Optional[float] = None
+        self.deviation: float = 0.0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def update(self, sample: float) -> None:
+        """Add measured latency.
+
+        Args:
+            sample: Latency in seconds.
+        """
+        if self.average is None:
+            self.average = sample
+            self.deviation = sample / 2
+        else:
+            self.deviation += LatencyEstimate.BETA * (abs(sample - self.average) - self.deviation)
+            self.average += LatencyEstimate.ALPHA * (sample - self.average)
+        self._samples.append(sample)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return percentile of the samples in the window.
+
+        Args:
+            percent: Percentile to return, from 0 to 100.
+
+        Returns:
+            Latency in seconds or None if there are no samples.
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index: int = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def upper_bound(self, percent: float) -> Optional[float]:
+        """Return latency which is rarely exceeded.
+
+        Args:
+            percent: Percentile which has to be covered.
+
+        Returns:
+            Greater of average with four deviations and the percentile, None if there are no samples.
+        """
+        if self.average is None:
+            return None
+        return max(self.average + 4 * self.deviation, self.percentile(percent))
+
+    def __len__(self) -> int:
+        """Return number of samples in the window."""
+        return len(self._samples)
+
+
+class LatencyTracker:
+    """Derives request timeouts from measured latency of the API.
+
+    Response latency grows with the number of sent cards, so the cost of a single card
+    is estimated separately and added to the timeout according to the payload size.
+    Until enough requests are measured the default timeouts are used.
+    """
+
+    PERCENTILE: Final = 95
+    MIN_SAMPLES: Final = 5
+    SMALL_PAYLOAD: Final = 5
+    DEFAULT_CARD_COST: Final = 0.05
+
+    def __init__(self,
+                 connect_timeout: float = 3.0,
+                 read_timeout: float = 10.0,
+                 min_timeout: float = 1.0,
+                 max_timeout: float = 30.0,
+                 margin: float = 2.0):
+        """Init tracker.
+
+        Args:
+            connect_timeout: Connect timeout used until enough samples are measured.
+            read_timeout: Response timeout of a small request used until enough samples are measured.
+            min_timeout: Lower limit of the derived timeouts.
+            max_timeout: Upper limit of the derived timeouts.
+            margin: Multiplier of the estimated latency.
+        """
+        self._default_connect: Final = connect_timeout
+        self._default_read: Final = read_timeout
+        self._min_timeout: Final = min_timeout
+        self._max_timeout: Final = max_timeout
+        self._margin: Final = margin
+        self._lock: Lock = Lock()
+        self._connect: LatencyEstimate = LatencyEstimate()
+        self._response: LatencyEstimate = LatencyEstimate()
+        self._card_cost: float = LatencyTracker.DEFAULT_CARD_COST
+        self._requests: int = 0
+        self._timeouts: int = 0
+
+    def record_connect(self, latency: float) -> None:
+        """Add time spent by establishing new connection.
+
+        Args:
+            latency: Connect latency in seconds.
+        """
+        with self._lock:
+            self._connect.update(latency)
+
+    def record_response(self, latency: float, cards: int) -> None:
+        """Add time spent by waiting for the response.
+
+        Small requests update the base latency, large ones the cost of a single card.
+
+        Args:
+            latency: Response latency in seconds.
+            cards: Number of cards sent in the request.
+        """
+        with self._lock:
+            self._requests += 1
+            if cards <= LatencyTracker.SMALL_PAYLOAD or self._response.average is None:
+                self._response.update(latency)
+            else:
+                cost: float = max(0.0, latency - self._response.average) / cards
+                self._card_cost += LatencyEstimate.ALPHA * (cost - self._card_cost)
+
+    def record_timeout(self, timeout: Tuple[float, float], cards: int) -> None:
+        """Count timed out request, its timeout is taken as the lower bound of the latency.
+
+        Args:
+            timeout: Connect and response timeout of the request.
+            cards: Number of cards sent in the request.
+        """
+        with self._lock:
+            self._timeouts += 1
+        self.record_response(timeout[1], cards)
+
+    def _clamp(self, timeout: float) -> float:
+        """Limit timeout to the configured range."""
+        return min(self._max_timeout, max(self._min_timeout, timeout))
+
+    def get_timeout(self, cards: int = 1) -> Tuple[float, float]:
+        """Return timeouts for a request.
+
+        Args:
+            cards: Number of cards sent in the request.
+
+        Returns:
+            Connect and response timeout in seconds.
+        """
+        with self._lock:
+            connect: float = self._default_connect
+            if len(self._connect) >= LatencyTracker.MIN_SAMPLES:
+                connect = self._clamp(
+                    self._margin * self._connect.upper_bound(LatencyTracker.PERCENTILE))
+            read: float = self._default_read
+            if len(self._response) >= LatencyTracker.MIN_SAMPLES:
+                read = self._margin * self._response.upper_bound(LatencyTracker.PERCENTILE)
+            read = self._clamp(read + self._margin * self._card_cost * cards)
+            return connect, read
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        """Return current estimates.
+
+        Returns:
+            Dictionary with averages and percentiles of connect and response latency
+            in seconds, estimated cost of a card, timeouts of a single card request
+            and numbers of measured and timed out requests.
+        """
+        connect, read = self.get_timeout()
+        with self._lock:
+            return {
+                'connect_average': self._connect.average,
+                'connect_percentile': self._connect.percentile(LatencyTracker.PERCENTILE),
+                'response_average': self._response.average,
+                'response_percentile': self._response.percentile(LatencyTracker.PERCENTILE),
+                'card_cost': self._card_cost,
+                'connect_timeout': connect,
+                'read_timeout': read,
+                'requests': self._requests,
+                'timeouts': self._timeouts
+            }
+
+
+class Backoff:
+    """Jittered exponential delays between retries with a limited number of retries."""
+
+    def __init__(self, delay: float = 1.0, max_delay: float = 60.0, max_retries: int = 10):
+        """Init backoff.
+
+        Args:
+            delay: Delay before the first retry in seconds.
+            max_delay: Upper limit of a delay in seconds.
+            max_retries: Number of retries after which no more delays are given.
+        """
+        self._delay: Final = delay
+        self._max_delay: Final = max_delay
+        self._max_retries: Final = max_retries
+        self.attempt: int = 0
+
+    def next_delay(self) -> Optional[float]:
+        """Return delay before the next retry.
+
+        Half of the exponentially growing delay is randomized, so devices which
+        lost the connection at the same time don't retry at the same time.
+
+        Returns:
+            Delay in seconds or None if there should be no more retries.
+        """
+        if self.attempt >= self._max_retries:
+            return None
+        delay: float = min(self._max_delay, self._delay * 2 ** self.attempt)
+        self.attempt += 1
+        return delay / 2 + uniform(0, delay / 2)
+
+    def reset(self) -> None:
+        """Start counting retries from the beginning."""
+        self.attempt = 0
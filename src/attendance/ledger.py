@@ -0,0 +1,193 @@
+from .card_id import CardId
+from .card_id import CardSet
+from .card_store import ICardStore
+
+from logging import getLogger
+from logging import Logger
+from pathlib import Path
+from threading import RLock
+from time import monotonic
+from time import time
+from typing import Final
+from typing import Iterable
+from typing import Optional
+
+import sqlite3
+
+
+class SQLiteCardStore(ICardStore):
+    """Attendance ledger stored in SQLite database.
+
+    Every tap is stored with the session it belongs to, wall clock and monotonic time
+    and the upload state. Cards are deduplicated per session by unique index so they
+    don't have to be kept in the memory.
+    """
+
+    SCHEMA: Final = """
+        CREATE TABLE IF NOT EXISTS taps (
+            id INTEGER PRIMARY KEY,
+            session TEXT NOT NULL,
+            card INTEGER NOT NULL,
+            wall_time REAL NOT NULL,
+            monotonic_time REAL NOT NULL,
+            uploaded INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS taps_session_card ON taps (session, card);
+        CREATE INDEX IF NOT EXISTS taps_session_uploaded ON taps (session, uploaded);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    NO_SESSION: Final = ''
+
+    def __init__(self, path: Path):
+        """Init store.
+
+        Args:
+            path: Path to the database file.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._path: Final = path
+        self._lock: RLock = RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._session: str = SQLiteCardStore.NO_SESSION
+        self._token: Optional[str] = None
+
+    def load(self) -> None:
+        """Open the database in WAL mode and load current session and token."""
+        with self._lock:
+            self._db = sqlite3.connect(str(self._path), check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SQLiteCardStore.SCHEMA)
+            self._session = self._get_meta('session') or SQLiteCardStore.NO_SESSION
+            self._token = self._get_meta('token')
+            self.logger.debug('Ledger loaded - session {0}, {1} pending cards.'.format(
+                self._session, self.count_pending()))
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        """Read value from the meta table.
+
+        Args:
+            key: Key of the value.
+
+        Returns:
+            Stored value or None if there is no such key.
+        """
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value: str) -> None:
+        """Write value to the meta table.
+
+        Args:
+            key: Key of the value.
+            value: Value to store.
+        """
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def get_token(self) -> Optional[str]:
+        """Return stored token if there is any."""
+        return self._token
+
+    def set_token(self, token: str) -> None:
+        """Store token if it changed.
+
+        Args:
+            token: Connection token to store.
+        """
+        with self._lock:
+            if token == self._token:
+                return
+            self._token = token
+            self._set_meta('token', token)
+
+    def get_session(self) -> str:
+        """Return current session."""
+        return self._session
+
+    def start_session(self, session: str) -> None:
+        """Make given session current, following taps are stored to it.
+
+        Args:
+            session: Token received for the organizator card.
+        """
+        with self._lock:
+            self._session = session
+            self._set_meta('session', session)
+            self.logger.debug('Session {0} started.'.format(session))
+
+    def add_card(self, card: CardId) -> bool:
+        """Store tap of the card to the current session.
+
+        Args:
+            card: Card to store.
+
+        Returns:
+            True if the card was added, false if it was already stored in the current session.
+        """
+        with self._lock, self._db:
+            cursor: sqlite3.Cursor = self._db.execute(
+                'INSERT OR IGNORE INTO taps (session, card, wall_time, monotonic_time) '
+                'VALUES (?, ?, ?, ?)', (self._session, card, time(), monotonic()))
+            return cursor.rowcount == 1
+
+    def get_pending(self, session: str) -> CardSet:
+        """Return cards of the session which were not uploaded yet.
+
+        Args:
+            session: Session to look up.
+
+        Returns:
+            Pending cards.
+        """
+        with self._lock:
+            return CardSet(row[0] for row in self._db.execute(
+                'SELECT card FROM taps WHERE session = ? AND uploaded = 0', (session,)))
+
+    def count_pending(self) -> int:
+        """Return number of pending cards across all sessions."""
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM taps WHERE uploaded = 0').fetchone()[0]
+
+    def get_cards(self) -> CardSet:
+        """Return pending cards of the current session."""
+        return self.get_pending(self._session)
+
+    def acknowledge(self, cards: Iterable[CardId]) -> None:
+        """Mark cards of the current session as uploaded.
+
+        Cards which were sent directly without being cached are stored as uploaded taps.
+
+        Args:
+            cards: Cards accepted by the API.
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT INTO taps (session, card, wall_time, monotonic_time, uploaded) '
+                'VALUES (?, ?, ?, ?, 1) '
+                'ON CONFLICT (session, card) DO UPDATE SET uploaded = 1',
+                ((self._session, card, time(), monotonic()) for card in cards))
+
+    def count_acknowledged(self) -> int:
+        """Return number of cards uploaded in the current session."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM taps WHERE session = ? AND uploaded = 1',
+                (self._session,)).fetchone()[0]
+
+    def clear(self) -> None:
+        """Mark pending cards of the current session as uploaded."""
+        with self._lock, self._db:
+            self._db.execute('UPDATE taps SET uploaded = 1 WHERE session = ? AND uploaded = 0',
+                             (self._session,))
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
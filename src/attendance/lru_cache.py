@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable
+from typing import Dict
+from typing import Generic
+from typing import Hashable
+from typing import Optional
+from typing import TypeVar
+
+V = TypeVar('V')
+
+
+class LRUCache(Generic[V]):
+    """Cache which drops the least recently used values when it exceeds its size.
+
+    Size of every value is measured by the given function, by default every value counts as 1.
+    """
+
+    def __init__(self, max_size: int, size_of: Optional[Callable[[V], int]] = None):
+        """Init empty cache.
+
+        Args:
+            max_size: Maximal total size of the cached values.
+            size_of: Function returning size of a value.
+        """
+        self._max_size: int = max_size
+        self._size_of: Callable[[V], int] = size_of or (lambda value: 1)
+        self._values: 'OrderedDict[Hashable, V]' = OrderedDict()
+        self._size: int = 0
+        self._lock: Lock = Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Hashable, create: Callable[[], V]) -> V:
+        """Return cached value or create and cache it.
+
+        Args:
+            key: Key of the value.
+            create: Function creating the value if it is not cached.
+
+        Returns:
+            Cached or created value.
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            self.misses += 1
+        value: V = create()
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = value
+                self._size += self._size_of(value)
+                # Keep at least the new value even if it exceeds the size alone
+                while self._size > self._max_size and len(self._values) > 1:
+                    _, dropped = self._values.popitem(last=False)
+                    self._size -= self._size_of(dropped)
+        return value
+
+    def __len__(self) -> int:
+        """Return number of cached values."""
+        return len(self._values)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return number of values, their total size, hits and misses."""
+        with self._lock:
+            return {'values': len(self._values), 'size': self._size,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,201 @@
+"""Compact encodings of the request data for large batches of cards.
+
+Legacy form encoding repeats the field name with every card, so it is used for single taps
+only. Batches of cached cards are sent as JSON with an array of cards or as packed binary
+with 5 bytes per card, compressed by gzip or deflate. Binary body starts with 2 bytes of the
+length of JSON object with the other fields, which is followed by the cards.
+"""
+from .card_id import CARD_BYTES
+from .card_id import CARD_SIZE
+
+from enum import Enum
+from typing import Dict
+from typing import Final
+from typing import List
+from typing import Tuple
+from typing import Union
+from urllib.parse import parse_qs
+
+import gzip
+import json
+import struct
+import zlib
+
+Data = Dict[str, Union[str, List[str]]]
+
+FORM_CONTENT_TYPE: Final = 'application/x-www-form-urlencoded'
+JSON_CONTENT_TYPE: Final = 'application/json'
+BINARY_CONTENT_TYPE: Final = 'application/x-attendance-cards'
+
+_LENGTH: Final = struct.Struct('>H')
+
+
+class PayloadFormat(Enum):
+    """Enumeration of payload formats."""
+
+    FORM = 'form'
+    JSON = 'json'
+    BINARY = 'binary'
+
+
+class Compression(Enum):
+    """Enumeration of body compressions, values are used as Content-Encoding."""
+
+    IDENTITY = 'identity'
+    GZIP = 'gzip'
+    DEFLATE = 'deflate'
+
+
+class PayloadException(Exception):
+    """Exception raised when payload can not be decoded."""
+
+    def __init__(self, message):
+        """Init exception with message.
+
+        Args:
+            message: Error message.
+        """
+        super().__init__(message)
+
+
+def compress(body: bytes, compression: Compression, level: int = 6) -> bytes:
+    """Compress body.
+
+    Args:
+        body: Body to compress.
+        compression: Compression to use.
+        level: Compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        Compressed body.
+    """
+    if compression == Compression.GZIP:
+        # Fixed time keeps equal payloads identical
+        return gzip.compress(body, level, mtime=0)
+    if compression == Compression.DEFLATE:
+        # Deflate of HTTP is zlib stream
+        return zlib.compress(body, level)
+    return body
+
+
+def decompress(body: bytes, content_encoding: str) -> bytes:
+    """Decompress body by its Content-Encoding.
+
+    Raises:
+        PayloadException: If the encoding is not supported or the body is corrupted.
+    """
+    try:
+        compression: Compression = Compression(content_encoding or Compression.IDENTITY.value)
+    except ValueError:
+        raise PayloadException('Unsupported content encoding {0}.'.format(content_encoding))
+    try:
+        if compression == Compression.GZIP:
+            return gzip.decompress(body)
+        if compression == Compression.DEFLATE:
+            return zlib.decompress(body)
+    except (OSError, EOFError, zlib.error) as e:
+        raise PayloadException('Corrupted {0} body: {1}'.format(compression.value, e))
+    return body
+
+
+def encode_cards(cards: List[str]) -> bytes:
+    """Pack hex strings of the cards to 5 bytes each."""
+    return bytes.fromhex(''.join(cards))
+
+
+def decode_cards(data: bytes) -> List[str]:
+    """Unpack cards packed by encode_cards to hex strings.
+
+    Raises:
+        PayloadException: If the length is not multiple of the card size.
+    """
+    if len(data) % CARD_BYTES:
+        raise PayloadException('Packed cards have invalid length {0}.'.format(len(data)))
+    digits: str = data.hex()
+    return [digits[index:index + CARD_SIZE] for index in range(0, len(digits), CARD_SIZE)]
+
+
+class PayloadEncoder:
+    """Encoder of the request data for batches of cards.
+
+    Data with fewer cards than min_cards are left to the form encoding.
+    """
+
+    def __init__(self,
+                 payload_format: PayloadFormat = PayloadFormat.JSON,
+                 compression: Compression = Compression.GZIP,
+                 min_cards: int = 20,
+                 level: int = 6):
+        """Init encoder.
+
+        Args:
+            payload_format: Format of the batches.
+            compression: Compression of the batches.
+            min_cards: Smallest number of cards encoded by the encoder.
+            level: Compression level from 1 (fastest) to 9 (smallest).
+        """
+        self._format: Final = payload_format
+        self._compression: Final = compression
+        self._min_cards: Final = min_cards
+        self._level: Final = level
+
+    def accepts(self, cards: int) -> bool:
+        """Decide if data with the number of cards are encoded by the encoder."""
+        return self._format != PayloadFormat.FORM and cards >= self._min_cards
+
+    def encode(self, data: Data) -> Tuple[bytes, Dict[str, str]]:
+        """Encode data.
+
+        Args:
+            data: Request data, cardid is list of hex strings, other fields are strings.
+
+        Returns:
+            Body and its headers.
+        """
+        headers: Dict[str, str] = {}
+        if self._format == PayloadFormat.BINARY:
+            fields: Data = {key: value for key, value in data.items() if key != 'cardid'}
+            header: bytes = json.dumps(fields, separators=(',', ':')).encode('utf-8')
+            cards: List[str] = [card for card in data.get('cardid', [])]
+            body: bytes = _LENGTH.pack(len(header)) + header + encode_cards(cards)
+            headers['Content-Type'] = BINARY_CONTENT_TYPE
+        else:
+            body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            headers['Content-Type'] = JSON_CONTENT_TYPE
+        if self._compression != Compression.IDENTITY:
+            body = compress(body, self._compression, self._level)
+            headers['Content-Encoding'] = self._compression.value
+        return body, headers
+
+
+def decode_payload(body: bytes, content_type: str, content_encoding: str = '') -> Data:
+    """Decode request data of any payload format.
+
+    Args:
+        body: Request body.
+        content_type: Content-Type of the body (parameters are ignored).
+        content_encoding: Content-Encoding of the body.
+
+    Returns:
+        Request data, cardid is list of hex strings, other fields are strings.
+
+    Raises:
+        PayloadException: If the payload is not supported or it is corrupted.
+    """
+    body = decompress(body, content_encoding)
+    media_type: str = content_type.split(';')[0].strip()
+    try:
+        if media_type == JSON_CONTENT_TYPE:
+            return json.loads(body.decode('utf-8'))
+        if media_type == BINARY_CONTENT_TYPE:
+            length: int = _LENGTH.unpack_from(body)[0]
+            data: Data = json.loads(body[_LENGTH.size:_LENGTH.size + length].decode('utf-8'))
+            data['cardid'] = decode_cards(body[_LENGTH.size + length:])
+            return data
+        if media_type in (FORM_CONTENT_TYPE, ''):
+            fields: Dict[str, List[str]] = parse_qs(body.decode('ascii'))
+            return {key: values if key == 'cardid' else values[-1]
+                    for key, values in fields.items()}
+    except (ValueError, struct.error) as e:
+        raise PayloadException('Corrupted {0} payload: {1}'.format(media_type, e))
+    raise PayloadException('Unsupported content type {0}.'.format(content_type))
@@ -0,0 +1,21 @@
+"""Data files of the application: configuration and font."""
+try:
+    from importlib.resources import files
+except ImportError:
+    # Python 3.8 has only the legacy interface
+    from importlib.resources import read_binary
+    files = None
+
+
+def read_resource(name: str) -> bytes:
+    """Read data file of the package.
+
+    Args:
+        name: Name of the file in the resources folder.
+
+    Returns:
+        Content of the file.
+    """
+    if files is None:
+        return read_binary(__name__, name)
+    return files(__name__).joinpath(name).read_bytes()
@@ -1,5 +1,6 @@
+from . import read_resource
+
 from configparser import ConfigParser
-from pkg_resources import resource_filename
 
 config = ConfigParser()
-config.read(resource_filename(__name__, 'config.ini'))
+config.read_string(read_resource('config.ini').decode('utf-8'))
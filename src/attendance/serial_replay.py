@@ -0,0 +1,311 @@
+"""Capture and replay of raw serial streams of the card reader.
+
+Capture stores every chunk read from the port with its time offset as a JSON line.
+Replay serves the chunks through a pseudo-terminal, so CardReader can read them exactly
+like the physical reader. Noise, partial frames and corrupted bytes can be injected.
+
+Usage:
+    python -m src.attendance.serial_replay capture /dev/ttyUSB0 taps.jsonl --duration 60
+    python -m src.attendance.serial_replay synthesize taps.jsonl --cards 100 --interval 0.5
+    python -m src.attendance.serial_replay replay taps.jsonl --speed 10 --corrupt 0.05
+"""
+from .card_id import CARD_SIZE
+from .card_reader import CardReader
+from .frame_parser import STX
+
+from logging import getLogger
+from logging import Logger
+from pathlib import Path
+from random import Random
+from threading import Event
+from threading import Thread
+from time import monotonic
+from typing import Any
+from typing import Final
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import argparse
+import json
+import os
+import serial
+import tty
+
+Record = Tuple[float, bytes]
+
+ETX: Final = 0x03
+
+
+def create_frame(card: str) -> bytes:
+    """Create frame which the reader sends for the card.
+
+    Args:
+        card: Hex string of the card as the reader sends it.
+
+    Returns:
+        STX, card digits, checksum, CR LF and ETX.
+    """
+    digits: bytes = card.upper().encode('ascii')
+    checksum: int = 0
+    for index in range(0, CARD_SIZE, 2):
+        checksum ^= int(digits[index:index + 2], 16)
+    return bytes([STX]) + digits + '{0:02X}'.format(checksum).encode('ascii') + b'\r\n' + bytes([ETX])
+
+
+def synthesize(cards: Iterable[str], interval: float, repeats: int = 1,
+               repeat_interval: float = 0.1) -> List[Record]:
+    """Create capture of taps of the cards.
+
+    Args:
+        cards: Hex strings of the tapped cards.
+        interval: Seconds between taps.
+        repeats: Number of frames sent for every tap (reader repeats frames while card is held).
+        repeat_interval: Seconds between repeated frames.
+
+    Returns:
+        Records of the capture.
+    """
+    records: List[Record] = []
+    offset: float = 0.0
+    for card in cards:
+        frame: bytes = create_frame(card)
+        for repeat in range(repeats):
+            records.append((offset + repeat * repeat_interval, frame))
+        offset += interval
+    return records
+
+
+def inject_faults(records: Iterable[Record],
+                  noise: float = 0.0,
+                  partial: float = 0.0,
+                  corrupt: float = 0.0,
+                  seed: Optional[int] = None) -> List[Record]:
+    """Damage the capture like a noisy line would.
+
+    Args:
+        records: Records of the capture.
+        noise: Probability of random garbage bytes before a record.
+        partial: Probability that a record is cut short.
+        corrupt: Probability that one byte of a record is replaced.
+        seed: Seed of the random generator for reproducible results.
+
+    Returns:
+        Records of the damaged capture.
+    """
+    random: Random = Random(seed)
+    damaged: List[Record] = []
+    for offset, data in records:
+        if random.random() < noise:
+            # Garbage never contains STX, frames are damaged only by the other faults
+            garbage: bytes = bytes(random.choice(b'\x00\x03\x7f\xff0Z\r\n')
+                                   for _ in range(random.randint(1, 8)))
+            damaged.append((offset, garbage))
+        if data and random.random() < corrupt:
+            position: int = random.randrange(1, len(data)) if len(data) > 1 else 0
+            data = data[:position] + b'?' + data[position + 1:]
+        if data and random.random() < partial:
+            data = data[:random.randrange(1, len(data) + 1)]
+        damaged.append((offset, data))
+    return damaged
+
+
+def save_capture(records: Iterable[Record], path: Path) -> None:
+    """Store capture as JSON lines.
+
+    Args:
+        records: Records of the capture.
+        path: Path to the capture file.
+    """
+    with open(path, 'w') as file:
+        for offset, data in records:
+            file.write(json.dumps({'t': round(offset, 6), 'data': data.hex()}) + '\n')
+
+
+def load_capture(path: Path) -> List[Record]:
+    """Load capture stored by save_capture.
+
+    Args:
+        path: Path to the capture file.
+
+    Returns:
+        Records of the capture.
+    """
+    with open(path) as file:
+        return [(record['t'], bytes.fromhex(record['data']))
+                for record in (json.loads(line) for line in file if line.strip())]
+
+
+def capture(port: Any, duration: Optional[float] = None,
+            stop: Optional[Event] = None) -> List[Record]:
+    """Record raw stream of the port.
+
+    Args:
+        port: Opened serial port with timeout.
+        duration: Seconds to record, None records until stop is set.
+        stop: Event which stops the recording.
+
+    Returns:
+        Records of the capture.
+    """
+    records: List[Record] = []
+    start: float = monotonic()
+    while (duration is None or monotonic() - start < duration) and not (stop and stop.is_set()):
+        data: bytes = port.read(1)
+        if not data:
+            continue
+        received: float = monotonic() - start
+        waiting: int = getattr(port, 'in_waiting', 0)
+        if waiting:
+            data += port.read(waiting)
+        records.append((received, data))
+    return records
+
+
+class PtyReplay:
+    """Serves capture through a pseudo-terminal.
+
+    Open port_name like the physical reader, e.g. serial.Serial(replay.port_name).
+    """
+
+    def __init__(self, records: Iterable[Record], speed: float = 1.0, loop: bool = False):
+        """Open the pseudo-terminal.
+
+        Args:
+            records: Records of the capture.
+            speed: Speed multiplier of the original timing, 0 sends everything at once.
+            loop: If true the capture is replayed again and again until stopped.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._records: List[Record] = list(records)
+        self._speed: float = speed
+        self._loop: bool = loop
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port_name: str = os.ttyname(self._slave)
+        self.finished: Event = Event()
+        self._stopped: Event = Event()
+        self._worker: Optional[Thread] = None
+
+    def start(self) -> 'PtyReplay':
+        """Start sending the records.
+
+        Returns:
+            Itself.
+        """
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+        return self
+
+    def _run(self) -> None:
+        """Write records to the pseudo-terminal in their time."""
+        while self._replay_once() and self._loop:
+            pass
+        self.logger.debug('Replay of {0} records finished.'.format(len(self._records)))
+        self.finished.set()
+
+    def _replay_once(self) -> bool:
+        """Write all the records once.
+
+        Returns:
+            False if the replay was stopped.
+        """
+        start: float = monotonic()
+        for offset, data in self._records:
+            if self._speed > 0:
+                delay: float = offset / self._speed - (monotonic() - start)
+                if self._stopped.wait(max(0.0, delay)):
+                    return False
+            elif self._stopped.is_set():
+                return False
+            os.write(self._master, data)
+        return True
+
+    def send(self, data: bytes) -> None:
+        """Write data to the pseudo-terminal right away, e.g. a frame of a simulated tap.
+
+        Args:
+            data: Bytes to send.
+        """
+        os.write(self._master, data)
+
+    def stop(self) -> None:
+        """Stop sending and close the pseudo-terminal."""
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self) -> 'PtyReplay':
+        """Start replay."""
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        """Stop replay."""
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture and replay of the card reader stream.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    capture_parser = commands.add_parser('capture', help='record stream of a serial port')
+    capture_parser.add_argument('port', help='serial port of the reader')
+    capture_parser.add_argument('output', type=Path, help='capture file')
+    capture_parser.add_argument('--duration', type=float, help='seconds to record (default until Ctrl+C)')
+
+    synthesize_parser = commands.add_parser('synthesize', help='create capture of random taps')
+    synthesize_parser.add_argument('output', type=Path, help='capture file')
+    synthesize_parser.add_argument('--cards', type=int, default=100, help='number of taps')
+    synthesize_parser.add_argument('--interval', type=float, default=0.5, help='seconds between taps')
+    synthesize_parser.add_argument('--repeats', type=int, default=3, help='frames per tap')
+    synthesize_parser.add_argument('--seed', type=int, help='seed of the random cards')
+
+    replay_parser = commands.add_parser('replay', help='serve capture through a pseudo-terminal')
+    replay_parser.add_argument('input', type=Path, help='capture file')
+    replay_parser.add_argument('--speed', type=float, default=1.0,
+                               help='speed multiplier, 0 sends as fast as possible')
+    replay_parser.add_argument('--loop', action='store_true', help='replay until Ctrl+C')
+    for fault in ['noise', 'partial', 'corrupt']:
+        replay_parser.add_argument('--' + fault, type=float, default=0.0,
+                                   help='probability of {0} per record'.format(fault))
+    replay_parser.add_argument('--seed', type=int, help='seed of the fault injection')
+    args = parser.parse_args()
+
+    if args.command == 'capture':
+        port = serial.Serial(args.port, baudrate=CardReader.BAUDRATE, parity=CardReader.PARITY,
+                             stopbits=CardReader.STOPBITS, bytesize=CardReader.BYTESIZE,
+                             timeout=CardReader.TIMEOUT)
+        stop: Event = Event()
+        records: List[Record] = []
+        worker: Thread = Thread(
+            target=lambda: records.extend(capture(port, args.duration, stop)), daemon=True)
+        worker.start()
+        try:
+            worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            worker.join()
+        save_capture(records, args.output)
+        print('{0} records captured.'.format(len(records)))
+    elif args.command == 'synthesize':
+        random: Random = Random(args.seed)
+        cards: List[str] = ['{0:010x}'.format(random.getrandbits(40)) for _ in range(args.cards)]
+        save_capture(synthesize(cards, args.interval, args.repeats), args.output)
+    else:
+        records = inject_faults(load_capture(args.input), args.noise, args.partial,
+                                args.corrupt, args.seed)
+        replay: PtyReplay = PtyReplay(records, args.speed, args.loop)
+        print('Serving {0} on {1}'.format(args.input, replay.port_name), flush=True)
+        try:
+            with replay:
+                while not replay.finished.wait(0.5):
+                    pass
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+from .api_connection import APIConnectionException
+from .uploader import DeltaUploader
+
+from collections import deque
+from itertools import islice
+from logging import getLogger
+from logging import Logger
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Final
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class UploadQueue:
+    """Bounded queue of read cards which are sent to the API by a background worker.
+
+    Cards are expected to be stored in the card cache before they are put to the queue,
+    so they are sent with the next successful request even if the application is restarted.
+    The single worker sends cards in the order they were read, so every request uses
+    the token returned by the previous one. Cards acknowledged meanwhile (e.g. by upload
+    of the cached cards) are skipped.
+    """
+
+    RATE_WINDOW: Final = 60.0
+
+    def __init__(self,
+                 uploader: DeltaUploader,
+                 maxsize: int,
+                 on_result: Callable[[str, Dict[str, Any]], None],
+                 on_error: Callable[[str, APIConnectionException], None]):
+        """Init queue.
+
+        Args:
+            uploader: Uploader used to send the cards.
+            maxsize: Maximal number of cards waiting in the queue.
+            on_result: Called from the worker with card and API response.
+            on_error: Called from the worker with card and exception if sending failed.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._uploader: Final = uploader
+        self._maxsize: Final = maxsize
+        self._on_result: Final = on_result
+        self._on_error: Final = on_error
+        self._condition: Condition = Condition()
+        self._items: Deque[Tuple[str, float]] = deque()
+        self._completed: Deque[float] = deque()
+        self._sent: int = 0
+        self._failed: int = 0
+        self._skipped: int = 0
+        self._stopped: bool = False
+        self._worker: Optional[Thread] = None
+
+    def start(self) -> None:
+        """Start the worker."""
+        self._stopped = False
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker after the card which is being sent.
+
+        Cards left in the queue stay in the card cache.
+
+        Args:
+            timeout: Maximal time to wait for the worker in seconds.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def put(self, card: str) -> bool:
+        """Add card to the queue.
+
+        Args:
+            card: Read card.
+
+        Returns:
+            True if the card was queued, false if the queue is full.
+        """
+        with self._condition:
+            if len(self._items) >= self._maxsize:
+                self.logger.warning('Upload queue is full, card {0} stays cached.'.format(card))
+                return False
+            self._items.append((card, monotonic()))
+            self._condition.notify()
+            return True
+
+    def depth(self) -> int:
+        """Return number of cards waiting in the queue including the one being sent."""
+        with self._condition:
+            return len(self._items)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return queue statistics.
+
+        Returns:
+            Dictionary with depth, drain rate (cards per second in the last minute),
+            age of the oldest pending card in seconds and numbers of sent, failed
+            and skipped cards.
+        """
+        with self._condition:
+            now: float = monotonic()
+            self._forget_completed(now)
+            return {
+                'depth': len(self._items),
+                'drain_rate': len(self._completed) / UploadQueue.RATE_WINDOW,
+                'oldest_pending_age': now - self._items[0][1] if self._items else 0.0,
+                'sent': self._sent,
+                'failed': self._failed,
+                'skipped': self._skipped
+            }
+
+    def _forget_completed(self, now: float) -> None:
+        """Drop completions older than the rate window."""
+        while self._completed and now - self._completed[0] > UploadQueue.RATE_WINDOW:
+            self._completed.popleft()
+
+    def _run(self) -> None:
+        """Send queued cards until the queue is stopped."""
+        while True:
+            with self._condition:
+                while not self._items and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                card: str = self._items[0][0]
+                queued: List[str] = [item[0] for item in islice(self._items, 1, None)]
+            try:
+                succeeded: Optional[bool] = self._send(card, queued)
+            except Exception:
+                self.logger.exception('Processing of card {0} failed.'.format(card))
+                succeeded = False
+            with self._condition:
+                self._items.popleft()
+                now: float = monotonic()
+                self._completed.append(now)
+                self._forget_completed(now)
+                if succeeded is None:
+                    self._skipped += 1
+                elif succeeded:
+                    self._sent += 1
+                else:
+                    self._failed += 1
+            self.logger.debug('Upload queue statistics: {0}'.format(self.get_stats()))
+
+    def _send(self, card: str, queued: List[str]) -> Optional[bool]:
+        """Send card and pass the result to the callbacks.
+
+        Args:
+            card: Card to send.
+            queued: Cards waiting in the queue behind the card.
+
+        Returns:
+            True if the card was sent, None if it was already acknowledged.
+        """
+        try:
+            result: Optional[Dict[str, Any]] = self._uploader.send_queued(card, queued)
+        except APIConnectionException as e:
+            self._on_error(card, e)
+            return False
+        if result is None:
+            self.logger.debug('Card {0} was already acknowledged, it is skipped.'.format(card))
+            return None
+        self._on_result(card, result)
+        return True
@@ -0,0 +1,214 @@
+from .api_connection import IConnection
+from .card_id import CARD_SIZE
+from .card_id import CardId
+from .card_id import CardSet
+from .card_id import pack_card
+from .card_store import ICardStore
+
+from logging import getLogger
+from logging import Logger
+from threading import RLock
+from typing import Any
+from typing import Dict
+from typing import Final
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+
+class UploadStats:
+    """Counters of the uploads done by DeltaUploader."""
+
+    def __init__(self):
+        """Init all counters with zero."""
+        self.requests: int = 0
+        self.cards_sent: int = 0
+        self.cards_saved: int = 0
+        self.bytes_saved: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Return counters as dictionary."""
+        return {
+            'requests': self.requests,
+            'cards_sent': self.cards_sent,
+            'cards_saved': self.cards_saved,
+            'bytes_saved': self.bytes_saved
+        }
+
+
+class DeltaUploader:
+    """Sends only cards which were not acknowledged by the API yet.
+
+    Cached cards are removed from the pending set as soon as the API accepts them.
+    Large backlog is sent in batches and every accepted batch is acknowledged right away,
+    so an interrupted upload continues with the remaining cards only.
+    Uploads from different threads are serialized.
+    """
+
+    CARD_FIELD_SIZE: Final = len('&cardid=') + CARD_SIZE
+
+    def __init__(self, connection: IConnection, cache: ICardStore, batch_size: int = 100):
+        """Init uploader.
+
+        Args:
+            connection: Connection to the API.
+            cache: Store with pending and acknowledged cards.
+            batch_size: Maximal number of cached cards sent in a single request.
+        """
+        self.logger: Logger = getLogger(__name__)
+        self._connection: Final = connection
+        self._cache: Final = cache
+        self._batch_size: Final = batch_size
+        self.stats: UploadStats = UploadStats()
+        self._lock: RLock = RLock()
+        # Acknowledged cards already counted as saved
+        self._counted_acknowledged: int = 0
+
+    def _count_request(self, sent: int, acknowledged: int) -> None:
+        """Update statistics after successful request.
+
+        Every acknowledged card is counted as saved once, by the first request which did not
+        have to send it again.
+
+        Args:
+            sent: Number of cards sent in the request.
+            acknowledged: Number of acknowledged cards when the request was sent.
+        """
+        if acknowledged < self._counted_acknowledged:
+            # Acknowledged cards were cleared by a new session
+            self._counted_acknowledged = 0
+        saved: int = acknowledged - self._counted_acknowledged
+        self._counted_acknowledged = acknowledged
+        self.stats.requests += 1
+        self.stats.cards_sent += sent
+        self.stats.cards_saved += saved
+        self.stats.bytes_saved += saved * DeltaUploader.CARD_FIELD_SIZE
+
+    def _upload_backlog(self, keep: int) -> CardSet:
+        """Send pending cards in batches until at most keep cards remain.
+
+        Args:
+            keep: Number of pending cards which may stay unsent.
+
+        Returns:
+            Remaining pending cards.
+
+        Raises:
+            APIConnectionException: If any of the batches failed, accepted batches stay acknowledged.
+        """
+        pending: CardSet = self._cache.get_cards()
+        while len(pending) > keep:
+            batch: List[CardId] = []
+            for card in pending:
+                batch.append(card)
+                if len(batch) == self._batch_size:
+                    break
+            acknowledged: int = self._cache.count_acknowledged()
+            self._connection.send_cached_data_only(batch)
+            self._cache.acknowledge(batch)
+            self._count_request(len(batch), acknowledged)
+            self.logger.debug('Batch of {0} cached cards acknowledged.'.format(len(batch)))
+            pending = self._cache.get_cards()
+        return pending
+
+    def send_data(self, card: str) -> Dict[str, Any]:
+        """Send card with all unacknowledged cached cards.
+
+        The card itself may be cached too, it is sent only once.
+
+        Args:
+            card: Currently read card.
+
+        Returns:
+            JSON response as dictionary.
+
+        Raises:
+            APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
+        """
+        with self._lock:
+            pending: CardSet = self._upload_backlog(self._batch_size + 1)
+            pending.discard(card)
+            acknowledged: int = self._cache.count_acknowledged()
+            result: Dict[str, Any] = self._connection.send_data(card, pending)
+            self._acknowledge(pending, acknowledged, card)
+            return result
+
+    def send_queued(self, card: str, queued: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """Send cached card of the upload queue with the unacknowledged cards read before it.
+
+        Cards waiting in the queue behind the card are left to their own requests,
+        so none of them is sent twice.
+
+        Args:
+            card: Card taken from the upload queue.
+            queued: Cards waiting in the upload queue.
+
+        Returns:
+            JSON response as dictionary or None if the card was already acknowledged.
+
+        Raises:
+            APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
+        """
+        with self._lock:
+            pending: CardSet = self._cache.get_cards()
+            if card not in pending:
+                return None
+            for queued_card in queued:
+                pending.discard(queued_card)
+            pending.discard(card)
+            acknowledged: int = self._cache.count_acknowledged()
+            result: Dict[str, Any] = self._connection.send_data(card, pending)
+            self._acknowledge(pending, acknowledged, card)
+            return result
+
+    def send_organizator_data(self, card: str) -> Dict[str, Any]:
+        """Send organizator card with all unacknowledged cached cards.
+
+        Args:
+            card: Card ID of the organizator.
+
+        Returns:
+            JSON response as dictionary.
+
+        Raises:
+            APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
+        """
+        with self._lock:
+            pending: CardSet = self._cache.get_cards()
+            acknowledged: int = self._cache.count_acknowledged()
+            result: Dict[str, Any] = self._connection.send_organizator_data(card, pending)
+            self._acknowledge(pending, acknowledged)
+            return result
+
+    def send_pending(self) -> Optional[Dict[str, Any]]:
+        """Send all unacknowledged cached cards.
+
+        Returns:
+            JSON response of the last request as dictionary or None if there was nothing to send.
+
+        Raises:
+            APIConnectionException: If connection failed for any reason(no internet, timeout, ...)
+        """
+        with self._lock:
+            pending: CardSet = self._upload_backlog(self._batch_size)
+            if len(pending) == 0:
+                return None
+            acknowledged: int = self._cache.count_acknowledged()
+            result: Dict[str, Any] = self._connection.send_cached_data_only(pending)
+            self._acknowledge(pending, acknowledged)
+            return result
+
+    def _acknowledge(self, pending: CardSet, acknowledged: int, card: Optional[str] = None) -> None:
+        """Acknowledge sent cards and update statistics.
+
+        Args:
+            pending: Cached cards which were sent.
+            acknowledged: Number of acknowledged cards when the request was sent.
+            card: Currently read card which was sent too.
+        """
+        sent: int = len(pending)
+        if card is not None:
+            pending.add(pack_card(card))
+            sent += 1
+        self._cache.acknowledge(pending)
+        self._count_request(sent, acknowledged)
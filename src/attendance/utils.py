@@ -3,16 +3,19 @@ from logging import Logger
 from os import makedirs
 from os import path
 from pathlib import Path
-from requests import Response
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Set
 from typing import Tuple
+from typing import TYPE_CHECKING
 from typing import Union
 from uuid import getnode
 
 import logging
-import requests
+
+if TYPE_CHECKING:
+    from requests import Session
 
 logger: Logger = logging.getLogger(__name__)
 
@@ -48,6 +51,26 @@ def get_cache_file_path() -> Path:
     return Path(get_cache_folder_path(), 'cache')
 
 
+def get_journal_file_path() -> Path:
+    """Get journal file path.
+
+    The journal contains records appended after the last snapshot stored in the cache file.
+
+    Returns:
+        Absolute path to journal file.
+    """
+    return Path(get_cache_folder_path(), 'cache.journal')
+
+
+def get_ledger_file_path() -> Path:
+    """Get SQLite attendance ledger file path.
+
+    Returns:
+        Absolute path to ledger file.
+    """
+    return Path(get_cache_folder_path(), 'ledger.sqlite3')
+
+
 def create_cache_folder() -> None:
     """Create cache folder acquired from get_cache_folder_path()."""
     cache_folder_path: str = get_cache_folder_path()
@@ -59,18 +82,24 @@ def create_cache_folder() -> None:
             'cache folder ({0}) was created'.format(cache_folder_path))
 
 
-def is_site_up(url: str, timeout: float = 5.0) -> bool:
+def is_site_up(url: str, timeout: float = 5.0, session: Optional['Session'] = None) -> bool:
     """Verify if given URL is accessible.
 
     Args:
         url: String representation of URL to verify.
         timeout: Timeout for the request.
+        session: Session whose pooled connections are used, new connection is made if None.
 
     Returns:
         True if URL is accessible, false otherwise.
     """
+    # Imported here so the card reader and the other users of the module load fast
+    import requests
     try:
-        result: Response = requests.get(url, timeout=timeout)
+        if session is None:
+            result: requests.Response = requests.get(url, timeout=timeout)
+        else:
+            result = session.get(url, timeout=timeout)
         result.raise_for_status()
         logger.info('site {0} is accessible'.format(url))
         return True
@@ -88,7 +117,12 @@ def is_site_up(url: str, timeout: float = 5.0) -> bool:
         return False
 
 
-def reverse_endianness(string: str) -> str:
+_NIBBLE_REVERSE: List[int] = [int('{0:04b}'.format(n)[::-1], 2) for n in range(16)]
+_BYTE_NIBBLES_REVERSE: List[int] = [
+    (_NIBBLE_REVERSE[b >> 4] << 4) | _NIBBLE_REVERSE[b & 0xf] for b in range(256)]
+
+
+def reverse_endianness(value: Union[str, int]) -> Union[str, int]:
     """Convert hex string to hex string with opposite endianness.
 
     E.g.
@@ -96,13 +130,17 @@ def reverse_endianness(string: str) -> str:
     Big endian -> Little endian
 
     Result for non hex string is undefined, no validation is done.
+    Packed card (integer) is converted the same way - bits of every nibble are reversed.
 
     Args:
-        string: Hex string to convert.
+        value: Hex string or packed card to convert.
 
     Returns:
-        Hex lower case string with reverse endianness.
+        Hex lower case string or packed card with reverse endianness.
     """
+    if isinstance(value, int):
+        data: bytes = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        return int.from_bytes(bytes(_BYTE_NIBBLES_REVERSE[b] for b in data), 'big')
     translation: Dict[int, Union[int, None]] = str.maketrans(
         '0123456789abcdef', '084c2a6e195d3b7f')
-    return string.lower().translate(translation)
+    return value.lower().translate(translation)
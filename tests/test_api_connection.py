@@ -1,11 +1,16 @@
 from src.attendance.api_connection import APIConnectionException
 from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.payload import Compression
+from src.attendance.payload import PayloadEncoder
+from src.attendance.payload import PayloadFormat
 
+from .utils.server_mock import run
 from .utils.server_mock import server
 
 from multiprocessing import Process
 from unittest import TestCase
 
+import requests
 import time
 
 
@@ -20,6 +25,7 @@ class TestISConnectionOnlineModeWithConnectionAvailable(TestCase):
     @classmethod
     def tearDownClass(cls):
         cls._server_process.terminate()
+        cls._server_process.join()
 
     def setUp(self):
         builder = ISConnectionBuilder()
@@ -141,6 +147,7 @@ class TestISConnectionOfflineMode(TestCase):
     @classmethod
     def tearDownClass(cls):
         cls._server_process.terminate()
+        cls._server_process.join()
 
     def setUp(self):
         builder = ISConnectionBuilder()
@@ -171,3 +178,141 @@ class TestISConnectionOfflineMode(TestCase):
         result = self.connection.send_cached_data_only(
             ['0cb90021f6', 'f8a400ca45'])
         self.assertEqual(result, expected_result)
+
+
+class TestISConnectionKeepAlive(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server_process = Process(target=run)
+        cls._server_process.start()
+        time.sleep(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server_process.terminate()
+        cls._server_process.join()
+
+    def setUp(self):
+        requests.delete('http://127.0.0.1:5000/connections')
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        builder.set_pool_size(1)
+        self.connection = builder.build()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def get_connection_count(self):
+        return requests.get('http://127.0.0.1:5000/connections').json()['count']
+
+    def test_connection_reused(self):
+        self.assertTrue(self.connection.is_available())
+        self.connection.send_organizator_data('0cb90021f6')
+        self.connection.send_data('f8a400ca45')
+        self.connection.send_data('f64dcf480d')
+        self.assertEqual(self.get_connection_count(), 1)
+
+    def test_reset_session(self):
+        self.assertTrue(self.connection.is_available())
+        self.connection.reset_session()
+        self.assertTrue(self.connection.is_available())
+        self.assertEqual(self.get_connection_count(), 2)
+
+    def test_keepalive(self):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        builder.set_keepalive_interval(0.2)
+        connection = builder.build()
+        time.sleep(0.5)
+        connection.send_organizator_data('0cb90021f6')
+        connection.close()
+        self.assertEqual(self.get_connection_count(), 1)
+
+    def test_keepalive_once_per_idle_period(self):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        builder.set_keepalive_interval(0.1)
+        connection = builder.build()
+        self.addCleanup(connection.close)
+        heads = []
+        session = connection._session
+        head = session.head
+        session.head = lambda *args, **kwargs: heads.append(1) or head(*args, **kwargs)
+        time.sleep(0.55)
+        self.assertEqual(1, len(heads))
+        connection.send_organizator_data('0cb90021f6')
+        time.sleep(0.35)
+        self.assertEqual(2, len(heads))
+
+    def test_latency_measured(self):
+        self.connection.send_organizator_data('0cb90021f6')
+        self.connection.send_data('f8a400ca45')
+        stats = self.connection.get_latency_stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertIsNotNone(stats['connect_average'])
+        self.assertIsNotNone(stats['response_average'])
+
+
+class TestISConnectionPayload(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server_process = Process(target=run)
+        cls._server_process.start()
+        time.sleep(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server_process.terminate()
+        cls._server_process.join()
+
+    def create_connection(self, url, payload_format, compression):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url(url)
+        builder.set_payload_encoder(PayloadEncoder(payload_format, compression, min_cards=2))
+        connection = builder.build()
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_encoded_batch(self):
+        cached = ['{0:010x}'.format(index) for index in range(1, 100)]
+        for payload_format in (PayloadFormat.JSON, PayloadFormat.BINARY):
+            for compression in Compression:
+                connection = self.create_connection('http://127.0.0.1:5000/testonline',
+                                                    payload_format, compression)
+                connection.send_organizator_data('0cb90021f6')
+                result = connection.send_data('f8a400ca45', cached)
+                self.assertEqual(result['msga'], 'Sofia Chadwick')
+
+    def test_fallback_to_form(self):
+        connection = self.create_connection('http://127.0.0.1:5000/testlegacy',
+                                            PayloadFormat.BINARY, Compression.GZIP)
+        result = connection.send_organizator_data('0cb90021f6', ['f8a400ca45'])
+        self.assertEqual(result['msga'], 'Tasha Samson')
+        self.assertIsNone(connection._payload_encoder)
+
+    def test_fallback_on_error_response(self):
+        connection = self.create_connection('http://127.0.0.1:5000/testformonly',
+                                            PayloadFormat.JSON, Compression.GZIP)
+        result = connection.send_organizator_data('0cb90021f6', ['f8a400ca45'])
+        self.assertEqual(result['msga'], 'Tasha Samson')
+        self.assertIsNone(connection._payload_encoder)
+
+    def test_api_error_not_resent(self):
+        connection = self.create_connection('http://127.0.0.1:5000/testonline',
+                                            PayloadFormat.JSON, Compression.GZIP)
+        connection.send_organizator_data('0cb90021f6')
+        requests.delete('http://127.0.0.1:5000/posts')
+        result = connection.send_data('f64dcf480d', ['f8a400ca45'])
+        self.assertEqual(result['err'], '1')
+        self.assertEqual(requests.get('http://127.0.0.1:5000/posts').json()['count'], 1)
+        self.assertIsNotNone(connection._payload_encoder)
@@ -0,0 +1,257 @@
+from src.attendance.api_connection import APIConnectionException
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.async_recorder import AsyncAttendanceRecorder
+from src.attendance.async_recorder import AsyncCardReader
+from src.attendance.async_recorder import AsyncISConnection
+from src.attendance.button_controller import IButtonController
+from src.attendance.buzzer import IBuzzer
+from src.attendance.card_reader import CardReader
+from src.attendance.card_reader import ICardReader
+from src.attendance.card_reader import NoDataException
+from src.attendance.display import IDisplay
+
+from .test_frame_parser import FRAME
+from .test_frame_parser import OTHER_FRAME
+from .utils.server_mock import run
+
+from multiprocessing import Process
+from queue import Empty
+from queue import Queue
+from tempfile import TemporaryDirectory
+from threading import Event
+from unittest import TestCase
+
+import asyncio
+import os
+import requests
+import time
+
+
+class DisplayMock(IDisplay):
+
+    def __init__(self):
+        self.messages = []
+
+    def show(self, msga, msgb='', can_be_killed=True, priority=None, min_duration=0.0,
+             block=False):
+        self.messages.append(msga)
+
+
+class ReaderMock(ICardReader):
+
+    def __init__(self):
+        self.cards = Queue()
+        self.cancelled = Event()
+
+    def read_card(self, raise_if_no_data=False):
+        try:
+            return self.cards.get(timeout=0.02)
+        except Empty:
+            raise NoDataException('No card data was read.')
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class ButtonMock(IButtonController):
+
+    def __init__(self):
+        self.presses = Queue()
+
+    def is_pushed(self):
+        return False
+
+    def wait_for_press(self, timeout=None):
+        try:
+            return self.presses.get(timeout=timeout)
+        except Empty:
+            return False
+
+
+class BuzzerMock(IBuzzer):
+
+    def __init__(self):
+        self.beeps = []
+
+    def beep(self, correct):
+        self.beeps.append(correct)
+
+
+class ConnectionMock(AsyncISConnection):
+
+    def __init__(self, timeout=45.0):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:1')
+        builder.set_url('http://127.0.0.1:1/testonline')
+        super().__init__(builder, timeout)
+        self.failing = set()
+        self.sent = []
+
+    def send_organizator_data(self, organizator_card_id, card_ids=()):
+        return {'msga': 'Tasha Samson', 'msgb': 'TEST SUCCESS'}
+
+    def send_data(self, actual_card_id, previous_card_ids=()):
+        if actual_card_id in self.failing:
+            raise APIConnectionException('Connection failed.')
+        self.sent.append(actual_card_id)
+        return {'msga': 'Sent ' + actual_card_id}
+
+
+class TestAsyncISConnection(TestCase):
+
+    def test_submit_result(self):
+        connection = ConnectionMock()
+        self.addCleanup(connection.close)
+        self.assertEqual({'msga': 'Sent 0cb90021f6'},
+                         asyncio.run(connection.send_data_async('0cb90021f6')))
+
+
+class TestAsyncISConnectionDeadline(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server_process = Process(target=run, args=(1.0,))
+        cls._server_process.start()
+        time.sleep(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server_process.terminate()
+        cls._server_process.join()
+
+    def create_connection(self, timeout):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        connection = AsyncISConnection(builder, timeout)
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_request_stops_at_deadline(self):
+        connection = self.create_connection(0.3)
+
+        async def send():
+            start = time.monotonic()
+            with self.assertRaises(APIConnectionException):
+                await connection.send_organizator_data_async('0cb90021f6')
+            self.assertLess(time.monotonic() - start, 0.9)
+            # Request is not left running in the connection thread
+            start = time.monotonic()
+            await connection.submit(len, '')
+            self.assertLess(time.monotonic() - start, 0.1)
+        asyncio.run(send())
+
+    def test_expired_operation_not_sent(self):
+        connection = self.create_connection(0.3)
+        requests.delete('http://127.0.0.1:5000/posts')
+
+        async def send():
+            busy = asyncio.ensure_future(connection.submit(time.sleep, 0.5))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(APIConnectionException):
+                await connection.send_organizator_data_async('0cb90021f6')
+            await busy
+        asyncio.run(send())
+        self.assertEqual(0, requests.get('http://127.0.0.1:5000/posts').json()['count'])
+        self.assertIsNone(connection.get_token())
+
+
+class TestAsyncCardReader(TestCase):
+
+    def test_cancel_cancels_read(self):
+        reader = ReaderMock()
+
+        async def read():
+            task = asyncio.ensure_future(AsyncCardReader(reader).read_card())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(read())
+        self.assertTrue(reader.cancelled.is_set())
+
+    def test_cancel_after_read_does_not_cancel_next_read(self):
+        read_end, write_end = os.pipe()
+        port = open(read_end, 'rb', buffering=0)
+        self.addCleanup(os.close, write_end)
+        reader = CardReader(port)
+        self.addCleanup(reader.close)
+        async_reader = AsyncCardReader(reader)
+
+        async def read():
+            task = asyncio.ensure_future(async_reader.read_card())
+            await asyncio.sleep(0.05)
+            os.write(write_end, FRAME)
+            # Read returns the card while the loop is blocked, then the task is cancelled
+            time.sleep(0.2)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            os.write(write_end, OTHER_FRAME)
+            return await asyncio.wait_for(async_reader.read_card(), 1)
+        self.assertEqual('f15200352a', asyncio.run(read()))
+
+
+class TestAsyncAttendanceRecorder(TestCase):
+
+    def setUp(self):
+        home = TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.addCleanup(os.environ.__setitem__, 'HOME', os.environ['HOME'])
+        os.environ['HOME'] = home.name
+        self.display = DisplayMock()
+        self.reader = ReaderMock()
+        self.button = ButtonMock()
+        self.connection = ConnectionMock()
+        self.addCleanup(self.connection.close)
+        self.recorder = AsyncAttendanceRecorder(self.display, self.reader, self.connection,
+                                                BuzzerMock(), self.button)
+
+    async def wait_for_message(self, message, timeout=2):
+        deadline = time.monotonic() + timeout
+        while message not in self.display.messages:
+            if time.monotonic() > deadline:
+                self.fail('{0} was not shown, messages {1}'.format(message, self.display.messages))
+            await asyncio.sleep(0.01)
+
+    async def start_reading(self):
+        task = asyncio.ensure_future(self.recorder.run())
+        self.button.presses.put(True)
+        self.reader.cards.put('0cb90021f6')
+        await self.wait_for_message('Ready to read a card.')
+        return task
+
+    def test_threads_of_sync_recorder_not_created(self):
+        self.assertIsNone(self.recorder._card_events)
+        self.assertIsNone(self.recorder._upload_queue)
+
+    def test_api_error_in_upload_loop(self):
+        self.connection.failing.add('f8a400ca45')
+
+        async def scenario():
+            task = await self.start_reading()
+            self.reader.cards.put('f8a400ca45')
+            await self.wait_for_message('Connection failed.')
+            self.reader.cards.put('f64dcf480d')
+            await self.wait_for_message('Sent f64dcf480d')
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        asyncio.run(scenario())
+        # Failed card stays cached and is sent with the next one
+        self.assertEqual(['f64dcf480d'], self.connection.sent)
+        self.assertEqual(0, len(self.recorder._cache.get_cards()))
+
+    def test_shutdown_cancels_tasks(self):
+        async def scenario():
+            task = await self.start_reading()
+            self.reader.cancelled.clear()
+            task.cancel()
+            start = time.monotonic()
+            await asyncio.gather(task, return_exceptions=True)
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertTrue(task.cancelled())
+            # Only the task running the scenario is left
+            self.assertEqual(1, len(asyncio.all_tasks()))
+        asyncio.run(scenario())
+        self.assertTrue(self.reader.cancelled.is_set())
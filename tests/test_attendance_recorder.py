@@ -0,0 +1,170 @@
+from src.attendance.api_connection import IConnection
+from src.attendance.attendance_recorder import AttendanceRecorder
+from src.attendance.button_controller import IButtonController
+from src.attendance.buzzer import IBuzzer
+from src.attendance.card_id import pack_card
+from src.attendance.card_reader import ICardReader
+from src.attendance.card_reader import ReadCancelledException
+from src.attendance.display import IDisplay
+from src.attendance.resources.config import config
+
+from tempfile import TemporaryDirectory
+from threading import Event
+from threading import Lock
+from threading import Thread
+from unittest import TestCase
+
+import os
+import time
+
+
+class DisplayMock(IDisplay):
+
+    def __init__(self):
+        self._lock = Lock()
+        self.messages = []
+
+    def show(self, msga, msgb='', can_be_killed=True, priority=None, min_duration=0.0,
+             block=False):
+        with self._lock:
+            self.messages.append(msga)
+
+    def get_messages(self):
+        with self._lock:
+            return list(self.messages)
+
+
+class ReaderMock(ICardReader):
+
+    def __init__(self):
+        self._cancelled = Event()
+
+    def read_card(self, raise_if_no_data=False):
+        self._cancelled.wait()
+        self._cancelled.clear()
+        raise ReadCancelledException('Cancelled.')
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+class ButtonMock(IButtonController):
+
+    def is_pushed(self):
+        return False
+
+
+class BuzzerMock(IBuzzer):
+
+    def __init__(self):
+        self.beeps = []
+
+    def beep(self, correct):
+        self.beeps.append(correct)
+
+
+class ConnectionMock(IConnection):
+
+    def __init__(self):
+        self.available = Event()
+        self.checks = 0
+
+    def set_token(self, token):
+        pass
+
+    def get_token(self):
+        return None
+
+    def is_available(self):
+        return self.available.is_set()
+
+    def wait_until_available(self, timeout):
+        self.checks += 1
+        return self.available.wait(min(timeout, 0.02))
+
+    def send_cached_data_only(self, card_ids):
+        return {}
+
+    def send_data(self, actual_card_id, previous_card_ids=()):
+        return {}
+
+    def send_organizator_data(self, organizator_card_id, card_ids=()):
+        return {}
+
+
+class TestConnectionCheck(TestCase):
+
+    def setUp(self):
+        home = TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.addCleanup(os.environ.__setitem__, 'HOME', os.environ['HOME'])
+        os.environ['HOME'] = home.name
+        self.addCleanup(config['Recorder'].__setitem__, 'fast_start',
+                        config['Recorder']['fast_start'])
+        self.display = DisplayMock()
+        self.connection = ConnectionMock()
+
+    def start_recorder(self, fast_start):
+        config['Recorder']['fast_start'] = 'true' if fast_start else 'false'
+        recorder = AttendanceRecorder(self.display, ReaderMock(), self.connection,
+                                      BuzzerMock(), ButtonMock())
+        Thread(target=recorder.start, daemon=True).start()
+
+    def wait_for_message(self, message, timeout=2):
+        deadline = time.monotonic() + timeout
+        while message not in self.display.get_messages():
+            if time.monotonic() > deadline:
+                self.fail('{0} was not shown, messages {1}'.format(
+                    message, self.display.get_messages()))
+            time.sleep(0.01)
+
+    def test_fast_start_leaves_display_to_prompts(self):
+        self.start_recorder(True)
+        self.wait_for_message('Please push the button to start.')
+        time.sleep(0.2)
+        self.assertGreater(self.connection.checks, 1)
+        self.connection.available.set()
+        time.sleep(0.1)
+        self.assertEqual(['Please push the button to start.'], self.display.get_messages())
+
+    def test_slow_start_waits_for_connection(self):
+        self.start_recorder(False)
+        self.wait_for_message('Connection failed!')
+        self.assertNotIn('Please push the button to start.', self.display.get_messages())
+        self.connection.available.set()
+        self.wait_for_message('Please push the button to start.')
+        messages = self.display.get_messages()
+        self.assertLess(messages.index('Connection successful'),
+                        messages.index('Please push the button to start.'))
+
+
+class TestBackgroundUpload(TestCase):
+
+    def setUp(self):
+        home = TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.addCleanup(os.environ.__setitem__, 'HOME', os.environ['HOME'])
+        os.environ['HOME'] = home.name
+        self.addCleanup(config['Upload'].__setitem__, 'background',
+                        config['Upload']['background'])
+        config['Upload']['background'] = 'true'
+        self.display = DisplayMock()
+        self.buzzer = BuzzerMock()
+        self.recorder = AttendanceRecorder(self.display, ReaderMock(), ConnectionMock(),
+                                           self.buzzer, ButtonMock())
+        self.addCleanup(self.recorder._cache.close)
+
+    def test_result_is_signalized_once(self):
+        self.recorder._on_upload_result('f64dcf480d', {'msga': 'No recording', 'err': '1'})
+        self.assertEqual(['No recording', 'Ready to read a card.'], self.display.get_messages())
+        self.assertEqual([False], self.buzzer.beeps)
+
+    def test_acknowledged_card_not_queued(self):
+        self.recorder._cache.add_card(pack_card('f64dcf480d'))
+        self.recorder._cache.acknowledge([pack_card('f64dcf480d')])
+        self.recorder._read_card = lambda: 'f64dcf480d'
+        self.recorder._read_participant_card_background()
+        self.assertEqual(0, self.recorder._upload_queue.depth())
+        self.assertEqual(['Card was already read.', 'Ready to read a card.'],
+                         self.display.get_messages())
+        self.assertEqual([True], self.buzzer.beeps)
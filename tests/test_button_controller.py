@@ -0,0 +1,82 @@
+from src.attendance.button_controller import ButtonController
+from src.attendance.button_controller import ButtonEventKind
+from src.attendance.gpio_simulator import SimulatedGPIO
+from src.attendance.resources.config import config
+
+from threading import Thread
+from unittest import TestCase
+
+import time
+
+
+class TestButtonController(TestCase):
+
+    def setUp(self):
+        self.gpio = SimulatedGPIO()
+        self.controller = ButtonController(self.gpio)
+        self.pin = int(config['Button']['in_pin'])
+        self.debounce = float(config['Button']['debounce'])
+
+    def tearDown(self):
+        self.controller.close()
+
+    def bounce(self, level, edges=5):
+        # Contacts bounce for a few milliseconds before the level settles
+        for index in range(edges):
+            self.gpio.set_input(self.pin, level if index % 2 == 0 else 1 - level)
+            time.sleep(0.001)
+        self.gpio.set_input(self.pin, level)
+
+    def press(self, hold=0.05):
+        self.bounce(SimulatedGPIO.HIGH)
+        time.sleep(hold)
+        self.bounce(SimulatedGPIO.LOW)
+
+    def test_bouncing_press_is_single_event(self):
+        self.press()
+        time.sleep(2 * self.debounce)
+        event = self.controller.get_event(0)
+        self.assertEqual(ButtonEventKind.PRESS, event.kind)
+        self.assertIsNone(self.controller.get_event(0.1))
+
+    def test_wait_for_press_latency(self):
+        pushed = []
+        Thread(target=lambda: (time.sleep(0.1), pushed.append(time.monotonic()),
+                               self.bounce(SimulatedGPIO.HIGH))).start()
+        self.assertTrue(self.controller.wait_for_press(2))
+        latency = time.monotonic() - pushed[0]
+        self.assertLess(latency, self.debounce + 0.03)
+        self.assertTrue(self.controller.is_pushed())
+
+    def test_wait_for_press_timeout(self):
+        start = time.monotonic()
+        self.assertFalse(self.controller.wait_for_press(0.1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertFalse(self.controller.wait_for_press(0))
+
+    def test_short_press_while_busy_not_missed(self):
+        self.press(hold=0.03)
+        time.sleep(0.2)
+        self.assertFalse(self.controller.is_pushed())
+        self.assertTrue(self.controller.wait_for_press(0))
+
+    def test_long_press(self):
+        self.controller._long_press = 0.2
+        self.bounce(SimulatedGPIO.HIGH)
+        self.assertEqual(ButtonEventKind.PRESS, self.controller.get_event(1).kind)
+        event = self.controller.get_event(1)
+        self.assertEqual(ButtonEventKind.LONG_PRESS, event.kind)
+        self.assertGreaterEqual(time.monotonic() - event.time, 0.2)
+        self.bounce(SimulatedGPIO.LOW)
+        self.assertIsNone(self.controller.get_event(0.1))
+
+    def test_short_press_is_not_long(self):
+        self.controller._long_press = 0.2
+        self.press()
+        time.sleep(0.3)
+        self.assertEqual(ButtonEventKind.PRESS, self.controller.get_event(0).kind)
+        self.assertIsNone(self.controller.get_event(0))
+
+    def test_close_releases_waiting(self):
+        Thread(target=lambda: (time.sleep(0.1), self.controller.close())).start()
+        self.assertFalse(self.controller.wait_for_press())
@@ -0,0 +1,81 @@
+from src.attendance.buzzer import Buzzer
+from src.attendance.buzzer import CORRECT_PATTERN
+from src.attendance.buzzer import INCORRECT_PATTERN
+from src.attendance.buzzer import Tone
+from src.attendance.gpio_simulator import SimulatedGPIO
+from src.attendance.resources.config import config
+
+from unittest import TestCase
+
+import time
+
+
+class TestBuzzer(TestCase):
+
+    def setUp(self):
+        self.gpio = SimulatedGPIO()
+        self.buzzer = Buzzer(self.gpio, queue_size=2)
+        self.pin = int(config['Buzzer']['pin'])
+
+    def tearDown(self):
+        self.buzzer.close()
+
+    def tones(self):
+        # Pairs of frequency and duration of the played tones
+        events = self.gpio.get_events(self.pin)
+        tones = []
+        for start, stop in zip(events, events[1:]):
+            if start.kind == 'pwm_start' and stop.kind == 'pwm_stop':
+                tones.append((start.value, stop.time - start.time))
+        return tones
+
+    def test_beep_does_not_block(self):
+        start = time.monotonic()
+        self.buzzer.beep(False)
+        self.buzzer.beep(True)
+        self.assertLess(time.monotonic() - start, 0.01)
+
+    def test_correct_pattern(self):
+        self.buzzer.beep(True)
+        self.assertTrue(self.buzzer.wait_idle(2))
+        tones = self.tones()
+        self.assertEqual(1, len(tones))
+        frequency, duration = tones[0]
+        self.assertEqual(CORRECT_PATTERN[0].frequency, frequency)
+        self.assertAlmostEqual(CORRECT_PATTERN[0].duration, duration, delta=0.05)
+
+    def test_incorrect_pattern(self):
+        start = time.monotonic()
+        self.buzzer.beep(False)
+        self.assertTrue(self.buzzer.wait_idle(3))
+        self.assertEqual([INCORRECT_PATTERN[0].frequency] * 2,
+                         [frequency for frequency, _ in self.tones()])
+        total = sum(tone.duration for tone in INCORRECT_PATTERN)
+        self.assertAlmostEqual(total, time.monotonic() - start, delta=0.1)
+
+    def test_same_patterns_coalesced(self):
+        self.buzzer.play((Tone(0, 0.2),))
+        time.sleep(0.05)
+        for _ in range(5):
+            self.buzzer.beep(True)
+        self.assertTrue(self.buzzer.wait_idle(2))
+        self.assertEqual(1, len(self.tones()))
+        self.assertEqual(4, self.buzzer.get_stats()['coalesced'])
+
+    def test_oldest_dropped_when_full(self):
+        self.buzzer.play((Tone(0, 0.2),))
+        time.sleep(0.05)
+        self.buzzer.play((Tone(500, 0.01),))
+        self.buzzer.play((Tone(600, 0.01),))
+        self.buzzer.play((Tone(700, 0.01),))
+        self.assertTrue(self.buzzer.wait_idle(2))
+        self.assertEqual([600, 700], [frequency for frequency, _ in self.tones()])
+        self.assertEqual(1, self.buzzer.get_stats()['dropped'])
+
+    def test_close_cuts_off_sound(self):
+        self.buzzer.play((Tone(1000, 5),))
+        time.sleep(0.05)
+        start = time.monotonic()
+        self.buzzer.close()
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual('pwm_stop', self.gpio.get_events(self.pin)[-1].kind)
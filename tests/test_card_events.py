@@ -0,0 +1,97 @@
+from src.attendance.card_events import CardEventStream
+from src.attendance.card_events import OverflowPolicy
+from src.attendance.card_reader import ICardReader
+from src.attendance.card_reader import InvalidDataException
+from src.attendance.card_reader import ReadCancelledException
+
+from threading import Event
+from unittest import TestCase
+
+import time
+
+
+class ReaderMock(ICardReader):
+
+    def __init__(self, cards):
+        self._cards = list(cards)
+        self._cancelled = Event()
+
+    def read_card(self, raise_if_no_data=False):
+        if not self._cards:
+            self._cancelled.wait()
+            self._cancelled.clear()
+            raise ReadCancelledException('Cancelled.')
+        card = self._cards.pop(0)
+        if card is None:
+            raise InvalidDataException('Invalid.')
+        return card
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+class TestCardEventStream(TestCase):
+
+    def create_stream(self, cards, **kwargs):
+        stream = ReaderMock(cards).stream(**kwargs)
+        stream.start()
+        self.addCleanup(stream.stop, 1)
+        return stream
+
+    def wait_for_reads(self, stream, count):
+        while stream.get_stats()['received'] < count:
+            time.sleep(0.01)
+
+    def test_events_in_order(self):
+        stream = self.create_stream(['0000000001', None, '0000000002'])
+        events = [stream.get(1) for _ in range(3)]
+        self.assertEqual([event.card for event in events], ['0000000001', None, '0000000002'])
+        self.assertLessEqual(events[0].received, events[2].received)
+        self.assertIsNone(stream.get(0.05))
+
+    def test_debounce(self):
+        stream = self.create_stream(['0000000001', '0000000001', '0000000002', '0000000001'],
+                                    debounce=10)
+        self.wait_for_reads(stream, 4)
+        stream.stop(1)
+        self.assertEqual([event.card for event in stream], ['0000000001', '0000000002'])
+        self.assertEqual(stream.get_stats()['debounced'], 2)
+
+    def test_discard_before(self):
+        stream = self.create_stream(['0000000001', '0000000002'])
+        self.wait_for_reads(stream, 2)
+        now = time.monotonic()
+        self.assertEqual(2, stream.discard_before(now))
+        self.assertEqual(0, stream.depth())
+        self.assertEqual(0, stream.discard_before(now))
+
+    def test_drop_oldest(self):
+        cards = ['{0:010x}'.format(i) for i in range(5)]
+        stream = self.create_stream(cards, maxsize=2, overflow='drop_oldest')
+        self.wait_for_reads(stream, 5)
+        stream.stop(1)
+        self.assertEqual([event.card for event in stream], cards[3:])
+        self.assertEqual(stream.get_stats()['dropped'], 3)
+
+    def test_drop_newest(self):
+        cards = ['{0:010x}'.format(i) for i in range(5)]
+        stream = self.create_stream(cards, maxsize=2, overflow='drop_newest')
+        self.wait_for_reads(stream, 5)
+        stream.stop(1)
+        self.assertEqual([event.card for event in stream], cards[:2])
+
+    def test_block(self):
+        cards = ['{0:010x}'.format(i) for i in range(5)]
+        stream = self.create_stream(cards, maxsize=2, overflow='block')
+        self.wait_for_reads(stream, 3)
+        time.sleep(0.05)
+        self.assertEqual(stream.get_stats()['received'], 3)
+        self.assertEqual([stream.get(1).card for _ in range(5)], cards)
+        self.assertEqual(stream.get_stats()['dropped'], 0)
+
+    def test_stop_cancels_read(self):
+        stream = CardEventStream(ReaderMock([]), overflow=OverflowPolicy.DROP_OLDEST)
+        stream.start()
+        stream.stop(1)
+        self.assertFalse(stream._worker.is_alive())
+        self.assertEqual(list(stream), [])
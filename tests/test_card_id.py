@@ -0,0 +1,61 @@
+from src.attendance.card_id import CardSet
+from src.attendance.card_id import format_card
+from src.attendance.card_id import is_valid_card
+from src.attendance.card_id import pack_card
+from src.attendance.card_id import parse_card
+from src.attendance.utils import reverse_endianness
+
+from unittest import TestCase
+
+
+class TestCardId(TestCase):
+
+    def test_pack_format(self):
+        self.assertEqual(pack_card('0cb90021f6'), 0x0cb90021f6)
+        self.assertEqual(format_card(0x0cb90021f6), '0cb90021f6')
+        self.assertEqual(format_card(pack_card('0000000001')), '0000000001')
+
+    def test_validation(self):
+        self.assertTrue(is_valid_card('f8a400ca45'))
+        self.assertTrue(is_valid_card(0xffffffffff))
+        self.assertFalse(is_valid_card('F8A400CA45'))
+        self.assertFalse(is_valid_card('f8a400ca4'))
+        self.assertFalse(is_valid_card('f8a400ca4g'))
+        self.assertFalse(is_valid_card(1 << 40))
+        self.assertFalse(is_valid_card(-1))
+        with self.assertRaises(ValueError):
+            pack_card('f8a400ca4')
+
+    def test_parse_reader_data(self):
+        self.assertEqual(parse_card(b'0CB90021F6'), 0x0cb90021f6)
+        self.assertIsNone(parse_card(b'0CB90021'))
+        self.assertIsNone(parse_card(b'0CB90021\x03\x02'))
+
+    def test_reverse_endianness_packed(self):
+        for card in ['0cb90021f6', 'f8a400ca45', '0123456789', 'fedcba9876']:
+            self.assertEqual(format_card(reverse_endianness(pack_card(card))),
+                             reverse_endianness(card))
+
+
+class TestCardSet(TestCase):
+
+    def test_set_operations(self):
+        cards = CardSet(['f8a400ca45', '0cb90021f6'])
+        self.assertEqual(len(cards), 2)
+        self.assertIn('0cb90021f6', cards)
+        self.assertIn(0xf8a400ca45, cards)
+        self.assertNotIn('f64dcf480d', cards)
+        self.assertTrue(cards.add('f64dcf480d'))
+        self.assertFalse(cards.add(0xf64dcf480d))
+        self.assertEqual([format_card(card) for card in cards],
+                         ['0cb90021f6', 'f64dcf480d', 'f8a400ca45'])
+        self.assertTrue(cards.discard('0cb90021f6'))
+        self.assertFalse(cards.discard('0cb90021f6'))
+        self.assertEqual(len(cards), 2)
+
+    def test_compact_storage(self):
+        cards = CardSet(range(0, 100000 * 7919, 7919))
+        self.assertEqual(len(cards), 100000)
+        self.assertEqual(cards.nbytes(), 500000)
+        self.assertIn(7919 * 4242, cards)
+        self.assertNotIn(7919 * 4242 + 1, cards)
@@ -0,0 +1,170 @@
+from src.attendance.card_reader import CardReader
+from src.attendance.card_reader import InvalidDataException
+from src.attendance.card_reader import MultiCardReader
+from src.attendance.card_reader import NoDataException
+from src.attendance.card_reader import ReadCancelledException
+
+from .test_frame_parser import FRAME
+from .test_frame_parser import OTHER_FRAME
+
+from io import BytesIO
+from threading import Thread
+from threading import Timer
+from unittest import skipUnless
+from unittest import TestCase
+
+import os
+import serial
+import sys
+import time
+
+
+class TestCardReader(TestCase):
+
+    def test_read_cards(self):
+        reader = CardReader(BytesIO(FRAME + OTHER_FRAME))
+        self.assertEqual(reader.read_card(True), '03d90048f6')
+        self.assertEqual(reader.read_card(True), 'f15200352a')
+        with self.assertRaises(NoDataException):
+            reader.read_card(True)
+
+    def test_held_card_read_once(self):
+        reader = CardReader(BytesIO(FRAME * 5 + OTHER_FRAME))
+        self.assertEqual(reader.read_card(True), '03d90048f6')
+        self.assertEqual(reader.read_card(True), 'f15200352a')
+
+    def test_incomplete_frame(self):
+        reader = CardReader(BytesIO(FRAME[:6]))
+        with self.assertRaises(InvalidDataException):
+            reader.read_card(True)
+        with self.assertRaises(NoDataException):
+            reader.read_card(True)
+
+    def test_corrupted_frame(self):
+        reader = CardReader(BytesIO(b'\x02XXXXXXXXXX\x03' + FRAME))
+        with self.assertRaises(InvalidDataException):
+            reader.read_card(True)
+        self.assertEqual(reader.read_card(True), '03d90048f6')
+
+
+@skipUnless(sys.platform.startswith('linux'), 'pty is needed')
+class TestCardReaderPty(TestCase):
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.slave = slave
+        self.reader = CardReader(serial.Serial(os.ttyname(slave), timeout=0.5))
+
+    def tearDown(self):
+        self.reader.close()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def write_later(self, data, delay):
+        def write():
+            time.sleep(delay)
+            self.written_at = time.monotonic()
+            os.write(self.master, data)
+        Thread(target=write).start()
+
+    def test_wakes_up_when_data_arrive(self):
+        self.write_later(FRAME, 0.7)
+        card = self.reader.read_card()
+        latency = time.monotonic() - self.written_at
+        self.assertEqual(card, '03d90048f6')
+        self.assertLess(latency, 0.1)
+
+    def test_frame_split_across_writes(self):
+        os.write(self.master, FRAME[:4])
+        self.write_later(FRAME[4:], 0.1)
+        self.assertEqual(self.reader.read_card(), '03d90048f6')
+
+    def test_no_data(self):
+        start = time.monotonic()
+        with self.assertRaises(NoDataException):
+            self.reader.read_card(True)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_cancel(self):
+        Timer(0.2, self.reader.cancel).start()
+        start = time.monotonic()
+        with self.assertRaises(ReadCancelledException):
+            self.reader.read_card()
+        self.assertLess(time.monotonic() - start, 0.5)
+        os.write(self.master, OTHER_FRAME)
+        self.assertEqual(self.reader.read_card(), 'f15200352a')
+
+
+@skipUnless(sys.platform.startswith('linux'), 'pty is needed')
+class TestMultiCardReader(TestCase):
+
+    def setUp(self):
+        self.ptys = [os.openpty() for _ in range(2)]
+        readers = [CardReader(serial.Serial(os.ttyname(slave), timeout=0.5), 'door{0}'.format(index))
+                   for index, (_, slave) in enumerate(self.ptys)]
+        self.reader = MultiCardReader(readers)
+
+    def tearDown(self):
+        self.reader.close()
+        for master, slave in self.ptys:
+            os.close(master)
+            os.close(slave)
+
+    def test_cards_tagged_with_source(self):
+        os.write(self.ptys[1][0], FRAME)
+        self.assertEqual(self.reader.read_card(), '03d90048f6')
+        self.assertEqual(self.reader.get_source(), 'door1')
+        os.write(self.ptys[0][0], OTHER_FRAME)
+        self.assertEqual(self.reader.read_card(), 'f15200352a')
+        self.assertEqual(self.reader.get_source(), 'door0')
+
+    def test_readers_take_turns(self):
+        os.write(self.ptys[0][0], FRAME + OTHER_FRAME)
+        os.write(self.ptys[1][0], OTHER_FRAME)
+        time.sleep(0.05)
+        sources = []
+        for _ in range(3):
+            self.reader.read_card()
+            sources.append(self.reader.get_source())
+        self.assertEqual(sorted(sources[:2]), ['door0', 'door1'])
+
+    def test_incomplete_frame(self):
+        os.write(self.ptys[0][0], FRAME[:5])
+        with self.assertRaises(InvalidDataException):
+            self.reader.read_card()
+        self.assertEqual(self.reader.get_source(), 'door0')
+        with self.assertRaises(NoDataException):
+            self.reader.read_card(True)
+
+    def test_cancel(self):
+        Timer(0.1, self.reader.cancel).start()
+        with self.assertRaises(ReadCancelledException):
+            self.reader.read_card()
+
+    def test_failed_reader_ignored(self):
+        def fail():
+            raise serial.SerialException('Port failed.')
+        self.reader._readers[0].receive = fail
+        os.write(self.ptys[0][0], FRAME)
+        os.write(self.ptys[1][0], OTHER_FRAME)
+        self.assertEqual(self.reader.read_card(), 'f15200352a')
+        self.assertEqual(self.reader.get_source(), 'door1')
+
+    def test_all_readers_failed(self):
+        def fail():
+            raise serial.SerialException('Port failed.')
+        for index, reader in enumerate(self.reader._readers):
+            reader.receive = fail
+            os.write(self.ptys[index][0], FRAME)
+        start = time.monotonic()
+        with self.assertRaises(serial.SerialException):
+            self.reader.read_card()
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_stream_events(self):
+        stream = self.reader.stream()
+        stream.start()
+        os.write(self.ptys[1][0], FRAME)
+        event = stream.get(1)
+        stream.stop(1)
+        self.assertEqual((event.card, event.source), ('03d90048f6', 'door1'))
@@ -0,0 +1,218 @@
+from src.attendance.card_id import CardSet
+from src.attendance.card_id import pack_card
+from src.attendance.card_store import JournalCardStore
+from src.attendance.ledger import SQLiteCardStore
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import json
+import time
+
+
+class TestJournalCardStore(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.snapshot_path = Path(self._dir.name, 'cache')
+        self.journal_path = Path(self._dir.name, 'cache.journal')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def create_store(self, commit_window=0.0, compact_threshold=500):
+        store = JournalCardStore(self.snapshot_path, self.journal_path,
+                                 commit_window, compact_threshold)
+        store.load()
+        return store
+
+    def test_replay(self):
+        store = self.create_store()
+        store.set_token('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        self.assertTrue(store.add_card(pack_card('0cb90021f6')))
+        self.assertFalse(store.add_card(pack_card('0cb90021f6')))
+        store.add_card(pack_card('f8a400ca45'))
+        store.close()
+
+        store = self.create_store()
+        self.assertEqual(store.get_token(), 'thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        self.assertEqual(store.get_cards(), CardSet(['0cb90021f6', 'f8a400ca45']))
+        store.close()
+
+    def test_invalid_card_in_snapshot(self):
+        with open(self.snapshot_path, 'w') as snapshot:
+            snapshot.write('{"token": null, "cards": ["0cb90021f6", "xyz", -1], '
+                           '"acknowledged": ["F8A400CA45", "f8a400ca45"]}')
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(['0cb90021f6']))
+        store.close()
+
+    def test_commit_thread_restarted_after_close(self):
+        store = self.create_store(commit_window=0.05)
+        store.close()
+        store.load()
+        self.assertIsNotNone(store._committer)
+        self.assertTrue(store._committer.is_alive())
+        store.add_card(pack_card('0cb90021f6'))
+        store.close()
+        self.assertIsNone(store._committer)
+
+    def test_one_record_per_card(self):
+        store = self.create_store()
+        for card in ['0cb90021f6', 'f8a400ca45', 'f64dcf480d']:
+            store.add_card(pack_card(card))
+        store.close()
+        with open(self.journal_path, 'rb') as journal:
+            self.assertEqual(len(journal.readlines()), 3)
+
+    def test_clear(self):
+        store = self.create_store()
+        store.add_card(pack_card('0cb90021f6'))
+        store.clear()
+        store.add_card(pack_card('f8a400ca45'))
+        store.close()
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(['f8a400ca45']))
+        store.close()
+
+    def test_torn_record_skipped(self):
+        store = self.create_store()
+        store.add_card(pack_card('0cb90021f6'))
+        store.close()
+        with open(self.journal_path, 'ab') as journal:
+            journal.write(b'{"op": "add", "card": "f8a4')
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(['0cb90021f6']))
+        store.add_card(pack_card('f64dcf480d'))
+        store.close()
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(['0cb90021f6', 'f64dcf480d']))
+        store.close()
+
+    def test_legacy_cache_file(self):
+        with open(self.snapshot_path, 'w', encoding='utf-8') as json_file:
+            json.dump({'token': 'EG7I52PehLKrWB9SzKibyNVAwFKbZKi0',
+                       'cards': ['0cb90021f6']}, json_file)
+
+        store = self.create_store()
+        self.assertEqual(store.get_token(), 'EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        self.assertEqual(store.get_cards(), CardSet(['0cb90021f6']))
+        store.close()
+
+    def test_group_commit(self):
+        store = self.create_store(commit_window=0.05)
+        store.add_card(pack_card('0cb90021f6'))
+        time.sleep(0.2)
+        self.assertIsNone(store._dirty_since)
+        store.close()
+
+    def test_compaction(self):
+        store = self.create_store(compact_threshold=3)
+        cards = ['{0:010x}'.format(i) for i in range(10)]
+        for card in cards:
+            store.add_card(pack_card(card))
+        store.close()
+
+        self.assertTrue(self.snapshot_path.exists())
+        with open(self.journal_path, 'rb') as journal:
+            self.assertLess(len(journal.readlines()), 3)
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(cards))
+        store.close()
+
+    def test_failed_compaction_records_kept(self):
+        store = self.create_store(compact_threshold=3)
+        # Process crashes after every rotation, before the snapshot is written
+        store._compact = lambda state: None
+        cards = ['{0:010x}'.format(i) for i in range(10)]
+        for card in cards:
+            store.add_card(pack_card(card))
+        self.assertFalse(self.snapshot_path.exists())
+        store._journal.close()
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(cards))
+        self.assertFalse(Path(str(self.journal_path) + '.compacting').exists())
+        store.close()
+
+    def test_crash_during_merge_replayed_once(self):
+        store = self.create_store()
+        store.set_token('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        store.add_card(pack_card('0cb90021f6'))
+        store.acknowledge([pack_card('0cb90021f6')])
+        store.add_card(pack_card('f8a400ca45'))
+        store.close()
+        # Journal was appended to the rotated journal, crash came before its removal
+        compacting_path = Path(str(self.journal_path) + '.compacting')
+        compacting_path.write_bytes(self.journal_path.read_bytes())
+
+        store = self.create_store()
+        self.assertEqual(store.get_cards(), CardSet(['f8a400ca45']))
+        self.assertEqual(store.count_acknowledged(), 1)
+        store.close()
+
+
+class TestSQLiteCardStore(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.path = Path(self._dir.name, 'ledger.sqlite3')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def create_store(self):
+        store = SQLiteCardStore(self.path)
+        store.load()
+        return store
+
+    def test_wal_mode(self):
+        store = self.create_store()
+        mode = store._db.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+        store.close()
+
+    def test_dedup_per_session(self):
+        store = self.create_store()
+        store.start_session('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        self.assertTrue(store.add_card(pack_card('0cb90021f6')))
+        self.assertFalse(store.add_card(pack_card('0cb90021f6')))
+        store.start_session('EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        self.assertTrue(store.add_card(pack_card('0cb90021f6')))
+        store.close()
+
+    def test_pending_per_session(self):
+        store = self.create_store()
+        store.start_session('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        store.add_card(pack_card('0cb90021f6'))
+        store.add_card(pack_card('f8a400ca45'))
+        store.start_session('EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        store.add_card(pack_card('f64dcf480d'))
+        store.set_token('EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        store.close()
+
+        store = self.create_store()
+        self.assertEqual(store.get_session(), 'EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        self.assertEqual(store.get_token(), 'EG7I52PehLKrWB9SzKibyNVAwFKbZKi0')
+        self.assertEqual(store.get_cards(), CardSet(['f64dcf480d']))
+        self.assertEqual(store.get_pending('thXtKt_2q7T77PsWD3hLJT34xCexmsaY'),
+                         CardSet(['0cb90021f6', 'f8a400ca45']))
+        store.clear()
+        self.assertEqual(store.get_cards(), CardSet([]))
+        self.assertEqual(store.count_pending(), 2)
+        store.close()
+
+    def test_acknowledge(self):
+        store = self.create_store()
+        store.start_session('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        store.add_card(pack_card('0cb90021f6'))
+        store.acknowledge([pack_card('0cb90021f6'), pack_card('f8a400ca45')])
+        self.assertEqual(store.get_cards(), CardSet())
+        self.assertEqual(store.count_acknowledged(), 2)
+        self.assertFalse(store.add_card(pack_card('f8a400ca45')))
+        store.close()
@@ -0,0 +1,94 @@
+from src.attendance.api_connection import CircuitOpenException
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.circuit_breaker import CircuitBreaker
+from src.attendance.circuit_breaker import CircuitState
+
+from threading import Event
+from unittest import TestCase
+
+import time
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        self.transitions = []
+        self.breaker.add_listener(lambda old, new: self.transitions.append((old, new)))
+
+    def tearDown(self):
+        self.breaker.close()
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state(), CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.transitions, [(CircuitState.CLOSED, CircuitState.OPEN)])
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state(), CircuitState.CLOSED)
+
+    def test_half_open_trial_request(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.2)
+        self.assertEqual(self.breaker.get_state(), CircuitState.HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.get_state(), CircuitState.CLOSED)
+        self.assertEqual(self.breaker.get_stats()['transitions'], {
+            'closed->open': 1, 'open->half-open': 1, 'half-open->closed': 1})
+        self.assertEqual(self.breaker.get_stats()['rejected'], 1)
+
+    def test_failed_trial_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.2)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.get_state(), CircuitState.OPEN)
+
+    def test_probe_closes(self):
+        available = Event()
+        closed = Event()
+        self.breaker.set_probe(available.is_set)
+        self.breaker.add_listener(lambda old, new: new == CircuitState.CLOSED and closed.set())
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.get_state(), CircuitState.OPEN)
+        available.set()
+        self.assertTrue(closed.wait(1))
+        self.assertTrue(self.breaker.allow_request())
+
+
+class TestISConnectionCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        builder.set_circuit_breaker(self.breaker)
+        self.connection = builder.build()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_rejects_without_network(self):
+        for _ in range(2):
+            with self.assertRaises(Exception) as context:
+                self.connection.send_data('f8a400ca45')
+            self.assertNotIsInstance(context.exception, CircuitOpenException)
+        start = time.monotonic()
+        with self.assertRaises(CircuitOpenException):
+            self.connection.send_data('f8a400ca45')
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertIs(self.connection.get_circuit_breaker(), self.breaker)
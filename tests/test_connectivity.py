@@ -0,0 +1,177 @@
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.connectivity import ConnectivityMonitor
+from src.attendance.connectivity import ILinkWatcher
+from src.attendance.connectivity import NetlinkWatcher
+from src.attendance.connectivity import SysfsLinkWatcher
+
+from tempfile import TemporaryDirectory
+from threading import Event
+from unittest import skipUnless
+from unittest import TestCase
+
+import os
+import socket
+import struct
+import time
+
+
+class ManualWatcher(ILinkWatcher):
+
+    def start(self, callback):
+        self.callback = callback
+
+
+class TestConnectivityMonitor(TestCase):
+
+    def setUp(self):
+        self.available = Event()
+        self.probes = 0
+        self.watcher = ManualWatcher()
+
+    def probe(self):
+        self.probes += 1
+        return self.available.is_set()
+
+    def create_monitor(self, **kwargs):
+        monitor = ConnectivityMonitor('http://127.0.0.1:5000', watcher=self.watcher,
+                                      probe=self.probe, **kwargs)
+        self.addCleanup(monitor.close)
+        return monitor
+
+    def test_state_is_cached(self):
+        self.available.set()
+        monitor = self.create_monitor()
+        self.assertTrue(monitor.wait_until_available(1))
+        for _ in range(100):
+            self.assertTrue(monitor.is_available())
+        self.assertEqual(1, self.probes)
+
+    def test_is_available_does_not_wait(self):
+        started = Event()
+        release = Event()
+
+        def slow_probe():
+            started.set()
+            release.wait()
+            return True
+        monitor = ConnectivityMonitor('http://127.0.0.1:5000', watcher=self.watcher,
+                                      probe=slow_probe)
+        self.addCleanup(monitor.close)
+        self.addCleanup(release.set)
+        started.wait(1)
+        start = time.monotonic()
+        self.assertFalse(monitor.is_available())
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_unavailable_state_expires(self):
+        monitor = self.create_monitor(retry_interval=0.1)
+        self.assertFalse(monitor.wait_until_available(0.05))
+        self.available.set()
+        start = time.monotonic()
+        self.assertTrue(monitor.wait_until_available(1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+        self.assertEqual(2, self.probes)
+
+    def test_network_change_probes(self):
+        monitor = self.create_monitor()
+        monitor.wait_until_available(0.05)
+        self.available.set()
+        self.assertFalse(monitor.is_available())
+        self.watcher.callback()
+        self.assertTrue(monitor.wait_until_available(1))
+        self.assertEqual(1, monitor.get_stats()['network_changes'])
+
+    def test_network_change_notifies_listeners(self):
+        monitor = self.create_monitor()
+        changes = []
+        monitor.add_listener(lambda: changes.append(1))
+        monitor.add_listener(lambda: 1 / 0)
+        monitor.add_listener(lambda: changes.append(2))
+        self.watcher.callback()
+        self.assertEqual([1, 2], changes)
+
+    def test_report(self):
+        monitor = self.create_monitor()
+        monitor.wait_until_available(0.05)
+        monitor.report(True)
+        self.assertTrue(monitor.is_available())
+        self.assertEqual(1, self.probes)
+        self.assertEqual(1, monitor.get_stats()['reports'])
+
+    def test_tcp_probe(self):
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+        monitor = ConnectivityMonitor('http://127.0.0.1:{0}'.format(port), watcher=self.watcher)
+        self.addCleanup(monitor.close)
+        self.assertTrue(monitor.wait_until_available(1))
+        server.close()
+        monitor.invalidate()
+        time.sleep(0.1)
+        self.assertFalse(monitor.is_available())
+
+    def test_connection_uses_cached_state(self):
+        self.available.set()
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:1')
+        builder.set_url('http://127.0.0.1:1/testonline')
+        builder.set_connectivity_monitor(self.create_monitor())
+        connection = builder.build()
+        self.addCleanup(connection.close)
+        self.assertTrue(connection.wait_until_available(1))
+        self.assertTrue(connection.is_available())
+
+    def test_network_change_rebuilds_pool(self):
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:1')
+        builder.set_url('http://127.0.0.1:1/testonline')
+        builder.set_connectivity_monitor(self.create_monitor())
+        connection = builder.build()
+        self.addCleanup(connection.close)
+        session = connection._session
+        self.watcher.callback()
+        self.assertIsNot(session, connection._session)
+
+
+class TestLinkWatchers(TestCase):
+
+    def test_sysfs_change(self):
+        with TemporaryDirectory() as folder:
+            for interface in ('lo', 'eth0'):
+                os.mkdir(os.path.join(folder, interface))
+                with open(os.path.join(folder, interface, 'operstate'), 'w') as file:
+                    file.write('up\n')
+            changes = []
+            watcher = SysfsLinkWatcher(folder)
+            watcher.start(lambda: changes.append(1))
+            watcher.check()
+            self.assertEqual([], changes)
+            with open(os.path.join(folder, 'lo', 'operstate'), 'w') as file:
+                file.write('down\n')
+            watcher.check()
+            self.assertEqual([], changes)
+            with open(os.path.join(folder, 'eth0', 'operstate'), 'w') as file:
+                file.write('down\n')
+            watcher.check()
+            watcher.check()
+            self.assertEqual([1], changes)
+
+    def test_parse_netlink_types(self):
+        # RTM_NEWLINK with 2 bytes of payload padded to 4, then RTM_NEWROUTE without payload
+        data = struct.pack('=LHHLL', 18, 16, 0, 0, 0) + b'\0\0\0\0' + struct.pack('=LHHLL', 16, 24, 0, 0, 0)
+        self.assertEqual([16, 24], NetlinkWatcher.parse_types(data))
+        self.assertEqual([], NetlinkWatcher.parse_types(b'\0' * 8))
+
+    @skipUnless(hasattr(socket, 'AF_NETLINK'), 'netlink is available on Linux only')
+    def test_netlink_close(self):
+        try:
+            watcher = NetlinkWatcher()
+        except OSError as e:
+            self.skipTest('netlink socket can not be opened: {0}'.format(e))
+        watcher.start(lambda: None)
+        watcher.close()
+        self.assertFalse(watcher._thread.is_alive())
@@ -0,0 +1,207 @@
+from src.attendance.display import OLEDdisplay
+from src.attendance.display import Priority
+from src.attendance.lru_cache import LRUCache
+
+from luma.core.device import dummy
+from PIL import Image
+from PIL import ImageDraw
+from threading import Lock
+from threading import Thread
+from unittest import TestCase
+
+import time
+
+
+class RecordingDevice(dummy):
+
+    def __init__(self):
+        super().__init__(width=128, height=64, mode='1')
+        self._lock = Lock()
+        self.frames = []
+
+    def display(self, image):
+        super().display(image)
+        with self._lock:
+            self.frames.append((time.monotonic(), image.tobytes()))
+
+
+class TestOLEDdisplay(TestCase):
+
+    def setUp(self):
+        self.device = RecordingDevice()
+        self.display = OLEDdisplay(self.device)
+
+    def tearDown(self):
+        self.display.close()
+
+    def wait_for_message(self, msga, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = self.display._current
+            if current is not None and current.msga == msga:
+                return time.monotonic()
+            time.sleep(0.005)
+        self.fail('{0} was not displayed.'.format(msga))
+
+    def test_show_renders_frames(self):
+        self.display.show('Ready to read a card.')
+        self.wait_for_message('Ready to read a card.')
+        time.sleep(0.2)
+        self.assertGreater(len(self.device.frames), 2)
+        self.assertTrue(any(any(frame) for _, frame in self.device.frames))
+
+    def test_show_is_non_blocking(self):
+        start = time.monotonic()
+        for index in range(20):
+            self.display.show('Message {0}'.format(index), can_be_killed=False)
+        self.assertLess(time.monotonic() - start, 0.05)
+
+    def test_killable_message_replaced(self):
+        self.display.show('first')
+        self.wait_for_message('first')
+        self.display.show('second')
+        self.wait_for_message('second', 0.2)
+
+    def test_min_duration(self):
+        self.display.show('first', min_duration=0.3)
+        shown = self.wait_for_message('first')
+        self.display.show('second')
+        switched = self.wait_for_message('second')
+        self.assertGreaterEqual(switched - shown, 0.25)
+
+    def test_whole_pass(self):
+        text = 'A long message which has to be scrolled through whole.'
+        self.display.show(text, can_be_killed=False)
+        shown = self.wait_for_message(text)
+        self.display.show('second')
+        switched = self.wait_for_message('second', 5)
+        width = self.display._get_text_width(text)
+        passes = width // OLEDdisplay.SCROLL_STEP
+        self.assertGreaterEqual(switched - shown, (passes - 1) * OLEDdisplay.FRAME_INTERVAL)
+
+    def test_priority_preempts(self):
+        self.display.show('first', min_duration=5)
+        self.wait_for_message('first')
+        self.display.show('urgent', priority=Priority.HIGH)
+        self.wait_for_message('urgent', 0.2)
+
+    def test_pending_killable_messages_coalesced(self):
+        self.display.show('first', min_duration=0.2)
+        self.wait_for_message('first')
+        self.display.show('second')
+        self.display.show('third')
+        self.assertEqual([message.msga for message in self.display._pending], ['third'])
+        self.wait_for_message('third')
+
+    def test_pending_protected_messages_superseded(self):
+        self.display.show('first', min_duration=0.2)
+        self.wait_for_message('first')
+        for index in range(5):
+            self.display.show('Result {0}'.format(index), can_be_killed=False)
+            self.display.show('Ready to read a card.')
+        self.display.show('Result 4', can_be_killed=False)
+        self.assertEqual([message.msga for message in self.display._pending], ['Result 4'])
+        self.display.show('Ready to read a card.')
+        self.assertEqual([message.msga for message in self.display._pending],
+                         ['Result 4', 'Ready to read a card.'])
+        self.wait_for_message('Result 4')
+
+    def test_duplicate_ignored(self):
+        self.display.show('first')
+        self.wait_for_message('first')
+        self.display.show('first')
+        self.assertEqual(self.display._pending, [])
+
+    def test_min_duration_deadline(self):
+        self.display.show('first', min_duration=0.3)
+        self.wait_for_message('first')
+        shown = time.monotonic()
+        self.display.show('second')
+        switched = self.wait_for_message('second')
+        # Switch is driven by the deadline, not by the next frame
+        self.assertLess(switched - shown, 0.3 + OLEDdisplay.FRAME_INTERVAL / 2)
+
+    def test_block_until_done(self):
+        start = time.monotonic()
+        self.display.show('first', min_duration=0.3, block=True)
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 0.3 + OLEDdisplay.FRAME_INTERVAL / 2)
+
+    def test_block_whole_pass(self):
+        text = 'A long message which has to be scrolled through whole.'
+        self.display.show(text, can_be_killed=False, block=True)
+        self.assertIs(self.display._done, self.display._current)
+        self.assertEqual(text, self.display._current.msga)
+
+    def test_block_released_when_replaced(self):
+        self.display.show('first', min_duration=5)
+        self.wait_for_message('first')
+        Thread(target=lambda: (time.sleep(0.1),
+                               self.display.show('urgent', priority=Priority.HIGH))).start()
+        start = time.monotonic()
+        self.display.show('second', block=True)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_block_released_by_close(self):
+        self.display.show('first', min_duration=5)
+        Thread(target=lambda: (time.sleep(0.1), self.display.close())).start()
+        start = time.monotonic()
+        self.display.show('first', block=True)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_close(self):
+        self.display.show('first')
+        self.wait_for_message('first')
+        self.display.close()
+        self.assertFalse(self.display._worker.is_alive())
+
+    def draw_frame(self, msga, msgb, offset):
+        # Rendering of the frame without the strip
+        image = Image.new('1', (128, 64))
+        draw = ImageDraw.Draw(image)
+        font = self.display.FONT
+        text_width = max(self.display._get_text_width(msga), self.display._get_text_width(msgb))
+        snd_line_offset = 2 * self.display._get_text_height(msga)
+        second_offset = max(text_width, 128) + 10
+        for left in (-offset, second_offset - offset):
+            draw.text((left, 0), msga, font=font, fill=255)
+            draw.text((left, snd_line_offset), msgb, font=font, fill=255)
+        return image.tobytes()
+
+    def test_strip_frames_match_drawn_frames(self):
+        self.display.close()
+        msga, msgb = 'Card was saved and will be send later.', 'Sofia Chadwick'
+        text_width = self.display._get_text_width(msga)
+        for offset in range(0, text_width, OLEDdisplay.SCROLL_STEP):
+            self.device.frames.clear()
+            self.display._render(msga, msgb, offset)
+            self.assertEqual(self.device.frames[0][1], self.draw_frame(msga, msgb, offset))
+
+    def test_strips_cached(self):
+        self.display.close()
+        for _ in range(3):
+            self.display._render('Ready to read a card.', '', 0)
+            self.display._render('Please push the button to start.', '', 0)
+        stats = self.display._strips.get_stats()
+        self.assertEqual((stats['values'], stats['misses'], stats['hits']), (2, 2, 4))
+
+
+class TestLRUCache(TestCase):
+
+    def test_least_recently_used_dropped(self):
+        cache = LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: None)
+        cache.get('c', lambda: 3)
+        self.assertEqual(cache.get('a', lambda: None), 1)
+        self.assertIsNone(cache.get('b', lambda: None))
+
+    def test_size_of_values(self):
+        cache = LRUCache(10, len)
+        cache.get('a', lambda: 'x' * 6)
+        cache.get('b', lambda: 'x' * 6)
+        self.assertEqual(len(cache), 1)
+        cache.get('c', lambda: 'x' * 20)
+        self.assertEqual(cache.get_stats()['size'], 20)
@@ -0,0 +1,93 @@
+from src.attendance.display import OLEDdisplay
+from src.attendance.display_device import DiffingSH1106
+from src.attendance.display_device import SimulatedSerialInterface
+
+from luma.oled.device import sh1106
+from PIL import Image
+from PIL import ImageDraw
+from random import Random
+from unittest import TestCase
+
+import time
+
+
+def random_image(random, size=(128, 64)):
+    image = Image.new('1', size)
+    draw = ImageDraw.Draw(image)
+    for _ in range(random.randint(0, 5)):
+        x = random.randrange(size[0])
+        y = random.randrange(size[1])
+        draw.rectangle((x, y, x + random.randrange(40), y + random.randrange(20)), fill='white')
+    return image
+
+
+class TestDiffingSH1106(TestCase):
+
+    def setUp(self):
+        self.serial = SimulatedSerialInterface()
+        self.device = DiffingSH1106(self.serial)
+        self.reference_serial = SimulatedSerialInterface()
+        self.reference = sh1106(self.reference_serial)
+
+    def assert_same_ram(self):
+        self.assertEqual(self.serial.ram, self.reference_serial.ram)
+
+    def test_display_ram_matches_full_frames(self):
+        random = Random(7)
+        for _ in range(50):
+            image = random_image(random)
+            self.device.display(image)
+            self.reference.display(image)
+            self.assert_same_ram()
+
+    def test_rotated_display_ram_matches_full_frames(self):
+        self.device = DiffingSH1106(self.serial, rotate=2)
+        self.reference = sh1106(self.reference_serial, rotate=2)
+        random = Random(11)
+        for _ in range(20):
+            image = random_image(random)
+            self.device.display(image)
+            self.reference.display(image)
+            self.assert_same_ram()
+
+    def test_unchanged_frame_not_sent(self):
+        image = random_image(Random(3))
+        self.device.display(image)
+        sent = self.serial.bytes
+        self.device.display(image)
+        self.assertEqual(sent, self.serial.bytes)
+        self.assertEqual(0, self.device.get_stats()['last_frame_bytes'])
+
+    def test_only_changed_columns_sent(self):
+        image = Image.new('1', self.device.size)
+        self.device.display(image)
+        ImageDraw.Draw(image).point((40, 20), fill='white')
+        sent = self.serial.bytes
+        self.device.display(image)
+        # Page, column low and high nibble commands and one data byte
+        self.assertEqual(4, self.serial.bytes - sent)
+        self.assertEqual(0x10, self.serial.ram[2][40 + 2])
+
+    def test_stats(self):
+        stats = self.device.get_stats()
+        # Blank frame displayed by the constructor is sent whole
+        self.assertEqual(1, stats['frames'])
+        self.assertEqual(self.device.get_full_frame_bytes(), stats['bytes'])
+        self.assertEqual(8 * (3 + 128), stats['full_frame_bytes'])
+        self.device.display(Image.new('1', self.device.size))
+        stats = self.device.get_stats()
+        self.assertEqual(2, stats['frames'])
+        self.assertEqual(stats['full_frame_bytes'] / 2, stats['bytes_per_frame'])
+        self.assertGreaterEqual(stats['max_frame_time'], stats['frame_time'])
+
+    def test_scrolling_message_sends_less(self):
+        display = OLEDdisplay(self.device)
+        try:
+            display.show('A very long message which has to be scrolled.')
+            time.sleep(0.5)
+        finally:
+            display.close()
+        stats = self.device.get_stats()
+        self.assertGreater(stats['frames'], 2)
+        # Second line is blank and never sent again
+        self.assertLess(stats['bytes_per_frame'], stats['full_frame_bytes'] * 0.75)
@@ -0,0 +1,44 @@
+from src.attendance.frame_parser import FrameParser
+
+from unittest import TestCase
+
+FRAME = b'\x020CB90021F6C4\r\n\x03'
+OTHER_FRAME = b'\x02F8A400CA4510\r\n\x03'
+
+
+class TestFrameParser(TestCase):
+
+    def setUp(self):
+        self.parser = FrameParser()
+
+    def test_single_frame(self):
+        self.assertEqual(self.parser.feed(FRAME), [0x0cb90021f6])
+        self.assertFalse(self.parser.in_frame)
+
+    def test_frames_with_garbage(self):
+        data = b'\xff\x00garbage' + FRAME + b'\x03\x03' + OTHER_FRAME + b'xyz'
+        self.assertEqual(self.parser.feed(data), [0x0cb90021f6, 0xf8a400ca45])
+
+    def test_frame_split_to_chunks(self):
+        cards = []
+        for index in range(len(FRAME)):
+            cards += self.parser.feed(FRAME[index:index + 1])
+            if index == 5:
+                self.assertTrue(self.parser.in_frame)
+        self.assertEqual(cards, [0x0cb90021f6])
+
+    def test_card_returned_before_trailer(self):
+        self.assertEqual(self.parser.feed(FRAME[:11]), [0x0cb90021f6])
+        self.assertEqual(self.parser.feed(FRAME[11:]), [])
+
+    def test_corrupted_frame(self):
+        self.assertEqual(self.parser.feed(b'\x020CB9002XF6' + FRAME), [None, 0x0cb90021f6])
+
+    def test_interrupted_frame(self):
+        self.assertEqual(self.parser.feed(b'\x020CB9' + FRAME), [None, 0x0cb90021f6])
+
+    def test_reset(self):
+        self.parser.feed(FRAME[:5])
+        self.parser.reset()
+        self.assertFalse(self.parser.in_frame)
+        self.assertEqual(self.parser.feed(FRAME[5:]), [])
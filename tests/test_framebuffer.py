@@ -0,0 +1,111 @@
+from src.attendance.display import OLEDdisplay
+from src.attendance.display_device import DiffingSH1106
+from src.attendance.display_device import SimulatedSerialInterface
+from tests.test_display import RecordingDevice
+from tests.test_display_device import random_image
+
+from importlib.util import find_spec
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+from random import Random
+from unittest import skipUnless
+from unittest import TestCase
+
+import time
+
+if find_spec('numpy') is not None:
+    from src.attendance.framebuffer import GlyphAtlas
+    from src.attendance.framebuffer import NumpyFramebuffer
+    from src.attendance.framebuffer import pack_pages
+    from src.attendance.framebuffer import pages_to_image
+    from src.attendance.framebuffer import unpack_pages
+
+    import numpy
+
+FONT = 'src/attendance/resources/RobotoMono.ttf'
+
+
+@skipUnless(find_spec('numpy'), 'NumPy is not installed')
+class TestFramebuffer(TestCase):
+
+    def setUp(self):
+        self.font = ImageFont.truetype(FONT, 14)
+
+    def test_pages_match_display_ram_layout(self):
+        device = DiffingSH1106(SimulatedSerialInterface())
+        random = Random(5)
+        for _ in range(10):
+            image = random_image(random)
+            pages = pack_pages(numpy.array(image, dtype=bool))
+            self.assertEqual(device._to_pages(image), [page.tobytes() for page in pages])
+
+    def test_unpack_reverses_pack(self):
+        image = random_image(Random(9))
+        frame = numpy.array(image, dtype=bool)
+        numpy.testing.assert_array_equal(frame, unpack_pages(pack_pages(frame)))
+        self.assertEqual(image.tobytes(), pages_to_image(pack_pages(frame)).tobytes())
+
+    def test_glyph_matches_pil(self):
+        atlas = GlyphAtlas(self.font)
+        for char in 'A0g#':
+            image = Image.new('1', (atlas.advance, atlas.height))
+            ImageDraw.Draw(image).text((0, 0), char, font=self.font, fill=255)
+            numpy.testing.assert_array_equal(numpy.array(image, dtype=bool), atlas.render(char))
+
+    def test_text_rendered_from_cells(self):
+        atlas = GlyphAtlas(self.font)
+        line = atlas.render('ab a')
+        self.assertEqual(atlas.measure('ab a'), line.shape[::-1])
+        numpy.testing.assert_array_equal(line[:, :atlas.advance], line[:, 3 * atlas.advance:])
+        self.assertFalse(line[:, 2 * atlas.advance:3 * atlas.advance].any())
+
+    def test_missing_glyph_added(self):
+        atlas = GlyphAtlas(self.font, 'a')
+        self.assertEqual(1, len(atlas))
+        self.assertTrue(atlas.render('č').any())
+        self.assertEqual(2, len(atlas))
+
+    def test_strip_crop(self):
+        framebuffer = NumpyFramebuffer(self.font, 128, 64)
+        strip = framebuffer.create_strip('A long first line of text', 'second')
+        self.assertEqual(8, strip.shape[0])
+        self.assertEqual((8, 128), framebuffer.crop(strip, 50).shape)
+        self.assertTrue(framebuffer.crop(strip, 0).any())
+
+
+@skipUnless(find_spec('numpy'), 'NumPy is not installed')
+class TestNumpyDisplay(TestCase):
+
+    def run_display(self, device):
+        display = OLEDdisplay(device, backend='numpy')
+        try:
+            display.show('A very long message which has to be scrolled.', 'Second')
+            time.sleep(0.3)
+        finally:
+            display.close()
+
+    def test_pages_sent_directly(self):
+        serial = SimulatedSerialInterface()
+        device = DiffingSH1106(serial)
+        self.run_display(device)
+        self.assertGreater(device.get_stats()['frames'], 3)
+
+    def test_image_fallback(self):
+        device = RecordingDevice()
+        self.run_display(device)
+        self.assertGreater(len(device.frames), 2)
+        self.assertTrue(any(any(frame) for _, frame in device.frames))
+
+    def test_same_frames_as_images(self):
+        serial = SimulatedSerialInterface()
+        device = DiffingSH1106(serial)
+        display = OLEDdisplay(device, backend='numpy')
+        display.close()
+        reference_serial = SimulatedSerialInterface()
+        reference = DiffingSH1106(reference_serial)
+        for offset in range(0, display._get_text_width('Scrolled text'), 10):
+            display._render('Scrolled text', 'and more', offset)
+            strip = display._strips.get(('Scrolled text', 'and more'), None)
+            reference.display(pages_to_image(display._framebuffer.crop(strip, offset)))
+            self.assertEqual(reference_serial.ram, serial.ram)
@@ -0,0 +1,139 @@
+from src.attendance.api_connection import ISConnectionBuilder
+from src.attendance.attendance_recorder import AttendanceRecorder
+from src.attendance.hardware import Backend
+from src.attendance.hardware import create_hardware
+from src.attendance.resources.config import config
+from src.attendance.serial_replay import save_capture
+from src.attendance.serial_replay import synthesize
+from src.attendance.utils import reverse_endianness
+
+from .utils.server_mock import run
+
+from multiprocessing import Process
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import TestCase
+
+import os
+import time
+
+
+class TestSimulatedHardware(TestCase):
+
+    def setUp(self):
+        self.hardware = create_hardware(Backend.SIM)
+
+    def tearDown(self):
+        self.hardware.close()
+
+    def test_tap_is_read(self):
+        self.hardware.tap('0cb90021f6')
+        self.assertEqual('0cb90021f6', self.hardware.reader.read_card(True))
+
+    def test_push_button(self):
+        Thread(target=self.hardware.push_button).start()
+        self.assertTrue(self.hardware.button.wait_for_press(1))
+
+    def test_beep_recorded(self):
+        self.hardware.buzzer.beep(True)
+        self.assertTrue(self.hardware.buzzer.wait_idle(2))
+        kinds = [event.kind for event in self.hardware.gpio.get_events()]
+        self.assertIn('pwm_start', kinds)
+        self.assertIn('pwm_stop', kinds)
+
+    def test_display_transfers_recorded(self):
+        sent = self.hardware.display_serial.bytes
+        self.hardware.display.show('Ready to read a card.')
+        time.sleep(0.2)
+        self.assertGreater(self.hardware.display_serial.bytes, sent)
+        self.assertTrue(any(any(page) for page in self.hardware.display_serial.ram))
+
+
+class TestReplayHardware(TestCase):
+
+    def test_capture_replayed(self):
+        cards = ['0cb90021f6', 'f8a400ca45']
+        with TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'taps.jsonl')
+            save_capture(synthesize([reverse_endianness(card) for card in cards], 0.05), path)
+            hardware = create_hardware(Backend.REPLAY, path, speed=1.0)
+        try:
+            self.assertEqual(cards, [hardware.reader.read_card(True) for _ in cards])
+        finally:
+            hardware.close()
+
+    def test_capture_required(self):
+        with self.assertRaises(ValueError):
+            create_hardware(Backend.REPLAY)
+
+
+class TestHeadlessRecorder(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server_process = Process(target=run)
+        cls._server_process.start()
+        time.sleep(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server_process.terminate()
+        cls._server_process.join()
+
+    def create_recorder(self, stream=True, background=False):
+        for section, key, value in (('CardReader', 'stream', stream),
+                                    ('Upload', 'background', background)):
+            self.addCleanup(config[section].__setitem__, key, config[section][key])
+            config[section][key] = 'true' if value else 'false'
+        home = TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.addCleanup(os.environ.__setitem__, 'HOME', os.environ['HOME'])
+        os.environ['HOME'] = home.name
+        builder = ISConnectionBuilder()
+        builder.set_mac_address('42:97:0b:27:53:86')
+        builder.set_baseurl('http://127.0.0.1:5000')
+        builder.set_url('http://127.0.0.1:5000/testonline')
+        connection = builder.build()
+        hardware = create_hardware(Backend.SIM)
+        self.addCleanup(connection.close)
+        recorder = AttendanceRecorder(hardware.display, hardware.reader, connection,
+                                      hardware.buzzer, hardware.button)
+        Thread(target=recorder.start, daemon=True).start()
+        return recorder, connection, hardware
+
+    def test_recorder_loop(self):
+        recorder, _, hardware = self.create_recorder(background=True)
+
+        hardware.push_button()
+        hardware.tap('0cb90021f6')
+        deadline = time.monotonic() + 5
+        while recorder._uploader.stats.requests < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        hardware.tap('f8a400ca45')
+        while recorder._uploader.stats.requests < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(2, recorder._uploader.stats.requests)
+        pin = int(config['Buzzer']['pin'])
+        starts = []
+        while len(starts) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            starts = [event for event in hardware.gpio.get_events(pin) if event.kind == 'pwm_start']
+        # Organizator card and the participant card were both signalized, each of them once
+        time.sleep(0.5)
+        starts = [event for event in hardware.gpio.get_events(pin) if event.kind == 'pwm_start']
+        self.assertEqual(2, len(starts))
+        self.assertEqual(1, recorder._upload_queue.get_stats()['sent'])
+
+    def test_tap_before_press_is_not_organizator(self):
+        recorder, connection, hardware = self.create_recorder()
+        # Participant taps while the recorder waits for the button
+        hardware.tap('f8a400ca45')
+        deadline = time.monotonic() + 5
+        while recorder._card_events.get_stats()['received'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        hardware.push_button()
+        hardware.tap('0cb90021f6')
+        while recorder._uploader.stats.requests < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(1, recorder._uploader.stats.requests)
+        self.assertEqual('thXtKt_2q7T77PsWD3hLJT34xCexmsaY', connection.get_token())
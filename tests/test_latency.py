@@ -0,0 +1,103 @@
+from src.attendance.latency import Backoff
+from src.attendance.latency import LatencyEstimate
+from src.attendance.latency import LatencyTracker
+
+from unittest import TestCase
+
+
+class TestLatencyEstimate(TestCase):
+
+    def test_empty(self):
+        estimate = LatencyEstimate()
+        self.assertIsNone(estimate.average)
+        self.assertIsNone(estimate.percentile(95))
+        self.assertIsNone(estimate.upper_bound(95))
+
+    def test_average_follows_samples(self):
+        estimate = LatencyEstimate()
+        for _ in range(100):
+            estimate.update(0.2)
+        self.assertAlmostEqual(estimate.average, 0.2)
+        self.assertAlmostEqual(estimate.deviation, 0.0, places=6)
+
+    def test_percentile(self):
+        estimate = LatencyEstimate(window=100)
+        for sample in range(1, 101):
+            estimate.update(sample / 100)
+        self.assertEqual(estimate.percentile(50), 0.5)
+        self.assertEqual(estimate.percentile(95), 0.95)
+        self.assertEqual(estimate.percentile(100), 1.0)
+
+    def test_window(self):
+        estimate = LatencyEstimate(window=10)
+        for _ in range(10):
+            estimate.update(5.0)
+        for _ in range(10):
+            estimate.update(0.1)
+        self.assertEqual(len(estimate), 10)
+        self.assertEqual(estimate.percentile(100), 0.1)
+
+
+class TestLatencyTracker(TestCase):
+
+    def test_default_timeouts(self):
+        tracker = LatencyTracker(3.0, 10.0, 1.0, 30.0)
+        connect, read = tracker.get_timeout(1)
+        self.assertEqual(connect, 3.0)
+        self.assertAlmostEqual(read, 10.0 + 2 * LatencyTracker.DEFAULT_CARD_COST)
+
+    def test_fast_api_shortens_timeouts(self):
+        tracker = LatencyTracker(3.0, 10.0, 0.5, 30.0)
+        for _ in range(20):
+            tracker.record_connect(0.01)
+            tracker.record_response(0.1, 1)
+        connect, read = tracker.get_timeout(1)
+        self.assertEqual(connect, 0.5)
+        self.assertLess(read, 1.0)
+
+    def test_slow_api_extends_timeouts(self):
+        tracker = LatencyTracker(3.0, 10.0, 1.0, 30.0)
+        for _ in range(20):
+            tracker.record_connect(2.0)
+            tracker.record_response(8.0, 1)
+        connect, read = tracker.get_timeout(1)
+        self.assertGreater(connect, 3.0)
+        self.assertGreater(read, 16.0)
+
+    def test_payload_size(self):
+        tracker = LatencyTracker(3.0, 10.0, 0.5, 30.0)
+        for _ in range(20):
+            tracker.record_response(0.1, 1)
+        for _ in range(50):
+            tracker.record_response(0.1 + 0.01 * 500, 500)
+        small = tracker.get_timeout(1)[1]
+        large = tracker.get_timeout(500)[1]
+        self.assertAlmostEqual(tracker.get_stats()['card_cost'], 0.01, places=3)
+        self.assertGreater(large, small + 5.0)
+
+    def test_timeout_counts(self):
+        tracker = LatencyTracker()
+        tracker.record_timeout((3.0, 10.0), 1)
+        stats = tracker.get_stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['response_average'], 10.0)
+
+
+class TestBackoff(TestCase):
+
+    def test_delays_grow_with_jitter(self):
+        backoff = Backoff(1.0, 8.0, 6)
+        limits = [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+        for limit in limits:
+            delay = backoff.next_delay()
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+        self.assertIsNone(backoff.next_delay())
+
+    def test_reset(self):
+        backoff = Backoff(1.0, 8.0, 1)
+        self.assertIsNotNone(backoff.next_delay())
+        self.assertIsNone(backoff.next_delay())
+        backoff.reset()
+        self.assertLessEqual(backoff.next_delay(), 1.0)
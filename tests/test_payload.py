@@ -0,0 +1,66 @@
+from src.attendance.payload import BINARY_CONTENT_TYPE
+from src.attendance.payload import Compression
+from src.attendance.payload import decode_cards
+from src.attendance.payload import decode_payload
+from src.attendance.payload import encode_cards
+from src.attendance.payload import FORM_CONTENT_TYPE
+from src.attendance.payload import PayloadEncoder
+from src.attendance.payload import PayloadException
+from src.attendance.payload import PayloadFormat
+
+from unittest import TestCase
+from urllib.parse import urlencode
+
+
+class TestPayload(TestCase):
+
+    def setUp(self):
+        self.data = {
+            'mac': '42:97:0b:27:53:86',
+            'token': 'thXtKt_2q7T77PsWD3hLJT34xCexmsaY',
+            'cardid': ['{0:010x}'.format(index * 7919) for index in range(1000)]
+        }
+
+    def test_round_trip(self):
+        for payload_format in (PayloadFormat.JSON, PayloadFormat.BINARY):
+            for compression in Compression:
+                body, headers = PayloadEncoder(payload_format, compression).encode(self.data)
+                decoded = decode_payload(body, headers['Content-Type'],
+                                         headers.get('Content-Encoding', ''))
+                self.assertEqual(self.data, decoded, (payload_format, compression))
+
+    def test_smaller_than_form(self):
+        form = len(urlencode(self.data, doseq=True))
+        json_body, _ = PayloadEncoder(PayloadFormat.JSON, Compression.GZIP).encode(self.data)
+        binary_body, headers = PayloadEncoder(PayloadFormat.BINARY, Compression.DEFLATE).encode(self.data)
+        self.assertLess(len(json_body), form / 2)
+        self.assertLess(len(binary_body), 5 * len(self.data['cardid']) + 100)
+        self.assertEqual(BINARY_CONTENT_TYPE, headers['Content-Type'])
+        self.assertEqual('deflate', headers['Content-Encoding'])
+
+    def test_form(self):
+        body = urlencode(self.data, doseq=True).encode('ascii')
+        self.assertEqual(self.data, decode_payload(body, FORM_CONTENT_TYPE + '; charset=utf-8'))
+
+    def test_accepts(self):
+        encoder = PayloadEncoder(min_cards=20)
+        self.assertFalse(encoder.accepts(19))
+        self.assertTrue(encoder.accepts(20))
+        self.assertFalse(PayloadEncoder(PayloadFormat.FORM).accepts(1000))
+
+    def test_cards(self):
+        cards = ['0cb90021f6', 'f8a400ca45']
+        self.assertEqual(10, len(encode_cards(cards)))
+        self.assertEqual(cards, decode_cards(encode_cards(cards)))
+        with self.assertRaises(PayloadException):
+            decode_cards(b'\0' * 6)
+
+    def test_invalid(self):
+        with self.assertRaises(PayloadException):
+            decode_payload(b'{}', 'text/plain')
+        with self.assertRaises(PayloadException):
+            decode_payload(b'{}', 'application/json', 'br')
+        with self.assertRaises(PayloadException):
+            decode_payload(b'not gzip', 'application/json', 'gzip')
+        with self.assertRaises(PayloadException):
+            decode_payload(b'\0', BINARY_CONTENT_TYPE)
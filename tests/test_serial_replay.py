@@ -0,0 +1,84 @@
+from src.attendance.card_reader import CardReader
+from src.attendance.card_reader import InvalidDataException
+from src.attendance.card_reader import NoDataException
+from src.attendance.frame_parser import FrameParser
+from src.attendance.serial_replay import create_frame
+from src.attendance.serial_replay import inject_faults
+from src.attendance.serial_replay import load_capture
+from src.attendance.serial_replay import PtyReplay
+from src.attendance.serial_replay import save_capture
+from src.attendance.serial_replay import synthesize
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from unittest import TestCase
+
+import serial
+import sys
+import time
+
+CARDS = ['0cb90021f6', 'f8a400ca45', 'f64dcf480d']
+
+
+class TestCapture(TestCase):
+
+    def test_create_frame(self):
+        self.assertEqual(create_frame('0cb90021f6'), b'\x020CB90021F662\r\n\x03')
+
+    def test_save_load(self):
+        records = synthesize(CARDS, 0.5, repeats=2)
+        self.assertEqual(len(records), 6)
+        with TemporaryDirectory() as directory:
+            path = Path(directory, 'capture.jsonl')
+            save_capture(records, path)
+            self.assertEqual(load_capture(path), records)
+
+    def test_inject_faults(self):
+        records = synthesize(CARDS * 100, 0.1)
+        self.assertEqual(inject_faults(records), records)
+        damaged = inject_faults(records, noise=0.2, partial=0.1, corrupt=0.1, seed=1)
+        self.assertEqual(damaged, inject_faults(records, noise=0.2, partial=0.1, corrupt=0.1, seed=1))
+        self.assertGreater(len(damaged), len(records))
+        parsed = FrameParser().feed(b''.join(data for _, data in damaged))
+        self.assertIn(None, parsed)
+        self.assertLess(len([card for card in parsed if card is not None]), len(records))
+
+
+@skipUnless(sys.platform.startswith('linux'), 'pty is needed')
+class TestPtyReplay(TestCase):
+
+    def read_all(self, records, speed):
+        cards = []
+        invalid = 0
+        replay = PtyReplay(records, speed)
+        # Opening of the port flushes its input, so it is opened before the replay starts
+        reader = CardReader(serial.Serial(replay.port_name, timeout=0.2))
+        with replay:
+            while True:
+                try:
+                    cards.append(reader.read_card(True))
+                except InvalidDataException:
+                    invalid += 1
+                except NoDataException:
+                    if replay.finished.is_set():
+                        break
+            reader.close()
+        return cards, invalid
+
+    def test_replay(self):
+        cards, invalid = self.read_all(synthesize(CARDS, 0.05, repeats=3, repeat_interval=0.01), 1.0)
+        self.assertEqual(cards, ['03d90048f6', 'f15200352a', 'f62b3f210b'])
+        self.assertEqual(invalid, 0)
+
+    def test_accelerated_replay(self):
+        start = time.monotonic()
+        self.read_all(synthesize(CARDS, 1.0), 20.0)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_corrupted_replay(self):
+        records = synthesize(CARDS, 0.05)
+        records[1] = (records[1][0], records[1][1].replace(b'A4', b'?4'))
+        cards, invalid = self.read_all(records, 0)
+        self.assertEqual(cards, ['03d90048f6', 'f62b3f210b'])
+        self.assertEqual(invalid, 1)
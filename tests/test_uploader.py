@@ -0,0 +1,201 @@
+from src.attendance.api_connection import APIConnectionException
+from src.attendance.api_connection import IConnection
+from src.attendance.card_id import CardSet
+from src.attendance.card_id import format_card
+from src.attendance.card_id import pack_card
+from src.attendance.card_store import JournalCardStore
+from src.attendance.upload_queue import UploadQueue
+from src.attendance.uploader import DeltaUploader
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Event
+from unittest import TestCase
+
+import time
+
+
+class ConnectionMock(IConnection):
+
+    def __init__(self):
+        self.requests = []
+        self.fail_after = None
+        self.delay = 0
+
+    def set_token(self, token):
+        pass
+
+    def get_token(self):
+        return None
+
+    def is_available(self):
+        return True
+
+    def _send(self, card_ids):
+        time.sleep(self.delay)
+        if self.fail_after is not None and len(self.requests) >= self.fail_after:
+            raise APIConnectionException('Connection failed.')
+        self.requests.append([format_card(card) for card in card_ids])
+        return {}
+
+    def send_cached_data_only(self, card_ids):
+        return self._send(card_ids)
+
+    def send_data(self, actual_card_id, previous_card_ids=()):
+        return self._send(list(previous_card_ids) + [actual_card_id])
+
+    def send_organizator_data(self, organizator_card_id, card_ids=()):
+        return self._send(list(card_ids) + [organizator_card_id])
+
+
+class TestDeltaUploader(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.cache = JournalCardStore(Path(self._dir.name, 'cache'),
+                                      Path(self._dir.name, 'cache.journal'), 0)
+        self.cache.load()
+        self.connection = ConnectionMock()
+        self.uploader = DeltaUploader(self.connection, self.cache, batch_size=2)
+
+    def tearDown(self):
+        self.cache.close()
+        self._dir.cleanup()
+
+    def test_acknowledged_cards_not_resent(self):
+        self.cache.add_card(pack_card('0cb90021f6'))
+        self.uploader.send_data('f8a400ca45')
+        self.uploader.send_data('f64dcf480d')
+
+        self.assertEqual(self.connection.requests,
+                         [['0cb90021f6', 'f8a400ca45'], ['f64dcf480d']])
+        self.assertEqual(self.cache.get_cards(), CardSet())
+        self.assertFalse(self.cache.add_card(pack_card('0cb90021f6')))
+        self.assertEqual(self.uploader.stats.cards_saved, 2)
+        self.assertEqual(self.uploader.stats.bytes_saved, 2 * DeltaUploader.CARD_FIELD_SIZE)
+
+    def test_saved_cards_counted_once(self):
+        for card in ['0cb90021f6', 'f8a400ca45', 'f64dcf480d', 'abcdef0123']:
+            self.uploader.send_data(card)
+        # Legacy upload would resend 1, 2 and 3 acknowledged cards, each of them is counted once
+        self.assertEqual(self.uploader.stats.cards_saved, 3)
+        self.assertEqual(self.uploader.stats.requests, 4)
+
+    def test_queued_cards_not_folded(self):
+        for card in ['0cb90021f6', 'f8a400ca45', 'f64dcf480d']:
+            self.cache.add_card(pack_card(card))
+        self.uploader.send_queued('f8a400ca45', ['f64dcf480d'])
+        self.uploader.send_queued('f64dcf480d')
+        self.assertEqual(self.connection.requests,
+                         [['0cb90021f6', 'f8a400ca45'], ['f64dcf480d']])
+
+    def test_acknowledged_queued_card_skipped(self):
+        self.cache.add_card(pack_card('0cb90021f6'))
+        self.uploader.send_pending()
+        self.assertIsNone(self.uploader.send_queued('0cb90021f6'))
+        self.assertEqual(self.connection.requests, [['0cb90021f6']])
+
+    def test_resume_after_partial_failure(self):
+        cards = ['{0:010x}'.format(i) for i in range(5)]
+        for card in cards:
+            self.cache.add_card(pack_card(card))
+
+        self.connection.fail_after = 1
+        with self.assertRaises(APIConnectionException):
+            self.uploader.send_pending()
+        self.assertEqual(self.cache.get_cards(), CardSet(cards[2:]))
+
+        self.connection.fail_after = None
+        self.uploader.send_pending()
+        self.assertEqual(self.connection.requests, [cards[:2], cards[2:4], cards[4:]])
+        self.assertEqual(self.cache.get_cards(), CardSet())
+
+    def test_acknowledged_replayed(self):
+        self.cache.add_card(pack_card('0cb90021f6'))
+        self.uploader.send_pending()
+        self.cache.close()
+        self.cache.load()
+        self.assertEqual(self.cache.get_cards(), CardSet())
+        self.assertEqual(self.cache.count_acknowledged(), 1)
+        self.cache.start_session('thXtKt_2q7T77PsWD3hLJT34xCexmsaY')
+        self.assertEqual(self.cache.count_acknowledged(), 0)
+
+
+class TestUploadQueue(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.cache = JournalCardStore(Path(self._dir.name, 'cache'),
+                                      Path(self._dir.name, 'cache.journal'), 0)
+        self.cache.load()
+        self.connection = ConnectionMock()
+        self.results = []
+        self.errors = []
+        self.done = Event()
+        self.uploader = DeltaUploader(self.connection, self.cache)
+        self.queue = UploadQueue(self.uploader, 2,
+                                 self.on_result, self.on_error)
+
+    def tearDown(self):
+        self.queue.stop(1)
+        self.cache.close()
+        self._dir.cleanup()
+
+    def on_result(self, card, result):
+        self.results.append(card)
+        self.done.set()
+
+    def on_error(self, card, error):
+        self.errors.append(card)
+        self.done.set()
+
+    def test_put_does_not_wait_for_upload(self):
+        self.connection.delay = 0.2
+        self.queue.start()
+        for card in ['0cb90021f6', 'f8a400ca45', 'f64dcf480d']:
+            self.cache.add_card(pack_card(card))
+        start = time.monotonic()
+        self.assertTrue(self.queue.put('0cb90021f6'))
+        self.assertTrue(self.queue.put('f8a400ca45'))
+        self.assertFalse(self.queue.put('f64dcf480d'))
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        stats = self.queue.get_stats()
+        self.assertEqual(stats['depth'], 2)
+        self.assertGreater(stats['oldest_pending_age'], 0)
+
+        while self.queue.depth() > 0:
+            time.sleep(0.05)
+        self.assertEqual(self.results, ['0cb90021f6', 'f8a400ca45'])
+        self.assertEqual(self.queue.get_stats()['sent'], 2)
+        # Card which did not fit to the queue is sent with the first one, the second one was queued
+        self.assertEqual(self.connection.requests,
+                         [['f64dcf480d', '0cb90021f6'], ['f8a400ca45']])
+
+    def test_failed_card_stays_cached(self):
+        self.connection.fail_after = 0
+        self.queue.start()
+        self.cache.add_card(pack_card('0cb90021f6'))
+        self.queue.put('0cb90021f6')
+        self.assertTrue(self.done.wait(1))
+        self.assertEqual(self.errors, ['0cb90021f6'])
+        self.assertEqual(self.cache.get_cards(), CardSet(['0cb90021f6']))
+
+        self.connection.fail_after = None
+        self.done.clear()
+        self.cache.add_card(pack_card('f8a400ca45'))
+        self.queue.put('f8a400ca45')
+        self.assertTrue(self.done.wait(1))
+        self.assertEqual(self.connection.requests, [['0cb90021f6', 'f8a400ca45']])
+        self.assertEqual(self.cache.get_cards(), CardSet())
+
+    def test_acknowledged_card_skipped(self):
+        self.cache.add_card(pack_card('0cb90021f6'))
+        self.queue.put('0cb90021f6')
+        self.uploader.send_pending()
+        self.queue.start()
+        while self.queue.depth() > 0:
+            time.sleep(0.01)
+        self.assertEqual(self.queue.get_stats()['skipped'], 1)
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.connection.requests, [['0cb90021f6']])
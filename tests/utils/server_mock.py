@@ -1,3 +1,7 @@
+from src.attendance.payload import decode_payload
+from src.attendance.payload import FORM_CONTENT_TYPE
+from src.attendance.payload import PayloadException
+
 import logging
 
 try:
@@ -7,10 +11,23 @@ except ImportError:
     logging.fatal(
         "Failed to import Flask. Flask must be installed to run tests.")
 
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from io import BytesIO
+
 import json
+import time
 
 server = Flask(__name__)
 
+# Delay of every response in seconds, used to emulate slow network in benchmarks
+response_delay = 0.0
+
+# Client ports of all connections used for the requests (except /connections)
+client_ports = set()
+# Number of received POST requests
+posts = [0]
+
 
 def test_failed():
     return json.dumps({
@@ -20,7 +37,7 @@ def test_failed():
 
 def no_record_for_card(card, token=None):
     response = {
-        'msga': 'No record found for ' + card,
+        'msga': 'No recording started for ' + card,
         'msgb': 'TEST SUCCESS',
         'err': '1'
     }
@@ -37,11 +54,68 @@ def invalid_token(token):
     })
 
 
-@server.route('/')
+def read_data():
+    """Return mac, token, init and card IDs of form, JSON or binary payload."""
+    if request.mimetype in ('', FORM_CONTENT_TYPE):
+        return (request.values.get('mac', None), request.values.get('token', None),
+                request.values.get('init', None), request.values.getlist('cardid'))
+    data = decode_payload(request.get_data(), request.content_type,
+                          request.headers.get('Content-Encoding', ''))
+    return data.get('mac'), data.get('token'), data.get('init'), data.get('cardid', [])
+
+
+@server.errorhandler(PayloadException)
+def unsupported_payload(error):
+    return json.dumps({
+        'test': 'failed',
+        'error': str(error)
+    }), 415
+
+
+@server.before_request
+def record_connection():
+    if request.endpoint != 'connections':
+        client_ports.add(request.environ.get('REMOTE_PORT'))
+    if request.method == 'POST':
+        posts[0] += 1
+        time.sleep(response_delay)
+
+
+@server.route('/', methods=['GET', 'HEAD'])
 def index():
     return 'Server is ready for the test!'
 
 
+@server.route('/connections')
+def connections():
+    return json.dumps({
+        'count': len(client_ports)
+    })
+
+
+@server.route('/connections', methods=['DELETE'])
+def reset_connections():
+    client_ports.clear()
+    return json.dumps({
+        'count': 0
+    })
+
+
+@server.route('/posts')
+def get_posts():
+    return json.dumps({
+        'count': posts[0]
+    })
+
+
+@server.route('/posts', methods=['DELETE'])
+def reset_posts():
+    posts[0] = 0
+    return json.dumps({
+        'count': 0
+    })
+
+
 """
 Expected mac address 42:97:0b:27:53:86
 
@@ -54,10 +128,7 @@ Salomon Hershey     f64dcf480d  EG7I52PehLKrWB9SzKibyNVAwFKbZKi0    EG7I52PehLKr
 
 @server.route('/testonline', methods=['POST'])
 def test_online():
-    mac_address = request.args.get('mac', None)
-    token = request.args.get('token', None)
-    init = request.args.get('init', None)
-    cardid = request.args.getlist('cardid', None)
+    mac_address, token, init, cardid = read_data()
 
     if mac_address is None or mac_address != '42:97:0b:27:53:86':
         return test_failed()
@@ -112,10 +183,7 @@ def test_online():
 
 @server.route('/testoffline', methods=['POST'])
 def test_offline():
-    mac_address = request.args.get('mac', None)
-    token = request.args.get('token', None)
-    init = request.args.get('init', None)
-    cardid = request.args.getlist('cardid', None)
+    mac_address, token, init, cardid = read_data()
 
     if mac_address is None or mac_address != '42:97:0b:27:53:86':
         return test_failed()
@@ -155,5 +223,88 @@ def test_offline():
     return invalid_token(token)
 
 
+@server.route('/testlegacy', methods=['POST'])
+def test_legacy():
+    """Server which understands only form encoded data."""
+    if request.mimetype != FORM_CONTENT_TYPE:
+        return test_failed(), 415
+    return test_online()
+
+
+@server.route('/testformonly', methods=['POST'])
+def test_form_only():
+    """Server which reads only form fields and fails on other payloads with an error page."""
+    if request.mimetype not in ('', FORM_CONTENT_TYPE):
+        return '<b>Notice</b>: Undefined index: mac'
+    return test_online()
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    """Minimal WSGI request handler which keeps connections alive.
+
+    Werkzeug development server always closes the connection after the response
+    so the connection reuse could not be tested with it.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_wsgi(self):
+        path, _, query = self.path.partition('?')
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': self.server.server_address[0],
+            'SERVER_PORT': str(self.server.server_address[1]),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'REMOTE_PORT': self.client_address[1],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': BytesIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for key, value in self.headers.items():
+            environ['HTTP_' + key.upper().replace('-', '_')] = value
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+
+        data = b''.join(server(environ, start_response))
+        code, _, message = response['status'].partition(' ')
+        self.send_response(int(code), message)
+        for key, value in response['headers']:
+            if key.lower() != 'content-length':
+                self.send_header(key, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    do_GET = handle_wsgi
+    do_HEAD = handle_wsgi
+    do_POST = handle_wsgi
+    do_DELETE = handle_wsgi
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(delay=0.0):
+    global response_delay
+    response_delay = delay
+    ThreadingHTTPServer(('127.0.0.1', 5000), KeepAliveRequestHandler).serve_forever()
+
+
 if __name__ == '__main__':
-    server.run()
+    run()